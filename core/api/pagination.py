@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Keyset pagination that is only applied when the client asks for it with
+    ?page_size=, so existing clients keep getting the full list. The `next`
+    and `previous` links carry the page size along with the cursor.
+    """
+
+    page_size = None
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class SpacedRepetitionPagination(OptionalCursorPagination):
+    ordering = ("id",)
+
+
+class ChallengeScorePagination(OptionalCursorPagination):
+    # get_best_challenge_stats returns one row per challenge.
+    ordering = ("challenge_id",)
@@ -1,7 +1,4 @@
 import logging
-import os
-import tempfile
-import uuid
 
 from django.conf import settings
 from rest_framework import serializers
@@ -10,10 +7,13 @@ from core.models import (
     Challenge,
     ChallengeRating,
     ChallengeStat,
+    Company,
     Course,
     SpacedRepetition,
     Student,
 )
+from core.services.course_assignment import COURSE_ASSIGNMENT_POLICIES
+from core.services.onboarding import get_file_format
 
 logger = logging.getLogger(settings.LOGGER_NAME)
 
@@ -147,7 +147,7 @@ class StudentChallengeSerializer(serializers.Serializer):
         except Challenge.DoesNotExist:
             raise serializers.ValidationError("Challenge does not exist.")
 
-        error_message = "Error saving audio file."
+        error_message = "Error reading audio file."
         try:
             audio_file = data["answer_audio"]
 
@@ -176,13 +176,10 @@ class StudentChallengeSerializer(serializers.Serializer):
                     error_message = "File is not an audio."
                     raise serializers.ValidationError(error_message)
 
-                temp_dir = tempfile.gettempdir()
-                temp_file_name = f"{str(uuid.uuid4())}{audio_file.name}"
-                temp_file_path = os.path.join(temp_dir, temp_file_name)
-                with open(temp_file_path, "wb") as temp_file:
-                    for chunk in audio_file.chunks():
-                        temp_file.write(chunk)
-                data["answer_audio"] = temp_file_path
+                # The upload is passed on as is: Django keeps it in memory up
+                # to FILE_UPLOAD_MAX_MEMORY_SIZE and spools bigger ones to a
+                # temporary file that is removed when the upload is closed.
+                data["answer_audio"] = audio_file
         except Exception as e:
             logger.warning(e)
             raise serializers.ValidationError(error_message)
@@ -227,3 +224,32 @@ class SpacedRepetitionSerializer(serializers.ModelSerializer):
     class Meta:
         model = SpacedRepetition
         fields = "__all__"
+
+
+class SpacedRepetitionFilterSerializer(serializers.Serializer):
+    due_before = serializers.DateTimeField(required=False)
+    not_completed = serializers.BooleanField(required=False, default=False)
+
+
+class CompanyOnboardingSerializer(serializers.Serializer):
+    company_id = serializers.IntegerField()
+    file = serializers.FileField()
+    course_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
+    assign_courses = serializers.ChoiceField(
+        choices=list(COURSE_ASSIGNMENT_POLICIES), required=False, default=None
+    )
+
+    def validate(self, data):
+        try:
+            data["company"] = Company.objects.get(id=data["company_id"])
+        except Company.DoesNotExist:
+            raise serializers.ValidationError("Company does not exist.")
+
+        try:
+            data["file_format"] = get_file_format(data["file"].name)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+        return data
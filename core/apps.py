@@ -6,4 +6,8 @@ class CoreConfig(AppConfig):
     name = "core"
 
     def ready(self):
+        import core.checks
         import core.signals
+        from core.services.scheduling import check_review_policies
+
+        check_review_policies()
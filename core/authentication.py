@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.models import Student
+
+
+def get_token_cache():
+    """
+    The cache of AUTH_TOKEN_CACHE_ALIAS, None when token caching is off. The
+    core.checks system check makes sure it is a shared cache.
+    """
+    alias = settings.AUTH_TOKEN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def get_token_cache_key(key):
+    return f"auth-token:{key}"
+
+
+def invalidate_token_cache(keys):
+    cache = get_token_cache()
+    if cache is not None:
+        cache.delete_many([get_token_cache_key(key) for key in keys])
+
+
+def invalidate_user_token_cache(user_id):
+    if get_token_cache() is None:
+        return
+    invalidate_token_cache(
+        Token.objects.filter(user_id=user_id).values_list("key", flat=True)
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps the token, its user and the user's student
+    in the cache for AUTH_TOKEN_CACHE_TTL seconds, so an authenticated request
+    costs no auth queries in the steady state. Entries are dropped by the
+    signals in core.signals when the token, user or student changes. Plain
+    TokenAuthentication while AUTH_TOKEN_CACHE_ALIAS is empty.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        cache_key = get_token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            try:
+                token = self.get_model().objects.select_related("user").get(key=key)
+            except self.get_model().DoesNotExist:
+                raise AuthenticationFailed(_("Invalid token."))
+            self._cache_student(token.user)
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TTL)
+
+        if not token.user.is_active:
+            raise AuthenticationFailed(_("User inactive or deleted."))
+
+        return (token.user, token)
+
+    def _cache_student(self, user):
+        # Loads the student into the user's related-object cache, which is
+        # pickled with the user, so `user.student` is free on cache hits.
+        try:
+            user.student
+        except Student.DoesNotExist:
+            get_user_model().student.related.set_cached_value(user, None)
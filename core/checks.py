@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Caches a token deletion on one worker does not reach the others through.
+LOCAL_CACHE_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.filebased.FileBasedCache",
+}
+
+
+@register()
+def check_token_cache(app_configs, **kwargs):
+    alias = settings.AUTH_TOKEN_CACHE_ALIAS
+    if not alias:
+        return []
+    if alias not in settings.CACHES:
+        return [
+            Error(
+                f"AUTH_TOKEN_CACHE_ALIAS {alias!r} is not in CACHES.",
+                hint="Set SHARED_CACHE_URL or leave AUTH_TOKEN_CACHE_ALIAS empty.",
+                id="core.E001",
+            )
+        ]
+    if settings.CACHES[alias]["BACKEND"] in LOCAL_CACHE_BACKENDS:
+        return [
+            Error(
+                f"AUTH_TOKEN_CACHE_ALIAS {alias!r} is not a shared cache, revoked "
+                "tokens would keep working on the other workers.",
+                hint="Set SHARED_CACHE_URL or leave AUTH_TOKEN_CACHE_ALIAS empty.",
+                id="core.E001",
+            )
+        ]
+    return []
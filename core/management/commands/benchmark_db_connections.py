@@ -0,0 +1,92 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+
+from core.models import Challenge
+
+
+class Command(BaseCommand):
+    help = (
+        "Time /api/get-challenge-by-id/ with a new database connection per "
+        "request and with the configured connection reuse (CONN_MAX_AGE or pool)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--challenge", type=int, help="Challenge id to fetch.")
+        parser.add_argument("--username", help="User to authenticate as.")
+
+    def handle(self, *args, **options):
+        challenge_id = options["challenge"] or (
+            Challenge.objects.values_list("id", flat=True).first()
+        )
+        users = get_user_model().objects.filter(is_active=True)
+        if options["username"]:
+            users = users.filter(username=options["username"])
+        user = users.first()
+        if challenge_id is None or user is None:
+            raise CommandError("A challenge and an active user are required.")
+
+        client = Client()
+        client.force_login(user)
+        url = reverse("get-challenge-by-id", args=[challenge_id])
+
+        settings_dict = connection.settings_dict
+        configured = {
+            "CONN_MAX_AGE": settings_dict["CONN_MAX_AGE"],
+            "CONN_HEALTH_CHECKS": settings_dict["CONN_HEALTH_CHECKS"],
+            "OPTIONS": settings_dict["OPTIONS"],
+        }
+        modes = [
+            (
+                "new connection per request",
+                {
+                    "CONN_MAX_AGE": 0,
+                    "CONN_HEALTH_CHECKS": False,
+                    "OPTIONS": {
+                        key: value
+                        for key, value in settings_dict["OPTIONS"].items()
+                        if key != "pool"
+                    },
+                },
+            ),
+            ("configured", configured),
+        ]
+        try:
+            for label, mode in modes:
+                settings_dict.update(mode)
+                connection.close()
+                elapsed, connects = self.run_requests(client, url, options["requests"])
+                self.stdout.write(
+                    f"{label}: {elapsed * 1000 / options['requests']:.2f} ms/request, "
+                    f"{connects} connections opened"
+                )
+        finally:
+            settings_dict.update(configured)
+            connection.close()
+
+    def run_requests(self, client, url, requests):
+        connects = []
+
+        def count_connection(**kwargs):
+            connects.append(kwargs["connection"].alias)
+
+        connection_created.connect(count_connection)
+        try:
+            start = time.perf_counter()
+            for _ in range(requests):
+                # The test client skips the request_started/finished handlers
+                # that recycle connections, run them as a server would.
+                close_old_connections()
+                response = client.get(url)
+                close_old_connections()
+                if response.status_code != 200:
+                    raise CommandError(f"{url} returned {response.status_code}.")
+            return time.perf_counter() - start, len(connects)
+        finally:
+            connection_created.disconnect(count_connection)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Course, Student
+from core.services.enrollment import enroll_students
+
+
+class Command(BaseCommand):
+    help = "Enroll students in a course and create their spaced repetition schedule."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", type=int, required=True)
+        parser.add_argument("--company", type=int, help="Enroll every student of it.")
+        parser.add_argument(
+            "--student", type=int, action="append", dest="student_ids", default=None
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not Course.objects.filter(id=options["course"]).exists():
+            raise CommandError(f"Course {options['course']} does not exist.")
+        if not options["company"] and not options["student_ids"]:
+            raise CommandError("Pass --company or at least one --student.")
+
+        students = Student.objects.all()
+        if options["company"]:
+            students = students.filter(company_id=options["company"])
+        if options["student_ids"]:
+            students = students.filter(id__in=options["student_ids"])
+
+        enrolled = enroll_students(
+            options["course"],
+            students.values_list("id", flat=True).iterator(
+                chunk_size=options["batch_size"]
+            ),
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            f"Enrolled {enrolled} students in course {options['course']}."
+        )
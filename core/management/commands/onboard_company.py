@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Company
+from core.services.course_assignment import COURSE_ASSIGNMENT_POLICIES
+from core.services.onboarding import CompanyOnboarding, get_file_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users, tokens and students for a company from a CSV or JSONL "
+        "file with username, password and optional name, email and courses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--company", type=int, required=True)
+        parser.add_argument(
+            "--course",
+            type=int,
+            action="append",
+            dest="course_ids",
+            default=None,
+            help="Course for rows without their own courses, repeatable.",
+        )
+        parser.add_argument(
+            "--assign-courses",
+            choices=list(COURSE_ASSIGNMENT_POLICIES),
+            default=None,
+            help="Course assignment policy for rows left without courses.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--max-rows", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            company = Company.objects.get(id=options["company"])
+            file_format = get_file_format(options["path"])
+        except Company.DoesNotExist:
+            raise CommandError(f"Company {options['company']} does not exist.")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        onboarding = CompanyOnboarding(
+            company,
+            options["course_ids"],
+            batch_size=options["batch_size"],
+            max_rows=options["max_rows"],
+            hash_workers=options["workers"],
+            assign_courses=options["assign_courses"],
+            progress=lambda report: self.stdout.write(
+                f"Processed {report['processed']} rows, "
+                f"created {report['created']} students."
+            ),
+        )
+        with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+            report = onboarding.run(read_rows(lines, file_format))
+
+        for error in report["errors"]:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        self.stdout.write(
+            f"Created {report['created']} of {report['processed']} rows, "
+            f"{len(report['errors'])} errors."
+        )
@@ -0,0 +1,65 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.timezone import now
+
+from core.services.due_reviews import rebuild_due_reviews
+from core.services.review_scheduler import DueReviewProcessor
+
+
+class Command(BaseCommand):
+    help = (
+        "Scan the due review queue in batches and pre-generate review "
+        "challenges or send review notifications."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--action", choices=DueReviewProcessor.ACTIONS, default="challenges"
+        )
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=0,
+            help="Also process reviews due in the next N minutes.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recreate the queue from SpacedRepetition first.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and scan every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=settings.DUE_REVIEWS_INTERVAL
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            rebuild_due_reviews(
+                options["batch_size"] or settings.DUE_REVIEWS_BATCH_SIZE
+            )
+        processor = DueReviewProcessor(options["action"], options["batch_size"])
+        if not options["loop"]:
+            processed = processor.run(now() + timedelta(minutes=options["ahead"]))
+            self.stdout.write(f"Processed {processed} due reviews.")
+            return
+
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        while True:
+            try:
+                processed = processor.run(now() + timedelta(minutes=options["ahead"]))
+                self.stdout.write(f"Processed {processed} due reviews.")
+            except Exception as e:
+                logger.warning(f"Due reviews processing error: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(options["interval"])
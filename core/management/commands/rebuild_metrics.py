@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.services.metrics import rebuild_metrics
+
+
+class Command(BaseCommand):
+    help = "Rebuild the company and global metrics rollups from ChallengeStat."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rollups, students = rebuild_metrics(batch_size=options["batch_size"])
+        self.stdout.write(
+            f"Rebuilt {rollups} metrics rollups and {students} student metrics."
+        )
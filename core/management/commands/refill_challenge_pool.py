@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.services.challenge_pool import ChallengePoolService
+
+
+class Command(BaseCommand):
+    help = "Generate challenges until every course has its target pool size."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--course", type=int, action="append", dest="course_ids", default=None
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and refill every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval", type=int, default=settings.CHALLENGE_POOL_SCHEDULER_INTERVAL
+        )
+
+    def handle(self, *args, **options):
+        service = ChallengePoolService()
+        if not options["loop"]:
+            generated = service.refill(options["course_ids"])
+            self.stdout.write(f"Generated {generated} challenges.")
+            return
+
+        # Meant to run in a single process (the challenge-pool deployment),
+        # refill() also skips a pass while another process is refilling.
+        logger = logging.getLogger(settings.LOGGER_NAME)
+        while True:
+            try:
+                generated = service.refill(options["course_ids"])
+                self.stdout.write(f"Generated {generated} challenges.")
+            except Exception as e:
+                logger.warning(f"Challenge pool refill error: {e}")
+            finally:
+                close_old_connections()
+            time.sleep(options["interval"])
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import SpacedRepetition
+from core.services.scheduling import reschedule_spaced_repetitions
+from core.services.utils import filter_spaced_repetitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the open review moments from the score history and the "
+        "current SPACED_REPETITION_POLICIES, in batches of bulk UPDATEs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--company", type=int, help="Only this company.")
+        parser.add_argument(
+            "--course",
+            type=int,
+            action="append",
+            dest="course_ids",
+            default=None,
+            help="Only these courses, repeatable.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        spaced_repetitions = filter_spaced_repetitions(
+            SpacedRepetition.objects.all(), not_completed=True
+        )
+        if options["company"]:
+            spaced_repetitions = spaced_repetitions.filter(
+                student__company_id=options["company"]
+            )
+        if options["course_ids"]:
+            spaced_repetitions = spaced_repetitions.filter(
+                course_id__in=options["course_ids"]
+            )
+        rescheduled = reschedule_spaced_repetitions(
+            spaced_repetitions, options["batch_size"]
+        )
+        self.stdout.write(f"Rescheduled {rescheduled} spaced repetitions.")
@@ -1,6 +1,16 @@
-from rest_framework.authentication import TokenAuthentication
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
 
+from django.conf import settings
+from django.db import connections
+
+from core.authentication import CachedTokenAuthentication
 from core.models import Student
+from core.services.monitoring import REQUEST_LATENCY, observe_db_pools
+from core.services.profiling import profile_span, request_profile
 
 
 class StudentMiddleware:
@@ -9,7 +19,7 @@ class StudentMiddleware:
 
     def __call__(self, request):
         if not hasattr(request, "user") or not request.user.is_authenticated:
-            auth = TokenAuthentication()
+            auth = CachedTokenAuthentication()
             try:
                 user_auth_tuple = auth.authenticate(request)
                 if user_auth_tuple:
@@ -24,3 +34,89 @@ class StudentMiddleware:
         else:
             request.student = None
         return self.get_response(request)
+
+
+class RequestProfilingMiddleware:
+    """
+    For a PROFILING_SAMPLE_RATE share of requests, time database queries, LLM
+    and speech-to-text calls, audio handling and the whole request. The
+    result goes out as a Server-Timing header and a JSON log line. The
+    header of a streaming response only covers the work done before the
+    first chunk, its log line is written when the stream ends and covers
+    the whole response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.logger = logging.getLogger(settings.LOGGER_NAME)
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        with request_profile() as profile, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.time_query))
+            response = self.get_response(request)
+
+        response["Server-Timing"] = profile.server_timing()
+        if response.streaming:
+            stream = self.aprofile_stream if response.is_async else self.profile_stream
+            response.streaming_content = stream(
+                request, response, profile, response.streaming_content
+            )
+            return response
+        self.log_profile(request, response, profile)
+        return response
+
+    def profile_stream(self, request, response, profile, content):
+        with request_profile(profile):
+            yield from content
+        self.log_profile(request, response, profile)
+
+    async def aprofile_stream(self, request, response, profile, content):
+        with request_profile(profile):
+            async for chunk in content:
+                yield chunk
+        self.log_profile(request, response, profile)
+
+    def log_profile(self, request, response, profile):
+        resolver_match = getattr(request, "resolver_match", None)
+        self.logger.info(
+            json.dumps(
+                {
+                    "event": "request_profile",
+                    "method": request.method,
+                    "path": request.path,
+                    "view": resolver_match.view_name if resolver_match else None,
+                    "status": response.status_code,
+                    **profile.as_dict(),
+                }
+            )
+        )
+
+    def time_query(self, execute, sql, params, many, context):
+        with profile_span("db"):
+            return execute(sql, params, many, context)
+
+
+class PrometheusMiddleware:
+    """
+    Request latency per view for /metrics, labelled by URL name so the label
+    set stays bounded, plus the database pool gauges after each request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        resolver_match = getattr(request, "resolver_match", None)
+        REQUEST_LATENCY.labels(
+            resolver_match.view_name if resolver_match else "unmatched",
+            request.method,
+            response.status_code,
+        ).observe(time.perf_counter() - started)
+        observe_db_pools(connections)
+        return response
@@ -0,0 +1,143 @@
+# Generated by Django 5.1 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def create_metrics(apps, schema_editor):
+    """The rollups and student metrics of the existing ChallengeStat rows."""
+    ChallengeStat = apps.get_model("core", "ChallengeStat")
+    MetricsRollup = apps.get_model("core", "MetricsRollup")
+    StudentMetrics = apps.get_model("core", "StudentMetrics")
+    fields = ["stats_count", "score_sum", "completed_count", "total_minutes"]
+    rollups = {}
+    rows = ChallengeStat.objects.values("student__company_id", "moment").annotate(
+        stats_count=Count("id"),
+        score_sum=Sum("score"),
+        completed_count=Count("id", filter=Q(score__gt=0)),
+        total_minutes=Sum("challenge__estimated_minutes", filter=Q(skipped=False)),
+    )
+    for row in rows:
+        for company_id in {None, row["student__company_id"]}:
+            scope = str(company_id) if company_id else "global"
+            rollup = rollups.setdefault(
+                (scope, row["moment"]),
+                MetricsRollup(scope=scope, moment=row["moment"]),
+            )
+            for field in fields:
+                setattr(rollup, field, getattr(rollup, field) + (row[field] or 0))
+    MetricsRollup.objects.bulk_create(rollups.values(), batch_size=1000)
+    StudentMetrics.objects.bulk_create(
+        [
+            StudentMetrics(
+                student_id=row["student_id"],
+                company_id=row["student__company_id"],
+                completed_count=row["completed_count"],
+            )
+            for row in ChallengeStat.objects.filter(score__gt=0)
+            .values("student_id", "student__company_id")
+            .annotate(completed_count=Count("id"))
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_alter_student_company"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MetricsRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("scope", models.CharField(max_length=32)),
+                (
+                    "moment",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "No Moment"),
+                            (1, "First Moment"),
+                            (2, "Second Moment"),
+                            (3, "Third Moment"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                ("stats_count", models.IntegerField(default=0)),
+                (
+                    "score_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("completed_count", models.IntegerField(default=0)),
+                ("total_minutes", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "moment"),
+                        name="unique_metrics_rollup_scope_moment",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StudentMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("completed_count", models.IntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "company",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="student_metrics",
+                        to="core.company",
+                    ),
+                ),
+                (
+                    "student",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="metrics",
+                        to="core.student",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-completed_count"],
+                        name="core_studen_complet_23b876_idx",
+                    ),
+                    models.Index(
+                        fields=["company", "-completed_count"],
+                        name="core_studen_company_20ec25_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(create_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1 on 2026-10-18 13:46
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_spaced_repetitions(apps, schema_editor):
+    """Keep the oldest row per student and course, with any completed moment."""
+    SpacedRepetition = apps.get_model("core", "SpacedRepetition")
+    duplicates = (
+        SpacedRepetition.objects.values("student_id", "course_id")
+        .annotate(count=Count("id"), keep_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        rows = SpacedRepetition.objects.filter(
+            student_id=duplicate["student_id"], course_id=duplicate["course_id"]
+        )
+        completed = {
+            field: True
+            for field in ["is_completed1", "is_completed2", "is_completed3"]
+            if rows.filter(**{field: True}).exists()
+        }
+        if completed:
+            rows.filter(id=duplicate["keep_id"]).update(**completed)
+        rows.exclude(id=duplicate["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_metricsrollup_studentmetrics"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_spaced_repetitions, migrations.RunPython.noop
+        ),
+        migrations.AlterUniqueTogether(
+            name="spacedrepetition",
+            unique_together={("student", "course")},
+        ),
+        migrations.AddIndex(
+            model_name="challengestat",
+            index=models.Index(
+                fields=["student", "challenge"], name="challengestat_student_chal_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="challengestat",
+            index=models.Index(fields=["moment"], name="challengestat_moment_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="challengestat",
+            index=models.Index(
+                fields=["created_at"], name="challengestat_created_at_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="challengestat",
+            index=models.Index(
+                condition=models.Q(("score__gt", 0)),
+                fields=["student"],
+                name="challengestat_completed_idx",
+            ),
+        ),
+    ]
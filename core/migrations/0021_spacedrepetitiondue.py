@@ -0,0 +1,107 @@
+# Generated by Django 5.1 on 2026-10-18 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_due_reviews(apps, schema_editor):
+    """One row per moment not completed yet, in id order batches."""
+    SpacedRepetition = apps.get_model("core", "SpacedRepetition")
+    SpacedRepetitionDue = apps.get_model("core", "SpacedRepetitionDue")
+    last_id = 0
+    while True:
+        spaced_repetitions = list(
+            SpacedRepetition.objects.filter(id__gt=last_id).order_by("id")[:1000]
+        )
+        if not spaced_repetitions:
+            return
+        SpacedRepetitionDue.objects.bulk_create(
+            [
+                SpacedRepetitionDue(
+                    spaced_repetition_id=spaced_repetition.id,
+                    student_id=spaced_repetition.student_id,
+                    course_id=spaced_repetition.course_id,
+                    moment=moment,
+                    due_at=getattr(spaced_repetition, f"moment{moment}"),
+                )
+                for spaced_repetition in spaced_repetitions
+                for moment in (1, 2, 3)
+                if not getattr(spaced_repetition, f"is_completed{moment}")
+            ]
+        )
+        last_id = spaced_repetitions[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_challengestat_indexes_spacedrepetition_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SpacedRepetitionDue",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "moment",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "No Moment"),
+                            (1, "First Moment"),
+                            (2, "Second Moment"),
+                            (3, "Third Moment"),
+                        ]
+                    ),
+                ),
+                ("due_at", models.DateTimeField()),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="due_reviews",
+                        to="core.course",
+                    ),
+                ),
+                (
+                    "spaced_repetition",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="due_moments",
+                        to="core.spacedrepetition",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="due_reviews",
+                        to="core.student",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["due_at", "id"],
+                        name="srdue_pending_due_at_idx",
+                    ),
+                    models.Index(
+                        fields=["student", "due_at"], name="srdue_student_due_at_idx"
+                    ),
+                ],
+                "unique_together": {("spaced_repetition", "moment")},
+            },
+        ),
+        migrations.RunPython(create_due_reviews, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
 
 class PromptTemplate(models.Model):
@@ -111,6 +111,18 @@ class StudentProgress(models.Model):
         return f"{self.student.name} - {self.course.title}"
 
 
+class ChallengeStatQuerySet(models.QuerySet):
+    def delete(self):
+        # ChallengeStat has no delete signals so that cascades stay fast
+        # deletes; the Student and Challenge pre_delete receivers update the
+        # metrics rollups for those, direct deletes do it here.
+        from core.services.metrics import subtract_stats
+
+        with transaction.atomic(using=self.db):
+            subtract_stats(self)
+            return super().delete()
+
+
 class ChallengeStat(models.Model):
     MOMENT_CHOICES = (
         (0, "No Moment"),
@@ -131,9 +143,32 @@ class ChallengeStat(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ChallengeStatQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["student", "challenge"], name="challengestat_student_chal_idx"
+            ),
+            models.Index(fields=["moment"], name="challengestat_moment_idx"),
+            models.Index(fields=["created_at"], name="challengestat_created_at_idx"),
+            models.Index(
+                fields=["student"],
+                condition=models.Q(score__gt=0),
+                name="challengestat_completed_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.student.name} - {self.challenge.name}"
 
+    def delete(self, *args, **kwargs):
+        from core.services.metrics import subtract_stats
+
+        with transaction.atomic(using=kwargs.get("using")):
+            subtract_stats(ChallengeStat.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
+
 
 class ChallengeRating(models.Model):
     challenge = models.ForeignKey(
@@ -165,3 +200,92 @@ class SpacedRepetition(models.Model):
     is_completed3 = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("student", "course")]
+
+
+class SpacedRepetitionDue(models.Model):
+    """
+    One row per review moment of a SpacedRepetition that is not completed
+    yet, so due reviews are a range scan on due_at instead of an OR over
+    three columns. Kept in sync by core.services.due_reviews.
+    """
+
+    spaced_repetition = models.ForeignKey(
+        SpacedRepetition, on_delete=models.CASCADE, related_name="due_moments"
+    )
+    student = models.ForeignKey(
+        Student, on_delete=models.CASCADE, related_name="due_reviews"
+    )
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="due_reviews"
+    )
+    moment = models.PositiveSmallIntegerField(choices=ChallengeStat.MOMENT_CHOICES)
+    due_at = models.DateTimeField()
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = [("spaced_repetition", "moment")]
+        indexes = [
+            # The scheduler scan, pending rows only.
+            models.Index(
+                fields=["due_at", "id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="srdue_pending_due_at_idx",
+            ),
+            models.Index(fields=["student", "due_at"], name="srdue_student_due_at_idx"),
+        ]
+
+
+class MetricsRollup(models.Model):
+    """
+    Running totals of ChallengeStat per scope and moment, the scope is either
+    GLOBAL_SCOPE or a company id. Kept up to date by core.signals.
+    """
+
+    GLOBAL_SCOPE = "global"
+
+    scope = models.CharField(max_length=32)
+    moment = models.PositiveSmallIntegerField(
+        choices=ChallengeStat.MOMENT_CHOICES, default=0
+    )
+    stats_count = models.IntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_count = models.IntegerField(default=0)
+    total_minutes = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["scope", "moment"], name="unique_metrics_rollup_scope_moment"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.scope} - {self.moment}"
+
+
+class StudentMetrics(models.Model):
+    student = models.OneToOneField(
+        Student, on_delete=models.CASCADE, related_name="metrics"
+    )
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name="student_metrics",
+        null=True,
+        blank=True,
+    )
+    completed_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-completed_count"]),
+            models.Index(fields=["company", "-completed_count"]),
+        ]
+
+    def __str__(self):
+        return f"{self.student.name} - {self.completed_count}"
@@ -1,61 +1,179 @@
 import logging
+from contextlib import nullcontext
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import transaction
 
 from core.models import Challenge, Course, PromptTemplate, Student
 from core.services.llm_service import LLMService
+from core.services.monitoring import (
+    CHALLENGES_SERVED,
+    observe_audio_upload,
+    release_audio_upload,
+)
+from core.services.single_flight import (
+    AsyncSingleFlight,
+    SingleFlight,
+    aadvisory_lock,
+    advisory_lock,
+)
 from core.services.utils import (
-    delete_temp_file,
     get_suggested_materials,
     is_spaced_repetition_check,
     save_score,
 )
 
+challenge_generation = SingleFlight()
+async_challenge_generation = AsyncSingleFlight()
+
 
 class ChallengeService:
     def __init__(self):
         self.logger = logging.getLogger(settings.LOGGER_NAME)
         self.llm_service = LLMService()
 
-    def build_challenge_prompt(self, student_id, course_id):
+    def build_challenge_prompt(self, student_id, course_id, level=None):
         self.logger.info(
             f"Building challenge prompt for student {student_id} and course {course_id}"
         )
         prompt_challenge_template = PromptTemplate.objects.get(type="CH")
         prompt = prompt_challenge_template.text
         prompt += f"\nTranscript:  {Course.objects.get(id=course_id).transcript}"
+        if level:
+            prompt += f"\nLevel: {level}"
         return prompt
 
     def generate_challenge(self, student_id, course_id):
         prompt = self.build_challenge_prompt(student_id, course_id)
         return self.llm_service.generate_text(
-            prompt, output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+            prompt, use_cache=False, output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+        )
+
+    def get_unseen_challenge(self, student_id, course):
+        challenges_made = Student.objects.get(id=student_id).challenges.all()
+        return (
+            course.challenges.exclude(id__in=challenges_made).order_by("level").first()
         )
 
+    def generate_and_store_challenge(self, student_id, course):
+        lock = (
+            advisory_lock(
+                f"challenge-generation:{course.id}",
+                settings.CHALLENGE_GENERATION_LOCK_TIMEOUT,
+            )
+            if settings.CHALLENGE_GENERATION_DB_LOCK
+            else nullcontext(True)
+        )
+        with lock as acquired:
+            # Another worker may have stored a challenge while we waited.
+            new_challenge = self.get_unseen_challenge(student_id, course)
+            if new_challenge:
+                return new_challenge
+            if not acquired:
+                self.logger.warning(
+                    f"Timed out waiting for challenge generation of course {course.id}"
+                )
+                return None
+
+            generated_challenge = self.generate_challenge(student_id, course.id)
+            if generated_challenge:
+                return Challenge.objects.create(text=generated_challenge, course=course)
+            return None
+
     def get_challenge(self, student_id, course_id):
         try:
             course = Course.objects.get(id=course_id)
-            challenges_made = Student.objects.get(id=student_id).challenges.all()
-            new_challenge = (
-                course.challenges.exclude(id__in=challenges_made)
-                .order_by("level")
-                .first()
-            )
+            new_challenge = self.get_unseen_challenge(student_id, course)
             if new_challenge:
+                CHALLENGES_SERVED.labels("pool").inc()
                 return {
                     "challenge_id": new_challenge.id,
                     "challenge": new_challenge.text,
                 }
 
-            generated_challenge = self.generate_challenge(student_id, course_id)
+            new_challenge = challenge_generation.do(
+                f"challenge:{course_id}",
+                lambda: self.generate_and_store_challenge(student_id, course),
+                timeout=settings.CHALLENGE_GENERATION_WAIT_TIMEOUT,
+            )
 
+            challenge = {
+                "challenge_id": new_challenge.id,
+                "challenge": new_challenge.text,
+            }
+            CHALLENGES_SERVED.labels("generated").inc()
+            return challenge
+        except Exception as e:
+            CHALLENGES_SERVED.labels("error").inc()
+            self.logger.warning(e)
+            return None
+
+    async def agenerate_challenge(self, student_id, course_id):
+        prompt = await sync_to_async(self.build_challenge_prompt)(student_id, course_id)
+        return await self.llm_service.agenerate_text(
+            prompt, use_cache=False, output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+        )
+
+    async def aget_unseen_challenge(self, student_id, course):
+        student = await Student.objects.aget(id=student_id)
+        return (
+            await course.challenges.exclude(id__in=student.challenges.all())
+            .order_by("level")
+            .afirst()
+        )
+
+    async def agenerate_and_store_challenge(self, student_id, course):
+        lock = (
+            aadvisory_lock(
+                f"challenge-generation:{course.id}",
+                settings.CHALLENGE_GENERATION_LOCK_TIMEOUT,
+            )
+            if settings.CHALLENGE_GENERATION_DB_LOCK
+            else nullcontext(True)
+        )
+        async with lock as acquired:
+            new_challenge = await self.aget_unseen_challenge(student_id, course)
+            if new_challenge:
+                return new_challenge
+            if not acquired:
+                self.logger.warning(
+                    f"Timed out waiting for challenge generation of course {course.id}"
+                )
+                return None
+
+            generated_challenge = await self.agenerate_challenge(student_id, course.id)
             if generated_challenge:
-                new_challenge = Challenge.objects.create(
+                return await Challenge.objects.acreate(
                     text=generated_challenge, course=course
                 )
+            return None
+
+    async def aget_challenge(self, student_id, course_id):
+        try:
+            course = await Course.objects.aget(id=course_id)
+            new_challenge = await self.aget_unseen_challenge(student_id, course)
+            if new_challenge:
+                CHALLENGES_SERVED.labels("pool").inc()
+                return {
+                    "challenge_id": new_challenge.id,
+                    "challenge": new_challenge.text,
+                }
+
+            new_challenge = await async_challenge_generation.do(
+                f"challenge:{course_id}",
+                lambda: self.agenerate_and_store_challenge(student_id, course),
+                timeout=settings.CHALLENGE_GENERATION_WAIT_TIMEOUT,
+            )
 
-            return {"challenge_id": new_challenge.id, "challenge": new_challenge.text}
+            challenge = {
+                "challenge_id": new_challenge.id,
+                "challenge": new_challenge.text,
+            }
+            CHALLENGES_SERVED.labels("generated").inc()
+            return challenge
         except Exception as e:
+            CHALLENGES_SERVED.labels("error").inc()
             self.logger.warning(e)
             return None
 
@@ -73,29 +191,111 @@ class ChallengeService:
             prompt, output_schema=settings.OPENAI_FEEDBACK_SCHEMA
         )
 
+    def store_feedback(self, student_id, challenge, feedback, moment):
+        with transaction.atomic():
+            save_score(student_id, challenge.id, feedback, moment)
+            Student.challenges.through.objects.bulk_create(
+                [
+                    Student.challenges.through(
+                        student_id=student_id, challenge_id=challenge.id
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+            (
+                is_spaced_repetition_check(student_id, challenge.course_id, moment)
+                if moment
+                else None
+            )
+
     def get_feedback(
-        self, student_id, challenge_id, answer_type, student_answer, moment=None
+        self, student_id, challenge, answer_type, student_answer, moment=None
     ):
+        audio_file = (
+            student_answer if answer_type == settings.ANSWER_TYPE_AUDIO else None
+        )
         try:
-            file_path = (
-                student_answer if answer_type == settings.ANSWER_TYPE_AUDIO else None
-            )
-            if file_path:
-                student_answer = self.llm_service.get_text_from_audio(file_path)
-            challenge = Challenge.objects.get(id=challenge_id)
+            if audio_file:
+                observe_audio_upload(audio_file)
+                student_answer = self.llm_service.get_text_from_audio(audio_file)
             feedback = self.generate_feedback(
-                challenge.text, student_answer, challenge.course.id
+                challenge.text, student_answer, challenge.course_id
             )
-            student = Student.objects.get(id=student_id)
-            save_score(student_id, challenge_id, feedback, moment)
-            student.challenges.add(challenge)
-            (
-                is_spaced_repetition_check(student.id, challenge.course.id, moment)
-                if moment
-                else None
+            self.store_feedback(student_id, challenge, feedback, moment)
+            return feedback
+        except Exception as e:
+            self.logger.warning(e)
+        finally:
+            # Closing a spooled upload also removes its temporary file.
+            if audio_file:
+                release_audio_upload(audio_file)
+        return None
+
+    async def agenerate_feedback(self, challenge_text, student_answer, course_id):
+        prompt = await sync_to_async(self.build_feedback_prompt)(
+            challenge_text, student_answer, course_id
+        )
+        return await self.llm_service.agenerate_text(
+            prompt, output_schema=settings.OPENAI_FEEDBACK_SCHEMA
+        )
+
+    async def aget_feedback(
+        self, student_id, challenge, answer_type, student_answer, moment=None
+    ):
+        audio_file = (
+            student_answer if answer_type == settings.ANSWER_TYPE_AUDIO else None
+        )
+        try:
+            if audio_file:
+                observe_audio_upload(audio_file)
+                student_answer = await self.llm_service.aget_text_from_audio(audio_file)
+            feedback = await self.agenerate_feedback(
+                challenge.text, student_answer, challenge.course_id
+            )
+            await sync_to_async(self.store_feedback)(
+                student_id, challenge, feedback, moment
             )
-            delete_temp_file(file_path) if file_path else None
             return feedback
         except Exception as e:
             self.logger.warning(e)
+        finally:
+            if audio_file:
+                release_audio_upload(audio_file)
         return None
+
+    async def astream_feedback(
+        self, student_id, challenge, answer_type, student_answer, moment=None
+    ):
+        """
+        Async variant of get_feedback that yields (event, data) pairs: a
+        "feedback" event with each new piece of feedback text as the model
+        writes it, then "done" with the stored feedback, or "error".
+        """
+        audio_file = (
+            student_answer if answer_type == settings.ANSWER_TYPE_AUDIO else None
+        )
+        try:
+            if audio_file:
+                observe_audio_upload(audio_file)
+                student_answer = await self.llm_service.aget_text_from_audio(audio_file)
+            prompt = await sync_to_async(self.build_feedback_prompt)(
+                challenge.text, student_answer, challenge.course_id
+            )
+            feedback_text, feedback = "", None
+            async for parsed, feedback in self.llm_service.astream_text(
+                prompt, output_schema=settings.OPENAI_FEEDBACK_SCHEMA
+            ):
+                text = (parsed or {}).get("feedback") or ""
+                if len(text) > len(feedback_text):
+                    yield "feedback", {"delta": text[len(feedback_text) :]}
+                    feedback_text = text
+            await sync_to_async(self.store_feedback)(
+                student_id, challenge, feedback, moment
+            )
+            yield "done", {"feedback": feedback}
+        except Exception as e:
+            self.logger.warning(e)
+            yield "error", {"error": "Feedback could not be generated."}
+        finally:
+            if audio_file:
+                release_audio_upload(audio_file)
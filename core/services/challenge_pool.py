@@ -0,0 +1,102 @@
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils.timezone import now
+
+from core.models import Challenge, Course
+from core.services.challenge import ChallengeService
+from core.services.single_flight import try_advisory_lock
+
+
+class ChallengePoolService:
+    """
+    Keeps a pool of unseen, unverified challenges per course and level so that
+    get_challenge can serve a stored challenge instead of waiting on the LLM.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(settings.LOGGER_NAME)
+        self.challenge_service = ChallengeService()
+
+    def get_pool_target(self, active_students):
+        target = math.ceil(active_students * settings.CHALLENGE_POOL_PER_STUDENT)
+        return max(
+            settings.CHALLENGE_POOL_MIN_SIZE,
+            min(target, settings.CHALLENGE_POOL_MAX_SIZE),
+        )
+
+    def get_active_students(self, course_ids=None):
+        since = now() - timedelta(days=settings.CHALLENGE_POOL_ACTIVE_DAYS)
+        courses = Course.objects.all()
+        if course_ids:
+            courses = courses.filter(id__in=course_ids)
+        return dict(
+            courses.annotate(
+                active_students=Count(
+                    "students",
+                    filter=Q(students__challenge_stats__created_at__gte=since),
+                    distinct=True,
+                )
+            ).values_list("id", "active_students")
+        )
+
+    def get_pool_sizes(self, course_ids=None):
+        challenges = Challenge.objects.filter(
+            is_active=True, verified=False, students__isnull=True
+        )
+        if course_ids:
+            challenges = challenges.filter(course_id__in=course_ids)
+        return {
+            (row["course_id"], row["level"]): row["total"]
+            for row in challenges.values("course_id", "level").annotate(
+                total=Count("id")
+            )
+        }
+
+    def generate_pool_challenge(self, course_id, level):
+        prompt = self.challenge_service.build_challenge_prompt(
+            None, course_id, level=level
+        )
+        # Pool entries must be distinct, so the response cache is bypassed.
+        generated_challenge = self.challenge_service.llm_service.generate_text(
+            prompt, use_cache=False, output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+        )
+        if not generated_challenge:
+            return None
+        return Challenge.objects.create(
+            text=generated_challenge, course_id=course_id, level=level
+        )
+
+    def refill(self, course_ids=None):
+        """
+        Generate the missing pool challenges. Only one refill runs at a time
+        across processes, a concurrent one returns 0 right away instead of
+        generating the same challenges again.
+        """
+        with try_advisory_lock("challenge-pool-refill") as acquired:
+            if not acquired:
+                self.logger.info("Challenge pool refill already running, skipped")
+                return 0
+            return self._refill(course_ids)
+
+    def _refill(self, course_ids):
+        active_students = self.get_active_students(course_ids)
+        pool_sizes = self.get_pool_sizes(course_ids)
+        generated = 0
+        for course_id, students in active_students.items():
+            target = self.get_pool_target(students)
+            for level in settings.CHALLENGE_POOL_LEVELS:
+                missing = target - pool_sizes.get((course_id, level), 0)
+                for _ in range(max(missing, 0)):
+                    if self.generate_pool_challenge(course_id, level) is None:
+                        self.logger.warning(
+                            f"Challenge pool refill failed for course {course_id} "
+                            f"and level {level}"
+                        )
+                        break
+                    generated += 1
+        self.logger.info(f"Challenge pool refill generated {generated} challenges")
+        return generated
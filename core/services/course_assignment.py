@@ -0,0 +1,134 @@
+import heapq
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+
+from core.models import Company, Course
+
+COURSE_IDS_CACHE_KEY = "course-assignment:course-ids"
+
+
+def get_cache():
+    return caches[settings.COURSE_ASSIGNMENT_CACHE_ALIAS]
+
+
+def get_course_ids():
+    """Ids of every course, cached so assignment never scans the table."""
+    cache = get_cache()
+    course_ids = cache.get(COURSE_IDS_CACHE_KEY)
+    if course_ids is None:
+        course_ids = list(Course.objects.order_by("id").values_list("id", flat=True))
+        cache.set(
+            COURSE_IDS_CACHE_KEY, course_ids, settings.COURSE_ASSIGNMENT_CACHE_TTL
+        )
+    return course_ids
+
+
+def get_course_load_cache_key(course_id):
+    return f"course-assignment:load:{course_id}"
+
+
+def invalidate_course_ids():
+    """Drop the cached ids and their enrollment counters, reseeded on use."""
+    cache = get_cache()
+    course_ids = cache.get(COURSE_IDS_CACHE_KEY) or []
+    cache.delete_many(
+        [COURSE_IDS_CACHE_KEY]
+        + [get_course_load_cache_key(course_id) for course_id in course_ids]
+    )
+
+
+class RandomCoursePolicy:
+    """Uniform sample of the cached course ids."""
+
+    def choose(self, count, company=None):
+        course_ids = get_course_ids()
+        return random.sample(course_ids, min(count, len(course_ids)))
+
+
+class WeightedCoursePolicy:
+    """
+    Sample weighted by the company plan, COURSE_ASSIGNMENT_PLAN_WEIGHTS maps a
+    plan to {course_id: weight}. Unlisted courses weigh 1, weight 0 excludes.
+    """
+
+    def get_weights(self, company):
+        plan = company.plan if company else Company.PLAN_CHOICES[0][0]
+        weights = settings.COURSE_ASSIGNMENT_PLAN_WEIGHTS.get(plan, {})
+        return {int(course_id): weight for course_id, weight in weights.items()}
+
+    def choose(self, count, company=None):
+        weights = self.get_weights(company)
+        # Weighted sampling without replacement: keep the `count` largest
+        # u ** (1 / weight) keys (Efraimidis-Spirakis).
+        keys = (
+            (random.random() ** (1 / weight), course_id)
+            for course_id in get_course_ids()
+            if (weight := weights.get(course_id, 1)) > 0
+        )
+        return [course_id for _, course_id in heapq.nlargest(count, keys)]
+
+
+class LeastLoadedCoursePolicy:
+    """
+    Courses with the fewest students. Each course has its own enrollment
+    counter in the cache, seeded from the database once per cache TTL and
+    bumped with cache.incr, so concurrent assignments never overwrite each
+    other's counts. Workers only share the counters through a shared cache.
+    """
+
+    def get_loads(self):
+        cache = get_cache()
+        keys = {
+            get_course_load_cache_key(course_id): course_id
+            for course_id in get_course_ids()
+        }
+        loads = {keys[key]: load for key, load in cache.get_many(keys).items()}
+        missing = [course_id for course_id in keys.values() if course_id not in loads]
+        if missing:
+            seeds = dict.fromkeys(missing, 0)
+            seeds.update(
+                Course.objects.filter(id__in=missing)
+                .annotate(load=Count("students"))
+                .values_list("id", "load")
+            )
+            for course_id, load in seeds.items():
+                # add() keeps a counter another worker seeded in the meantime.
+                cache.add(
+                    get_course_load_cache_key(course_id),
+                    load,
+                    settings.COURSE_ASSIGNMENT_CACHE_TTL,
+                )
+            loads.update(seeds)
+        return loads
+
+    def choose(self, count, company=None):
+        loads = self.get_loads()
+        course_ids = heapq.nsmallest(
+            count, loads, key=lambda course_id: (loads[course_id], course_id)
+        )
+        cache = get_cache()
+        for course_id in course_ids:
+            try:
+                cache.incr(get_course_load_cache_key(course_id))
+            except ValueError:
+                # Expired since get_loads, the next call seeds it again.
+                pass
+        return course_ids
+
+
+COURSE_ASSIGNMENT_POLICIES = {
+    "random": RandomCoursePolicy,
+    "weighted": WeightedCoursePolicy,
+    "least_loaded": LeastLoadedCoursePolicy,
+}
+
+
+def get_course_assignment_policy(name=None):
+    name = name or settings.COURSE_ASSIGNMENT_POLICY
+    policy_class = COURSE_ASSIGNMENT_POLICIES.get(name)
+    if policy_class is None:
+        raise ValueError(f"Course assignment policy {name} not supported.")
+    return policy_class()
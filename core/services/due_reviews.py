@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models import Q
+
+from core.models import SpacedRepetition, SpacedRepetitionDue
+
+MOMENTS = (1, 2, 3)
+
+
+def build_due_reviews(spaced_repetition):
+    return [
+        SpacedRepetitionDue(
+            spaced_repetition_id=spaced_repetition.id,
+            student_id=spaced_repetition.student_id,
+            course_id=spaced_repetition.course_id,
+            moment=moment,
+            due_at=getattr(spaced_repetition, f"moment{moment}"),
+        )
+        for moment in MOMENTS
+        if not getattr(spaced_repetition, f"is_completed{moment}")
+    ]
+
+
+def create_due_reviews(spaced_repetitions, batch_size=1000):
+    """Insert the pending moments of newly created SpacedRepetition rows."""
+    SpacedRepetitionDue.objects.bulk_create(
+        [
+            due_review
+            for spaced_repetition in spaced_repetitions
+            for due_review in build_due_reviews(spaced_repetition)
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def sync_due_reviews(spaced_repetitions, batch_size=1000):
+    """
+    Rebuild the due rows of SpacedRepetition rows whose moments changed. A
+    moment still due at the same time keeps its processed_at, so the
+    scheduler does not handle it twice.
+    """
+    due_reviews = SpacedRepetitionDue.objects.filter(
+        spaced_repetition_id__in=[
+            spaced_repetition.id for spaced_repetition in spaced_repetitions
+        ]
+    )
+    # No savepoint of its own, the rescheduling calls it inside theirs.
+    with transaction.atomic(savepoint=False):
+        processed = {
+            (spaced_repetition_id, moment, due_at): processed_at
+            for spaced_repetition_id, moment, due_at, processed_at in (
+                due_reviews.filter(processed_at__isnull=False).values_list(
+                    "spaced_repetition_id", "moment", "due_at", "processed_at"
+                )
+            )
+        }
+        due_reviews.delete()
+        new_due_reviews = [
+            due_review
+            for spaced_repetition in spaced_repetitions
+            for due_review in build_due_reviews(spaced_repetition)
+        ]
+        for due_review in new_due_reviews:
+            due_review.processed_at = processed.get(
+                (due_review.spaced_repetition_id, due_review.moment, due_review.due_at)
+            )
+        SpacedRepetitionDue.objects.bulk_create(
+            new_due_reviews, batch_size=batch_size, ignore_conflicts=True
+        )
+
+
+def complete_due_review(student_id, course_id, moment):
+    return SpacedRepetitionDue.objects.filter(
+        student_id=student_id, course_id=course_id, moment=moment
+    ).delete()
+
+
+def rebuild_due_reviews(batch_size=1000):
+    """Recreate the whole queue from SpacedRepetition, in id order batches."""
+    SpacedRepetitionDue.objects.all().delete()
+    last_id = 0
+    while True:
+        spaced_repetitions = list(
+            SpacedRepetition.objects.filter(id__gt=last_id).order_by("id")[:batch_size]
+        )
+        if not spaced_repetitions:
+            return
+        create_due_reviews(spaced_repetitions, batch_size)
+        last_id = spaced_repetitions[-1].id
+
+
+def iter_due_reviews(until, batch_size=1000):
+    """
+    Yield batches of unprocessed reviews due at or before `until`, oldest
+    first. Keyset pagination on (due_at, id) keeps every batch an index range
+    scan, and rows a handler leaves unprocessed are not read again.
+    """
+    pending = SpacedRepetitionDue.objects.filter(
+        processed_at__isnull=True, due_at__lte=until
+    ).order_by("due_at", "id")
+    last = None
+    while True:
+        batch = pending
+        if last is not None:
+            batch = batch.filter(
+                Q(due_at__gt=last.due_at) | Q(due_at=last.due_at, id__gt=last.id)
+            )
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.utils.timezone import now
+
+from core.models import SpacedRepetition, Student
+from core.services.due_reviews import create_due_reviews
+from core.services.scheduling import get_review_policy, get_student_companies
+
+
+def create_spaced_repetitions(pairs, batch_size=1000):
+    """
+    Create the SpacedRepetition schedule for (student_id, course_id) pairs
+    that do not have one yet, with their due review rows: one query for the
+    existing pairs, one bulk insert, one query for the new ids and one bulk
+    insert of due reviews, plus the students' companies when a company has
+    its own review policy. Returns the number of schedules created.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+
+    student_ids = {student_id for student_id, _ in pairs}
+    course_ids = {course_id for _, course_id in pairs}
+    existing = set(
+        SpacedRepetition.objects.filter(
+            student_id__in=student_ids, course_id__in=course_ids
+        ).values_list("student_id", "course_id")
+    )
+    companies = get_student_companies(student_ids)
+    start = now()
+    moments = {}
+    spaced_repetitions = []
+    for student_id, course_id in pairs - existing:
+        key = (companies.get(student_id), course_id)
+        if key not in moments:
+            moments[key] = get_review_policy(*key).initial_moments(start)
+        moment1, moment2, moment3 = moments[key]
+        spaced_repetitions.append(
+            SpacedRepetition(
+                student_id=student_id,
+                course_id=course_id,
+                moment1=moment1,
+                moment2=moment2,
+                moment3=moment3,
+            )
+        )
+    SpacedRepetition.objects.bulk_create(
+        spaced_repetitions, batch_size=batch_size, ignore_conflicts=True
+    )
+    # ignore_conflicts leaves the primary keys unset, read them back for the
+    # due review queue.
+    new_pairs = pairs - existing
+    create_due_reviews(
+        [
+            spaced_repetition
+            for spaced_repetition in SpacedRepetition.objects.filter(
+                student_id__in=student_ids, course_id__in=course_ids
+            )
+            if (spaced_repetition.student_id, spaced_repetition.course_id) in new_pairs
+        ],
+        batch_size,
+    )
+    return len(spaced_repetitions)
+
+
+def enroll_students(course_id, student_ids, batch_size=1000):
+    """
+    Enroll students in a course in batches. The course links are bulk
+    inserted, which skips m2m_changed, so the schedules are created here.
+    Returns the number of students processed.
+    """
+    enrolled = 0
+    batch = []
+    for student_id in student_ids:
+        batch.append(student_id)
+        if len(batch) == batch_size:
+            enrolled += _enroll_batch(course_id, batch, batch_size)
+            batch = []
+    if batch:
+        enrolled += _enroll_batch(course_id, batch, batch_size)
+    return enrolled
+
+
+def _enroll_batch(course_id, student_ids, batch_size):
+    enroll_pairs([(student_id, course_id) for student_id in student_ids], batch_size)
+    return len(student_ids)
+
+
+def enroll_pairs(pairs, batch_size=1000):
+    """Bulk insert (student_id, course_id) course links and their schedules."""
+    pairs = set(pairs)
+    with transaction.atomic():
+        Student.courses.through.objects.bulk_create(
+            [
+                Student.courses.through(student_id=student_id, course_id=course_id)
+                for student_id, course_id in pairs
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        create_spaced_repetitions(pairs, batch_size)
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LocMemLRUBackend:
+    """In-process LRU, entries are evicted by age (TTL) and by count."""
+
+    def __init__(self, max_entries, **kwargs):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """Delegates to a configured Django cache, size limits come from its OPTIONS."""
+
+    def __init__(self, location=None, **kwargs):
+        self.cache = caches[location or "default"]
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value, ttl):
+        self.cache.set(key, value, timeout=ttl or None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class SQLiteBackend:
+    """On-disk cache shared by every worker on the same host."""
+
+    def __init__(self, location=None, max_entries=512, **kwargs):
+        self.location = str(
+            location or os.path.join(tempfile.gettempdir(), "sirius_llm_cache.sqlite3")
+        )
+        self.max_entries = max_entries
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS llm_cache_accessed_at "
+                "ON llm_cache (accessed_at)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.location, timeout=5)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            connection.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return value
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            connection.execute(
+                "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,),
+            )
+            connection.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM llm_cache")
+
+
+CACHE_BACKENDS = {
+    "locmem": LocMemLRUBackend,
+    "django": DjangoCacheBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+class LLMCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(prompt, model, output_schema, max_tokens):
+        payload = json.dumps(
+            {
+                "prompt": prompt,
+                "model": model,
+                "output_schema": output_schema,
+                "max_tokens": max_tokens,
+            },
+            sort_keys=True,
+        )
+        return f"llm:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    @staticmethod
+    def make_audio_key(audio_file, model, chunk_size=64 * 1024):
+        """Hash the audio in chunks, leaving the file positioned at the start."""
+        digest = hashlib.sha256()
+        audio_file.seek(0)
+        for chunk in iter(lambda: audio_file.read(chunk_size), b""):
+            digest.update(chunk)
+        audio_file.seek(0)
+        return f"transcription:{model}:{digest.hexdigest()}"
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.backend.set(key, value, self.ttl)
+
+    def clear(self):
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(name="default"):
+    """Return the process-wide cache configured in settings.LLM_CACHES[name]."""
+    with _caches_lock:
+        if name not in _caches:
+            config = settings.LLM_CACHES[name]
+            backend_class = CACHE_BACKENDS.get(config["BACKEND"])
+            if backend_class is None:
+                raise ValueError(
+                    f"LLM cache backend {config['BACKEND']} not supported."
+                )
+            backend = backend_class(
+                location=config.get("LOCATION"),
+                max_entries=config["MAX_ENTRIES"],
+            )
+            _caches[name] = LLMCache(backend, config["TTL"])
+        return _caches[name]
@@ -1,9 +1,86 @@
+import asyncio
 import logging
+import os
+import weakref
+from functools import lru_cache
 
+import httpx
 import openai
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from pydantic import BaseModel
 
+from core.services.llm_cache import LLMCache, get_llm_cache
+from core.services.monitoring import (
+    LLM_CALLS,
+    LLM_LATENCY,
+    get_llm_schema,
+    observe_llm_usage,
+)
+from core.services.profiling import profile_span, record_llm_usage
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_http_limits():
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_openai_client():
+    """Process-wide sync client, its connection pool is shared by all requests."""
+    return openai.OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        timeout=settings.LLM_HTTP_TIMEOUT,
+        max_retries=settings.LLM_HTTP_MAX_RETRIES,
+        http_client=openai.DefaultHttpxClient(limits=_get_http_limits()),
+    )
+
+
+async def _async_client_lifetime(client):
+    """
+    Parked at its yield while the loop runs. asyncio.run(), used by
+    async_to_sync and the ASGI servers, calls shutdown_asyncgens() before it
+    closes the loop, which resumes the generator and closes the client.
+    """
+    try:
+        yield client
+    finally:
+        try:
+            await client.close()
+        except Exception as e:
+            logging.getLogger(settings.LOGGER_NAME).warning(
+                f"Error closing the OpenAI async client: {e}"
+            )
+
+
+async def get_async_openai_client():
+    """
+    Async client shared by every coroutine running on the current event loop.
+
+    httpx connections are bound to the loop that opened them, so one client is
+    kept per loop and closed when the loop shuts down. Under ASGI there is a
+    single loop and therefore a single pool per process; under WSGI every
+    async_to_sync call runs its own loop and client.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=settings.LLM_HTTP_TIMEOUT,
+            max_retries=settings.LLM_HTTP_MAX_RETRIES,
+            http_client=openai.DefaultAsyncHttpxClient(limits=_get_http_limits()),
+        )
+        # The loop only tracks its generators weakly, keep the lifetime alive.
+        entry = _async_clients[loop] = (client, _async_client_lifetime(client))
+        await entry[1].__anext__()
+    return entry[0]
+
 
 class LLMService:
     def __init__(self, provider=settings.LLM_PROVIDER):
@@ -12,21 +89,104 @@ class LLMService:
         self.model = settings.LLM_MODEL
         self.model_speech_to_text = settings.LLM_MODEL_SPEECH_TO_TEXT
         self.max_tokens = settings.LLM_MAX_TOKENS
+        self.cache = get_llm_cache()
+        self.transcription_cache = get_llm_cache("transcription")
 
     def _get_provider(self, provider):
         if provider == settings.OPENAI_PROVIDER:
             return OpenAIProvider()
         raise ValueError("LLM API Provider not supported.")
 
-    def generate_text(self, prompt, **kwargs):
-        return self.provider.generate_text(
-            prompt, self.model, self.max_tokens, **kwargs
-        )
+    def _get_cache_key(self, prompt, use_cache, **kwargs):
+        output_schema = kwargs.get("output_schema", None)
+        if not use_cache or output_schema not in settings.LLM_CACHED_SCHEMAS:
+            return None
+        return LLMCache.make_key(prompt, self.model, output_schema, self.max_tokens)
 
-    def get_text_from_audio(self, audio_file_path):
-        return self.provider.get_text_from_audio(
-            self.model_speech_to_text, audio_file_path
-        )
+    def _count_call(self, schema, response):
+        LLM_CALLS.labels(schema, "error" if response is None else "ok").inc()
+
+    def generate_text(self, prompt, use_cache=True, **kwargs):
+        schema = get_llm_schema(kwargs.get("output_schema"))
+        cache_key = self._get_cache_key(prompt, use_cache, **kwargs)
+        if cache_key:
+            cached_response = self.cache.get(cache_key)
+            if cached_response is not None:
+                LLM_CALLS.labels(schema, "cached").inc()
+                return cached_response
+
+        with profile_span("llm"), LLM_LATENCY.labels(schema).time():
+            response = self.provider.generate_text(
+                prompt, self.model, self.max_tokens, **kwargs
+            )
+        self._count_call(schema, response)
+        if cache_key and response is not None:
+            self.cache.set(cache_key, response)
+        return response
+
+    async def agenerate_text(self, prompt, use_cache=True, **kwargs):
+        schema = get_llm_schema(kwargs.get("output_schema"))
+        cache_key = self._get_cache_key(prompt, use_cache, **kwargs)
+        if cache_key:
+            cached_response = await sync_to_async(self.cache.get)(cache_key)
+            if cached_response is not None:
+                LLM_CALLS.labels(schema, "cached").inc()
+                return cached_response
+
+        with profile_span("llm"), LLM_LATENCY.labels(schema).time():
+            response = await self.provider.agenerate_text(
+                prompt, self.model, self.max_tokens, **kwargs
+            )
+        self._count_call(schema, response)
+        if cache_key and response is not None:
+            await sync_to_async(self.cache.set)(cache_key, response)
+        return response
+
+    async def astream_text(self, prompt, **kwargs):
+        schema = get_llm_schema(kwargs.get("output_schema"))
+        content = None
+        with profile_span("llm"), LLM_LATENCY.labels(schema).time():
+            async for parsed, content in self.provider.astream_text(
+                prompt, self.model, self.max_tokens, **kwargs
+            ):
+                yield parsed, content
+        self._count_call(schema, content)
+
+    def get_text_from_audio(self, audio_file):
+        with profile_span("audio"):
+            cache_key = LLMCache.make_audio_key(audio_file, self.model_speech_to_text)
+        transcription = self.transcription_cache.get(cache_key)
+        if transcription is not None:
+            LLM_CALLS.labels("transcription", "cached").inc()
+            return transcription
+
+        with profile_span("stt"), LLM_LATENCY.labels("transcription").time():
+            transcription = self.provider.get_text_from_audio(
+                self.model_speech_to_text, audio_file
+            )
+        self._count_call("transcription", transcription)
+        if transcription is not None:
+            self.transcription_cache.set(cache_key, transcription)
+        return transcription
+
+    async def aget_text_from_audio(self, audio_file):
+        with profile_span("audio"):
+            cache_key = await sync_to_async(LLMCache.make_audio_key)(
+                audio_file, self.model_speech_to_text
+            )
+        transcription = await sync_to_async(self.transcription_cache.get)(cache_key)
+        if transcription is not None:
+            LLM_CALLS.labels("transcription", "cached").inc()
+            return transcription
+
+        with profile_span("stt"), LLM_LATENCY.labels("transcription").time():
+            transcription = await self.provider.aget_text_from_audio(
+                self.model_speech_to_text, audio_file
+            )
+        self._count_call("transcription", transcription)
+        if transcription is not None:
+            await sync_to_async(self.transcription_cache.set)(cache_key, transcription)
+        return transcription
 
 
 class OpenAIProvider:
@@ -49,37 +209,106 @@ class OpenAIProvider:
 
     def __init__(self):
         self.logger = logging.getLogger(settings.LOGGER_NAME)
-        openai.api_key = settings.OPENAI_API_KEY
-        self.client = openai.OpenAI()
-
-    def generate_text(self, prompt, model, max_tokens, **kwargs):
-        output_schema = kwargs.get("output_schema", None)
+        self.client = get_openai_client()
 
+    def _get_output_schema(self, output_schema):
         if output_schema == settings.OPENAI_CHALLENGE_SCHEMA:
-            output_schema = self.ChallengeOutputSchema
+            return self.ChallengeOutputSchema
         elif output_schema == settings.OPENAI_FEEDBACK_SCHEMA:
-            output_schema = self.FeedbackOutputSchema
-        else:
-            output_schema = self.MessageOutputSchema
+            return self.FeedbackOutputSchema
+        return self.MessageOutputSchema
+
+    def _build_parse_kwargs(self, prompt, model, max_tokens, **kwargs):
+        return {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "response_format": self._get_output_schema(
+                kwargs.get("output_schema", None)
+            ),
+        }
 
+    def generate_text(self, prompt, model, max_tokens, **kwargs):
         try:
             response = self.client.beta.chat.completions.parse(
-                model=model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=max_tokens,
-                response_format=output_schema,
+                **self._build_parse_kwargs(prompt, model, max_tokens, **kwargs)
+            )
+            record_llm_usage(response.usage)
+            observe_llm_usage(
+                get_llm_schema(kwargs.get("output_schema")), response.usage
             )
             return response.choices[0].message.content
         except Exception as e:
             self.logger.warning(f"Error requesting {model} OpenAI: {e} ")
             return None
 
-    def get_text_from_audio(self, model, audio_file_path):
+    async def agenerate_text(self, prompt, model, max_tokens, **kwargs):
+        try:
+            client = await get_async_openai_client()
+            response = await client.beta.chat.completions.parse(
+                **self._build_parse_kwargs(prompt, model, max_tokens, **kwargs)
+            )
+            record_llm_usage(response.usage)
+            observe_llm_usage(
+                get_llm_schema(kwargs.get("output_schema")), response.usage
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            self.logger.warning(f"Error requesting {model} OpenAI: {e} ")
+            return None
+
+    async def astream_text(self, prompt, model, max_tokens, **kwargs):
+        """
+        Yield (parsed, content) for every content chunk: the output parsed so
+        far as a partial dict and the raw JSON received so far.
+        """
+        try:
+            client = await get_async_openai_client()
+            async with client.beta.chat.completions.stream(
+                **self._build_parse_kwargs(prompt, model, max_tokens, **kwargs),
+                stream_options={"include_usage": True},
+            ) as stream:
+                async for event in stream:
+                    if event.type == "content.delta":
+                        yield event.parsed, event.snapshot
+                # Sent in a last chunk because of include_usage.
+                usage = (await stream.get_final_completion()).usage
+            record_llm_usage(usage)
+            observe_llm_usage(get_llm_schema(kwargs.get("output_schema")), usage)
+        except Exception as e:
+            self.logger.warning(f"Error requesting {model} OpenAI: {e} ")
+
+    def _get_audio_upload(self, audio_file):
+        """
+        (filename, content, content_type) tuple for the transcription request,
+        the filename extension tells the model the audio format.
+        """
+        audio_file.seek(0)
+        return (
+            os.path.basename(audio_file.name or "audio"),
+            audio_file,
+            getattr(audio_file, "content_type", None),
+        )
+
+    def get_text_from_audio(self, model, audio_file):
         try:
-            audio_file = open(audio_file_path, "rb")
             transcription = self.client.audio.transcriptions.create(
                 model=model,
-                file=audio_file,
+                file=self._get_audio_upload(audio_file),
+            )
+            return transcription.text
+        except Exception as e:
+            self.logger.warning(f"Error requesting {model} OpenAI: {e} ")
+            return None
+
+    async def aget_text_from_audio(self, model, audio_file):
+        try:
+            filename, _, content_type = self._get_audio_upload(audio_file)
+            content = await sync_to_async(audio_file.read)()
+            client = await get_async_openai_client()
+            transcription = await client.audio.transcriptions.create(
+                model=model,
+                file=(filename, content, content_type),
             )
             return transcription.text
         except Exception as e:
@@ -0,0 +1,289 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.utils.timezone import now
+
+from core.models import ChallengeStat, MetricsRollup, StudentMetrics
+
+ROLLUP_FIELDS = ["stats_count", "score_sum", "completed_count", "total_minutes"]
+TOP_STUDENTS_LIMIT = 6
+
+
+def _upsert_increment(model, conflict_fields, values, increments):
+    """
+    INSERT ... ON CONFLICT DO UPDATE adding `increments` to the existing row,
+    so concurrent writers never lose updates (Postgres and SQLite >= 3.24).
+    """
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns, params = [], []
+    for name, value in [*values.items(), *increments.items()]:
+        field = model._meta.get_field(name)
+        columns.append(quote(field.column))
+        params.append(field.get_db_prep_save(value, connection))
+    conflict_columns = [
+        quote(model._meta.get_field(name).column) for name in conflict_fields
+    ]
+    assignments = [
+        (
+            f"{column} = EXCLUDED.{column}"
+            if index < len(values)
+            else f"{column} = {table}.{column} + EXCLUDED.{column}"
+        )
+        for index, column in enumerate(columns)
+        if column not in conflict_columns
+    ]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) "
+        f"DO UPDATE SET {', '.join(assignments)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def get_scope(company_id):
+    return str(company_id) if company_id else MetricsRollup.GLOBAL_SCOPE
+
+
+def get_stat_contribution(score, skipped, estimated_minutes, sign=1):
+    score = Decimal(score or 0)
+    return {
+        "stats_count": sign,
+        "score_sum": sign * score,
+        "completed_count": sign if score > 0 else 0,
+        "total_minutes": 0 if skipped else sign * estimated_minutes,
+    }
+
+
+def get_stat_snapshot(challenge_stat_id):
+    """The values of a stored ChallengeStat that feed the rollups."""
+    return (
+        ChallengeStat.objects.filter(id=challenge_stat_id)
+        .values(
+            "score",
+            "skipped",
+            "moment",
+            "student_id",
+            company_id=F("student__company_id"),
+            estimated_minutes=F("challenge__estimated_minutes"),
+        )
+        .first()
+    )
+
+
+def _decrement(model, lookup, decrements):
+    # Removals only touch existing rows, rows being cascade-deleted are skipped.
+    model.objects.filter(**lookup).update(
+        **{field: F(field) + value for field, value in decrements.items()},
+        updated_at=now(),
+    )
+
+
+def apply_stat_snapshot(snapshot, sign=1):
+    contribution = get_stat_contribution(
+        snapshot["score"], snapshot["skipped"], snapshot["estimated_minutes"], sign
+    )
+    for company_id in {None, snapshot["company_id"]}:
+        lookup = {"scope": get_scope(company_id), "moment": snapshot["moment"]}
+        if sign > 0:
+            _upsert_increment(
+                MetricsRollup,
+                ["scope", "moment"],
+                {**lookup, "updated_at": now()},
+                contribution,
+            )
+        else:
+            _decrement(MetricsRollup, lookup, contribution)
+
+    completed_count = contribution["completed_count"]
+    if completed_count > 0:
+        _upsert_increment(
+            StudentMetrics,
+            ["student_id"],
+            {
+                "student_id": snapshot["student_id"],
+                "company_id": snapshot["company_id"],
+                "updated_at": now(),
+            },
+            {"completed_count": completed_count},
+        )
+    elif completed_count < 0:
+        _decrement(
+            StudentMetrics,
+            {"student_id": snapshot["student_id"]},
+            {"completed_count": completed_count},
+        )
+
+
+def _rollup_annotations():
+    return {
+        "stats_count": Count("id"),
+        "score_sum": Sum("score"),
+        "completed_count": Count("id", filter=Q(score__gt=0)),
+        "total_minutes": Sum("challenge__estimated_minutes", filter=Q(skipped=False)),
+    }
+
+
+def _get_rollup_values(row, sign=1):
+    return {field: sign * (row[field] or 0) for field in ROLLUP_FIELDS}
+
+
+def subtract_stats(challenge_stats):
+    """
+    Remove the ChallengeStat rows of a queryset that is about to be deleted
+    from the rollups: one aggregate per (company, moment) and one UPDATE of
+    the student metrics, whatever the number of rows.
+    """
+    rows = (
+        challenge_stats.order_by()
+        .values("student__company_id", "moment")
+        .annotate(**_rollup_annotations())
+    )
+    for row in rows:
+        for company_id in {None, row["student__company_id"]}:
+            _decrement(
+                MetricsRollup,
+                {"scope": get_scope(company_id), "moment": row["moment"]},
+                _get_rollup_values(row, sign=-1),
+            )
+
+    completed = challenge_stats.filter(score__gt=0).order_by()
+    StudentMetrics.objects.filter(student_id__in=completed.values("student_id")).update(
+        completed_count=F("completed_count")
+        - Subquery(
+            completed.filter(student_id=OuterRef("student_id"))
+            .values("student_id")
+            .annotate(total=Count("id"))
+            .values("total")
+        ),
+        updated_at=now(),
+    )
+
+
+def move_student_metrics(student_id, old_company_id, new_company_id):
+    """Re-attribute a student's stats to their new company's rollups."""
+    rows = (
+        ChallengeStat.objects.filter(student_id=student_id)
+        .order_by()
+        .values("moment")
+        .annotate(**_rollup_annotations())
+    )
+    for row in rows:
+        if old_company_id:
+            _decrement(
+                MetricsRollup,
+                {"scope": get_scope(old_company_id), "moment": row["moment"]},
+                _get_rollup_values(row, sign=-1),
+            )
+        if new_company_id:
+            _upsert_increment(
+                MetricsRollup,
+                ["scope", "moment"],
+                {
+                    "scope": get_scope(new_company_id),
+                    "moment": row["moment"],
+                    "updated_at": now(),
+                },
+                _get_rollup_values(row),
+            )
+    StudentMetrics.objects.filter(student_id=student_id).update(
+        company_id=new_company_id, updated_at=now()
+    )
+
+
+def get_top_students(company_id=None):
+    student_metrics = StudentMetrics.objects.filter(completed_count__gt=0)
+    if company_id:
+        student_metrics = student_metrics.filter(company_id=company_id)
+    return list(
+        student_metrics.order_by("-completed_count", "student_id")
+        .values("student__name")
+        .annotate(total_challenges=F("completed_count"))[:TOP_STUDENTS_LIMIT]
+    )
+
+
+def _average(rollups):
+    stats_count = sum(rollup.stats_count for rollup in rollups)
+    if not stats_count:
+        return None
+    return sum(rollup.score_sum for rollup in rollups) / stats_count
+
+
+def summarize_rollups(rollups, company_id=None):
+    by_moment = {rollup.moment: rollup for rollup in rollups}
+    summary = {"top_students": get_top_students(company_id)}
+    for moment in (1, 2, 3):
+        moment_rollups = [by_moment[moment]] if moment in by_moment else []
+        summary[f"average_scores_moment{moment}"] = {
+            "average_score": _average(moment_rollups)
+        }
+    summary["total_time"] = {
+        "total_time": (
+            sum(rollup.total_minutes for rollup in rollups) if rollups else None
+        )
+    }
+    summary["total_completed_challenges"] = sum(
+        rollup.completed_count for rollup in rollups
+    )
+    summary["average_scores_global"] = {"average_score": _average(rollups)}
+    return summary
+
+
+def get_materialized_metrics(company_id=None):
+    scopes = [MetricsRollup.GLOBAL_SCOPE]
+    if company_id:
+        scopes.append(get_scope(company_id))
+    rollups = {scope: [] for scope in scopes}
+    for rollup in MetricsRollup.objects.filter(scope__in=scopes):
+        rollups[rollup.scope].append(rollup)
+
+    metrics = {"global": summarize_rollups(rollups[MetricsRollup.GLOBAL_SCOPE])}
+    if company_id:
+        metrics["company"] = summarize_rollups(
+            rollups[get_scope(company_id)], company_id
+        )
+    return metrics
+
+
+def rebuild_metrics(batch_size=1000):
+    """
+    Recompute every rollup from the ChallengeStat table. The old rows are
+    deleted before the stats are read, in the same transaction: a stat
+    written meanwhile either is read here or waits on the deleted and new
+    rows and then adds its increment to them.
+    """
+    with transaction.atomic():
+        MetricsRollup.objects.all().delete()
+        StudentMetrics.objects.all().delete()
+
+        rows = ChallengeStat.objects.values("student__company_id", "moment").annotate(
+            **_rollup_annotations()
+        )
+        rollups = {}
+        for row in rows:
+            for company_id in {None, row["student__company_id"]}:
+                key = (get_scope(company_id), row["moment"])
+                rollup = rollups.setdefault(
+                    key,
+                    MetricsRollup(scope=key[0], moment=key[1]),
+                )
+                for field in ROLLUP_FIELDS:
+                    setattr(rollup, field, getattr(rollup, field) + (row[field] or 0))
+
+        student_metrics = [
+            StudentMetrics(
+                student_id=row["student_id"],
+                company_id=row["student__company_id"],
+                completed_count=row["completed_count"],
+            )
+            for row in ChallengeStat.objects.filter(score__gt=0)
+            .values("student_id", "student__company_id")
+            .annotate(completed_count=Count("id"))
+        ]
+
+        MetricsRollup.objects.bulk_create(rollups.values(), batch_size=batch_size)
+        StudentMetrics.objects.bulk_create(student_metrics, batch_size=batch_size)
+    return len(rollups), len(student_metrics)
@@ -0,0 +1,149 @@
+import hmac
+import os
+
+from django.conf import settings
+from openai.types import CompletionUsage
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every worker writes
+# its values to files in that directory and /metrics adds them up, so a
+# scrape sees the whole pod and not just the worker that answered it.
+
+REQUEST_LATENCY = Histogram(
+    "sirius_request_duration_seconds",
+    "Request latency by view.",
+    ["view", "method", "status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+LLM_CALLS = Counter(
+    "sirius_llm_calls_total",
+    "LLMService calls by schema and outcome (ok, error or cached).",
+    ["schema", "outcome"],
+)
+LLM_LATENCY = Histogram(
+    "sirius_llm_call_duration_seconds",
+    "LLM provider call latency by schema, cache hits excluded.",
+    ["schema"],
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120),
+)
+LLM_TOKENS = Counter(
+    "sirius_llm_tokens_total",
+    "LLM tokens used by schema and type (prompt or completion).",
+    ["schema", "type"],
+)
+
+CHALLENGES_SERVED = Counter(
+    "sirius_challenges_served_total",
+    "ChallengeService.get_challenge results by source (pool, generated, error).",
+    ["source"],
+)
+
+DB_CONNECTIONS_OPENED = Counter(
+    "sirius_db_connections_opened_total",
+    "New database connections by alias.",
+    ["alias"],
+)
+DB_POOL_SIZE = Gauge(
+    "sirius_db_pool_size",
+    "Connections held by the psycopg pools, by alias.",
+    ["alias"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_AVAILABLE = Gauge(
+    "sirius_db_pool_available",
+    "Idle connections in the psycopg pools, by alias.",
+    ["alias"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "sirius_db_pool_requests_waiting",
+    "Requests waiting for a pooled connection, by alias.",
+    ["alias"],
+    multiprocess_mode="livesum",
+)
+
+AUDIO_UPLOAD_BYTES = Counter(
+    "sirius_audio_upload_bytes_total",
+    "Audio answer bytes received, by storage (memory or disk).",
+    ["storage"],
+)
+AUDIO_DISK_BYTES = Gauge(
+    "sirius_audio_disk_bytes",
+    "Bytes of audio answers currently spooled to temporary files.",
+    multiprocess_mode="livesum",
+)
+
+
+def get_llm_schema(output_schema=None):
+    return output_schema or "message"
+
+
+def observe_llm_usage(schema, usage):
+    # Counting tokens must never fail the call it measures.
+    if not isinstance(usage, CompletionUsage):
+        return
+    LLM_TOKENS.labels(schema, "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(schema, "completion").inc(usage.completion_tokens or 0)
+
+
+def get_audio_storage(audio_file):
+    """Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to a temp file."""
+    return "disk" if hasattr(audio_file, "temporary_file_path") else "memory"
+
+
+def observe_audio_upload(audio_file):
+    storage = get_audio_storage(audio_file)
+    AUDIO_UPLOAD_BYTES.labels(storage).inc(audio_file.size or 0)
+    if storage == "disk":
+        AUDIO_DISK_BYTES.inc(audio_file.size or 0)
+
+
+def release_audio_upload(audio_file):
+    """Close an upload seen by observe_audio_upload, removing its temp file."""
+    if get_audio_storage(audio_file) == "disk":
+        AUDIO_DISK_BYTES.dec(audio_file.size or 0)
+    audio_file.close()
+
+
+def observe_db_pools(connections):
+    """Pool gauges for the connections of this process that use a pool."""
+    for connection in connections.all(initialized_only=True):
+        pool = getattr(connection, "pool", None)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        DB_POOL_SIZE.labels(connection.alias).set(stats.get("pool_size", 0))
+        DB_POOL_AVAILABLE.labels(connection.alias).set(stats.get("pool_available", 0))
+        DB_POOL_WAITING.labels(connection.alias).set(stats.get("requests_waiting", 0))
+
+
+def get_registry():
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """(body, content type) of the Prometheus text exposition."""
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def is_metrics_request_allowed(request):
+    token = settings.PROMETHEUS_METRICS_TOKEN
+    if not token:
+        return settings.DEBUG
+    return hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    )
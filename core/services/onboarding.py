@@ -0,0 +1,232 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DatabaseError, transaction
+from rest_framework.authtoken.models import Token
+
+from core.models import Course, Student
+from core.services.course_assignment import get_course_assignment_policy
+from core.services.enrollment import enroll_pairs
+
+FILE_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+TEXT_FIELDS = ("username", "password", "name", "email")
+
+
+def get_file_format(filename):
+    file_format = FILE_FORMATS.get(os.path.splitext(filename)[1].lower())
+    if file_format is None:
+        raise ValueError("Unsupported file, use .csv or .jsonl.")
+    return file_format
+
+
+def read_rows(lines, file_format):
+    """
+    Yield (line_number, row) from CSV or JSONL text without loading the whole
+    file, row is None when the line cannot be parsed.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+@contextmanager
+def password_hasher(workers):
+    """Yield a function hashing a list of passwords, in a process pool if workers > 1."""
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield lambda passwords: list(
+                pool.map(
+                    make_password,
+                    passwords,
+                    chunksize=max(1, len(passwords) // (workers * 4)),
+                )
+            )
+    else:
+        yield lambda passwords: [make_password(password) for password in passwords]
+
+
+def parse_course_ids(value):
+    """Course ids from a "1;2" string or a JSON list, integers only."""
+    if value in (None, ""):
+        return []
+    if isinstance(value, str):
+        value = value.replace(",", ";").split(";")
+    elif not isinstance(value, list):
+        raise TypeError("courses must be a list.")
+    course_ids = []
+    for course_id in value:
+        if isinstance(course_id, str):
+            if not course_id.strip():
+                continue
+        elif isinstance(course_id, bool) or not isinstance(course_id, int):
+            raise TypeError(f"{course_id!r} is not a course id.")
+        course_ids.append(int(course_id))
+    return course_ids
+
+
+class CompanyOnboarding:
+    """
+    Create users, tokens, students and course links for a company from parsed
+    rows, in batches. Rows need a username and password, and may carry name,
+    email and courses (ids separated by ";" in CSV, a list in JSONL). Rows
+    without courses get `course_ids`, or when that is empty and
+    `assign_courses` names a course assignment policy, courses from it.
+    """
+
+    def __init__(
+        self,
+        company,
+        course_ids=None,
+        batch_size=None,
+        max_rows=None,
+        hash_workers=None,
+        progress=None,
+        assign_courses=None,
+    ):
+        self.company = company
+        self.course_ids = list(course_ids or [])
+        self.batch_size = batch_size or settings.ONBOARDING_BATCH_SIZE
+        self.max_rows = max_rows or settings.ONBOARDING_MAX_ROWS
+        self.hash_workers = (
+            settings.ONBOARDING_HASH_WORKERS if hash_workers is None else hash_workers
+        )
+        self.progress = progress
+        self.course_policy = (
+            get_course_assignment_policy(assign_courses) if assign_courses else None
+        )
+        self.valid_course_ids = set(Course.objects.values_list("id", flat=True))
+        self.usernames = set()
+        self.report = {"processed": 0, "created": 0, "errors": []}
+
+    def add_error(self, line, error):
+        self.report["errors"].append({"line": line, "error": error})
+
+    def run(self, rows):
+        with password_hasher(self.hash_workers) as hash_passwords:
+            batch = []
+            for line, row in rows:
+                if self.report["processed"] >= self.max_rows:
+                    self.add_error(line, f"Row limit of {self.max_rows} reached.")
+                    break
+                self.report["processed"] += 1
+                entry = self.validate_row(line, row)
+                if entry is None:
+                    continue
+                batch.append(entry)
+                if len(batch) == self.batch_size:
+                    self.create_batch(batch, hash_passwords)
+                    batch = []
+            if batch:
+                self.create_batch(batch, hash_passwords)
+        self.report["errors"].sort(key=lambda error: error["line"])
+        return self.report
+
+    def validate_row(self, line, row):
+        if row is None:
+            self.add_error(line, "Row could not be parsed.")
+            return None
+        for field in TEXT_FIELDS:
+            if row.get(field) is not None and not isinstance(row[field], str):
+                self.add_error(line, f"{field} must be a string.")
+                return None
+        username = (row.get("username") or "").strip()
+        password = row.get("password") or ""
+        if not username or not password:
+            self.add_error(line, "username and password are required.")
+            return None
+        if username in self.usernames:
+            self.add_error(line, "Duplicate username in file.")
+            return None
+        try:
+            course_ids = parse_course_ids(row.get("courses")) or self.course_ids
+        except (TypeError, ValueError):
+            self.add_error(line, "courses must be course ids.")
+            return None
+        if not course_ids and self.course_policy:
+            course_ids = self.course_policy.choose(
+                settings.COURSE_ASSIGNMENT_COUNT, self.company
+            )
+        unknown_course_ids = set(course_ids) - self.valid_course_ids
+        if unknown_course_ids:
+            self.add_error(line, f"Unknown courses {sorted(unknown_course_ids)}.")
+            return None
+
+        self.usernames.add(username)
+        return {
+            "line": line,
+            "username": username,
+            "password": password,
+            "name": (row.get("name") or username).strip()[:100],
+            "email": (row.get("email") or "").strip(),
+            "course_ids": course_ids,
+        }
+
+    def create_batch(self, batch, hash_passwords):
+        User = get_user_model()
+        taken = set(
+            User.objects.filter(
+                username__in=[entry["username"] for entry in batch]
+            ).values_list("username", flat=True)
+        )
+        for entry in batch:
+            if entry["username"] in taken:
+                self.add_error(entry["line"], "Username already taken.")
+        batch = [entry for entry in batch if entry["username"] not in taken]
+        if not batch:
+            return
+
+        passwords = hash_passwords([entry["password"] for entry in batch])
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    [
+                        User(
+                            username=entry["username"],
+                            email=entry["email"],
+                            password=password,
+                        )
+                        for entry, password in zip(batch, passwords)
+                    ]
+                )
+                Token.objects.bulk_create(
+                    [Token(key=Token.generate_key(), user=user) for user in users]
+                )
+                students = Student.objects.bulk_create(
+                    [
+                        Student(name=entry["name"], user=user, company=self.company)
+                        for entry, user in zip(batch, users)
+                    ]
+                )
+                enroll_pairs(
+                    [
+                        (student.id, course_id)
+                        for entry, student in zip(batch, students)
+                        for course_id in entry["course_ids"]
+                    ],
+                    self.batch_size,
+                )
+        except DatabaseError as e:
+            for entry in batch:
+                self.add_error(entry["line"], f"Batch failed: {e}")
+            return
+
+        self.report["created"] += len(batch)
+        if self.progress:
+            self.progress(self.report)
@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_profile = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Count and time per span name (db, llm, stt, audio) for one request, plus
+    the LLM tokens used. Filled through profile_span while it is current.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.spans = {}
+        self.llm_tokens = 0
+
+    def add(self, name, duration):
+        span = self.spans.setdefault(name, {"count": 0, "duration": 0.0})
+        span["count"] += 1
+        span["duration"] += duration
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def as_dict(self):
+        data = {
+            f"{name}_{key}": round(value * 1000, 2) if key == "duration" else value
+            for name, span in self.spans.items()
+            for key, value in span.items()
+        }
+        data["llm_tokens"] = self.llm_tokens
+        data["total_duration"] = round((self.total or 0) * 1000, 2)
+        return data
+
+    def server_timing(self):
+        """Server-Timing header value, durations in milliseconds."""
+        metrics = []
+        for name, span in self.spans.items():
+            description = f"{span['count']} calls"
+            if name == "llm":
+                description += f", {self.llm_tokens} tokens"
+            metrics.append(
+                f'{name};dur={span["duration"] * 1000:.1f};desc="{description}"'
+            )
+        metrics.append(f"total;dur={(self.total or 0) * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+def get_current_profile():
+    return _current_profile.get()
+
+
+@contextmanager
+def request_profile(profile=None):
+    """Make `profile`, or a new one, current for the block."""
+    profile = profile or RequestProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.finish()
+        _current_profile.reset(token)
+
+
+@contextmanager
+def profile_span(name):
+    """Time the block into the current request profile, if there is one."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - started)
+
+
+def record_llm_usage(usage):
+    profile = _current_profile.get()
+    if profile is not None and usage is not None:
+        profile.llm_tokens += usage.total_tokens or 0
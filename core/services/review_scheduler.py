@@ -0,0 +1,70 @@
+import logging
+
+from django.conf import settings
+from django.dispatch import Signal
+from django.utils.timezone import now
+
+from core.models import Course, SpacedRepetitionDue
+from core.services.challenge import ChallengeService
+from core.services.due_reviews import iter_due_reviews
+
+# Sent once per processed batch with `due_reviews`, a list of
+# SpacedRepetitionDue, for notification channels to hook into.
+review_due = Signal()
+
+
+class DueReviewProcessor:
+    """
+    Scan due reviews in batches and, per `action`, pre-generate an unseen
+    challenge for each student and course, or send `review_due`. Processed
+    rows get processed_at so the next run skips them.
+    """
+
+    ACTIONS = ("challenges", "notify")
+
+    def __init__(self, action="challenges", batch_size=None):
+        if action not in self.ACTIONS:
+            raise ValueError(f"Due review action {action} not supported.")
+        self.action = action
+        self.batch_size = batch_size or settings.DUE_REVIEWS_BATCH_SIZE
+        self.logger = logging.getLogger(settings.LOGGER_NAME)
+        self.challenge_service = ChallengeService()
+
+    def run(self, until=None):
+        until = until or now()
+        processed = 0
+        for batch in iter_due_reviews(until, self.batch_size):
+            done = self.process_batch(batch)
+            SpacedRepetitionDue.objects.filter(
+                id__in=[due_review.id for due_review in done]
+            ).update(processed_at=now())
+            processed += len(done)
+        self.logger.info(f"Processed {processed} due reviews")
+        return processed
+
+    def process_batch(self, batch):
+        if self.action == "notify":
+            review_due.send(sender=self.__class__, due_reviews=batch)
+            return batch
+
+        courses = Course.objects.in_bulk({due_review.course_id for due_review in batch})
+        done = []
+        for due_review in batch:
+            course = courses[due_review.course_id]
+            try:
+                challenge = self.challenge_service.get_unseen_challenge(
+                    due_review.student_id, course
+                ) or self.challenge_service.generate_and_store_challenge(
+                    due_review.student_id, course
+                )
+            except Exception as e:
+                self.logger.warning(e)
+                challenge = None
+            if challenge is None:
+                self.logger.warning(
+                    f"No review challenge for student {due_review.student_id} "
+                    f"and course {due_review.course_id}"
+                )
+                continue
+            done.append(due_review)
+        return done
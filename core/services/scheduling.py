@@ -0,0 +1,230 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Avg, Max
+from django.utils.timezone import now
+
+from core.models import ChallengeStat, SpacedRepetition, Student
+from core.services.due_reviews import sync_due_reviews
+
+# Enrollment computes the moments just before created_at is set, recomputed
+# moments this close to the stored ones are left alone.
+RESCHEDULE_TOLERANCE = timedelta(minutes=1)
+
+DEFAULT_REVIEW_POLICY = {
+    # Days from enrollment to each moment for a student without scores.
+    "intervals": [1, 7, 30],
+    "ease": 2.5,
+    "min_ease": 1.3,
+    # Scores are out of max_score, below pass_score the next moment comes
+    # after the first interval again.
+    "pass_score": 6,
+    "max_score": 10,
+}
+
+
+class ReviewPolicy:
+    """
+    SM-2 style schedule for the three review moments. Every scored moment
+    moves the ease factor by the SM-2 rule, and the nominal gap to the next
+    moment is scaled by ease / starting ease from the time of the review.
+    """
+
+    def __init__(self, intervals, ease, min_ease, pass_score, max_score):
+        if len(intervals) != 3:
+            raise ImproperlyConfigured(
+                f"Review policies need 3 intervals, one per moment, got {intervals}."
+            )
+        if not 0 < intervals[0] < intervals[1] < intervals[2]:
+            raise ImproperlyConfigured(
+                f"Review intervals must be positive and increasing, got {intervals}."
+            )
+        if not 0 < min_ease <= ease:
+            raise ImproperlyConfigured(
+                f"Review ease must be positive and at least min_ease, got "
+                f"ease={ease} and min_ease={min_ease}."
+            )
+        if not 0 <= pass_score <= max_score or max_score <= 0:
+            raise ImproperlyConfigured(
+                f"Review pass_score must be between 0 and a positive max_score, "
+                f"got pass_score={pass_score} and max_score={max_score}."
+            )
+        self.intervals = [timedelta(days=days) for days in intervals]
+        self.ease = ease
+        self.min_ease = min_ease
+        self.pass_score = pass_score
+        self.max_score = max_score
+
+    def initial_moments(self, start):
+        return [start + interval for interval in self.intervals]
+
+    def next_ease(self, ease, score):
+        # SM-2 works on a 0-5 quality.
+        lapse = 5 - 5 * score / self.max_score
+        return max(self.min_ease, ease + 0.1 - lapse * (0.08 + lapse * 0.02))
+
+    def schedule(self, start, history):
+        """
+        Moments for a schedule started at `start`, `history` maps a completed
+        moment to its (score, reviewed_at).
+        """
+        moments = self.initial_moments(start)
+        ease = self.ease
+        for moment in (1, 2):
+            gap = self.intervals[moment] - self.intervals[moment - 1]
+            anchor = moments[moment - 1]
+            score = None
+            if moment in history:
+                score, anchor = history[moment]
+                ease = self.next_ease(ease, score)
+            if score is not None and score < self.pass_score:
+                gap = self.intervals[0]
+            else:
+                gap *= ease / self.ease
+            moments[moment] = anchor + gap
+        return moments
+
+
+def get_review_policy(company_id=None, course_id=None):
+    """Settings for the default, then the course, then the company."""
+    policies = settings.SPACED_REPETITION_POLICIES
+    return ReviewPolicy(
+        **{
+            **DEFAULT_REVIEW_POLICY,
+            **policies.get("default", {}),
+            **policies.get(f"course:{course_id}", {}),
+            **policies.get(f"company:{company_id}", {}),
+        }
+    )
+
+
+def check_review_policies():
+    """
+    Build every configured policy once, so a bad SPACED_REPETITION_POLICIES
+    fails at startup instead of in the enrollment signal.
+    """
+    policies = settings.SPACED_REPETITION_POLICIES
+    for key, policy in policies.items():
+        try:
+            ReviewPolicy(
+                **{**DEFAULT_REVIEW_POLICY, **policies.get("default", {}), **policy}
+            )
+        except (ImproperlyConfigured, TypeError) as e:
+            raise ImproperlyConfigured(f"SPACED_REPETITION_POLICIES[{key!r}]: {e}")
+
+
+def has_company_policies():
+    return any(
+        key.startswith("company:") for key in settings.SPACED_REPETITION_POLICIES
+    )
+
+
+def get_student_companies(student_ids):
+    """Company per student, only queried when a company has its own policy."""
+    if not has_company_policies():
+        return {}
+    return dict(
+        Student.objects.filter(id__in=student_ids).values_list("id", "company_id")
+    )
+
+
+def get_score_history(spaced_repetitions):
+    """
+    {(student_id, course_id): {moment: (average score, last review)}} for the
+    scored first and second moments, one aggregate query.
+    """
+    history = {}
+    rows = (
+        ChallengeStat.objects.filter(
+            student_id__in={
+                spaced_repetition.student_id for spaced_repetition in spaced_repetitions
+            },
+            challenge__course_id__in={
+                spaced_repetition.course_id for spaced_repetition in spaced_repetitions
+            },
+            moment__in=[1, 2],
+            score__isnull=False,
+            skipped=False,
+        )
+        .values("student_id", "challenge__course_id", "moment")
+        .annotate(score=Avg("score"), reviewed_at=Max("created_at"))
+    )
+    for row in rows:
+        history.setdefault((row["student_id"], row["challenge__course_id"]), {})[
+            row["moment"]
+        ] = (float(row["score"]), row["reviewed_at"])
+    return history
+
+
+def reschedule_spaced_repetitions(spaced_repetitions, batch_size=1000):
+    """
+    Recompute the open moments of a SpacedRepetition queryset from the score
+    history and the current policies. Works in id batches of six queries:
+    the rows, their score history, one bulk UPDATE and the due review read,
+    delete and insert. Returns the number of rescheduled rows.
+    """
+    spaced_repetitions = (
+        spaced_repetitions.select_related("student")
+        .only(
+            "student__company_id",
+            "course",
+            "moment1",
+            "is_completed1",
+            "moment2",
+            "is_completed2",
+            "moment3",
+            "is_completed3",
+            "created_at",
+        )
+        .order_by("id")
+    )
+    policies = {}
+    rescheduled = 0
+    last_id = 0
+    while True:
+        batch = list(spaced_repetitions.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return rescheduled
+        history = get_score_history(batch)
+        changed = []
+        for spaced_repetition in batch:
+            key = (spaced_repetition.student.company_id, spaced_repetition.course_id)
+            if key not in policies:
+                policies[key] = get_review_policy(*key)
+            moments = policies[key].schedule(
+                spaced_repetition.created_at,
+                history.get(
+                    (spaced_repetition.student_id, spaced_repetition.course_id), {}
+                ),
+            )
+            if apply_moments(spaced_repetition, moments):
+                changed.append(spaced_repetition)
+        if changed:
+            with transaction.atomic():
+                SpacedRepetition.objects.bulk_update(
+                    changed,
+                    ["moment1", "moment2", "moment3", "updated_at"],
+                    batch_size=batch_size,
+                )
+                sync_due_reviews(changed, batch_size)
+            rescheduled += len(changed)
+        if len(batch) < batch_size:
+            return rescheduled
+        last_id = batch[-1].id
+
+
+def apply_moments(spaced_repetition, moments):
+    """Set the moments that are still open, returns whether any changed."""
+    changed = False
+    for moment, value in enumerate(moments, start=1):
+        field = f"moment{moment}"
+        if getattr(spaced_repetition, f"is_completed{moment}"):
+            continue
+        if abs(getattr(spaced_repetition, field) - value) >= RESCHEDULE_TOLERANCE:
+            setattr(spaced_repetition, field, value)
+            changed = True
+    if changed:
+        spaced_repetition.updated_at = now()
+    return changed
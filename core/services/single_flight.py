@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+
+class SingleFlightTimeout(Exception):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs `fn` once per key at a time. Callers that arrive while a call for the
+    same key is in progress wait for it and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            if not call.event.wait(timeout):
+                raise SingleFlightTimeout(f"Timed out waiting for {key}")
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines: callers for the same key await one shared
+    task. The task is shielded, so a cancelled caller does not cancel it for
+    the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn, timeout=None):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            return await asyncio.shield(task)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            raise SingleFlightTimeout(f"Timed out waiting for {key}")
+
+
+ADVISORY_LOCK_POLL_INTERVAL = 0.1
+
+
+def _try_lock(lock_id):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [lock_id])
+        return cursor.fetchone()[0]
+
+
+def _unlock(lock_id):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", [lock_id])
+
+
+@contextmanager
+def advisory_lock(key, timeout):
+    """
+    Session-level Postgres advisory lock, so only one worker process at a time
+    runs the guarded block for `key`. Waits at most `timeout` seconds, polling
+    pg_try_advisory_lock so no waiter sits blocked inside the database, and
+    yields whether the lock was acquired. Always True on other databases.
+    """
+    if connection.vendor != "postgresql":
+        yield True
+        return
+
+    lock_id = zlib.crc32(key.encode())
+    deadline = time.monotonic() + timeout
+    acquired = _try_lock(lock_id)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(ADVISORY_LOCK_POLL_INTERVAL)
+        acquired = _try_lock(lock_id)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            _unlock(lock_id)
+
+
+def try_advisory_lock(key):
+    """Non-blocking advisory_lock."""
+    return advisory_lock(key, timeout=0)
+
+
+@asynccontextmanager
+async def aadvisory_lock(key, timeout):
+    """
+    advisory_lock for async code. The queries run on the request's database
+    thread, the waits between them on the event loop.
+    """
+    if connection.vendor != "postgresql":
+        yield True
+        return
+
+    lock_id = zlib.crc32(key.encode())
+    deadline = time.monotonic() + timeout
+    acquired = await sync_to_async(_try_lock)(lock_id)
+    while not acquired and time.monotonic() < deadline:
+        await asyncio.sleep(ADVISORY_LOCK_POLL_INTERVAL)
+        acquired = await sync_to_async(_try_lock)(lock_id)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            await sync_to_async(_unlock)(lock_id)
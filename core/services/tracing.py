@@ -0,0 +1,104 @@
+import random
+from datetime import datetime
+from urllib.parse import urlparse
+
+# Trace statuses Sentry gives 5xx responses and unhandled exceptions.
+SERVER_ERROR_STATUSES = {
+    "internal_error",
+    "unimplemented",
+    "unavailable",
+    "deadline_exceeded",
+}
+
+# Share of traces kept per path prefix, the longest matching prefix wins.
+DEFAULT_ROUTE_RATES = {
+    "/metrics": 0.0,
+    "/static/": 0.0,
+    "/api/get-challenge-by-id/": 0.01,
+    "/api/courses-summary/": 0.01,
+    "/api/get-challenge/": 0.5,
+    "/api/get-feedback/": 0.5,
+}
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def parse_timestamp(value):
+    """Event timestamps are serialized to strings before before_send_*."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def get_duration(event):
+    try:
+        return (
+            parse_timestamp(event["timestamp"])
+            - parse_timestamp(event["start_timestamp"])
+        ).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def get_sampling_path(sampling_context):
+    if "wsgi_environ" in sampling_context:
+        return sampling_context["wsgi_environ"].get("PATH_INFO", "")
+    if "asgi_scope" in sampling_context:
+        return sampling_context["asgi_scope"].get("path", "")
+    return ""
+
+
+def get_event_path(event):
+    url = (event.get("request") or {}).get("url")
+    return urlparse(url).path if url else event.get("transaction") or ""
+
+
+def is_server_error(event):
+    status = event.get("contexts", {}).get("trace", {}).get("status")
+    return status in SERVER_ERROR_STATUSES
+
+
+class TracesSampler:
+    """
+    Route based sampling for sentry_sdk.init. Cheap reads get a low rate and
+    the LLM routes a high one, so tracing costs little CPU where requests
+    are cheap.
+
+    Errors are sent whatever the rate, only their traces are sampled. With
+    `tail` every request with a non zero rate is traced and the decision is
+    made when the transaction finishes: server errors and transactions
+    slower than `slow_ms` are always kept, the rest at the route rate.
+    """
+
+    def __init__(self, default_rate, route_rates, slow_ms, tail=False):
+        self.default_rate = default_rate
+        self.route_rates = sorted(
+            route_rates.items(), key=lambda item: len(item[0]), reverse=True
+        )
+        self.slow = slow_ms / 1000
+        self.tail = tail
+
+    def get_rate(self, path):
+        for prefix, rate in self.route_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def traces_sampler(self, sampling_context):
+        # Follow the caller's decision so distributed traces stay whole.
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return float(parent_sampled)
+        rate = self.get_rate(get_sampling_path(sampling_context))
+        if self.tail and rate > 0:
+            return 1.0
+        return rate
+
+    def before_send_transaction(self, event, hint):
+        if not self.tail or is_server_error(event):
+            return event
+        if get_duration(event) >= self.slow:
+            return event
+        if random.random() < self.get_rate(get_event_path(event)):
+            return event
+        return None
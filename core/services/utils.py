@@ -1,30 +1,58 @@
 import json
-import os
+from datetime import timedelta
 
 from django.conf import settings
-from django.db.models import Avg, Count, Sum
+from django.db import connection
+from django.db.models import Avg, Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils.timezone import now
 
-from core.models import Challenge, ChallengeStat, Course, SpacedRepetition, Student
-
-
-def delete_temp_file(file_path):
-    if os.path.isfile(file_path):
-        os.remove(file_path)
-        return True
-    return False
+from core.models import ChallengeStat, Material, SpacedRepetition
+from core.services.due_reviews import complete_due_review
+from core.services.metrics import get_materialized_metrics
+from core.services.scheduling import reschedule_spaced_repetitions
 
 
 def save_score(student_id, challenge_id, feedback, moment):
     valid_moments = [moment[0] for moment in settings.SPACED_REPETITION_MOMENT_CHOICES]
-    student = Student.objects.get(id=student_id)
-    challenge = Challenge.objects.get(id=challenge_id)
+    return ChallengeStat.objects.create(
+        student_id=student_id,
+        challenge_id=challenge_id,
+        score=get_score_from_feedback(feedback),
+        moment=moment if moment in valid_moments else 0,
+    )
 
-    challenge_stat = ChallengeStat.objects.create(student=student, challenge=challenge)
-    challenge_stat.score = get_score_from_feedback(feedback)
-    if moment in valid_moments:
-        challenge_stat.moment = moment
-    challenge_stat.save()
-    return challenge_stat
+
+def get_best_challenge_stats(student, course_id):
+    """
+    The best scored, non-skipped attempt per challenge of a course, ties go to
+    the most recent attempt. One query: DISTINCT ON on Postgres, ROW_NUMBER()
+    elsewhere. The result can be reordered, e.g. by a cursor paginator,
+    without changing which attempt is picked.
+    """
+    stats = ChallengeStat.objects.filter(
+        student=student,
+        challenge__course_id=course_id,
+        score__isnull=False,
+        skipped=False,
+    ).select_related("challenge")
+    best_first = [F("score").desc(), F("created_at").desc(), F("id").desc()]
+    if connection.vendor == "postgresql":
+        best = stats.order_by("challenge_id", *best_first).distinct("challenge_id")
+        return (
+            ChallengeStat.objects.filter(id__in=best.values("id"))
+            .select_related("challenge")
+            .order_by("challenge_id")
+        )
+    return (
+        stats.annotate(
+            attempt_rank=Window(
+                RowNumber(), partition_by=[F("challenge_id")], order_by=best_first
+            )
+        )
+        .filter(attempt_rank=1)
+        .order_by("challenge_id")
+    )
 
 
 def get_score_from_feedback(feedback):
@@ -33,18 +61,39 @@ def get_score_from_feedback(feedback):
 
 
 def is_spaced_repetition_check(student_id, course_id, moment):
-    student = Student.objects.get(id=student_id)
-    course = Course.objects.get(id=course_id)
-    spaced_repetition = SpacedRepetition.objects.filter(
-        student=student, course=course
-    ).first()
-    if not spaced_repetition:
-        return None
-    spaced_repetition_update_completed_field(spaced_repetition, moment)
-    return spaced_repetition
-
-
-def spaced_repetition_update_completed_field(instance, moment_value):
+    is_completed_field = get_spaced_repetition_completed_field(moment)
+    updated = SpacedRepetition.objects.filter(
+        student_id=student_id, course_id=course_id, **{is_completed_field: False}
+    ).update(**{is_completed_field: True, "updated_at": now()})
+    if updated:
+        complete_due_review(student_id, course_id, moment)
+    if updated and moment < 3:
+        # Moves the later moments by the new score.
+        reschedule_spaced_repetitions(
+            SpacedRepetition.objects.filter(student_id=student_id, course_id=course_id)
+        )
+    return updated
+
+
+def filter_spaced_repetitions(spaced_repetitions, due_before=None, not_completed=False):
+    """
+    Narrow SpacedRepetition rows to those with a review moment still open
+    (`not_completed`) or open and due at or before `due_before`.
+    """
+    if due_before is not None:
+        spaced_repetitions = spaced_repetitions.filter(
+            Q(moment1__lte=due_before, is_completed1=False)
+            | Q(moment2__lte=due_before, is_completed2=False)
+            | Q(moment3__lte=due_before, is_completed3=False)
+        )
+    if not_completed:
+        spaced_repetitions = spaced_repetitions.filter(
+            Q(is_completed1=False) | Q(is_completed2=False) | Q(is_completed3=False)
+        )
+    return spaced_repetitions
+
+
+def get_spaced_repetition_completed_field(moment_value):
     field_mapping = {
         1: "is_completed1",
         2: "is_completed2",
@@ -52,60 +101,59 @@ def spaced_repetition_update_completed_field(instance, moment_value):
     }
     if moment_value not in field_mapping:
         raise ValueError("Invalid moment. Must be 1, 2, or 3.")
-    is_completed_field = field_mapping[moment_value]
-    setattr(instance, is_completed_field, True)
-    instance.save()
+    return field_mapping[moment_value]
 
 
 def get_suggested_materials(course_id):
     suggestions = ""
-    course = Course.objects.get(id=course_id)
-    for material in course.materials.all():
+    for material in Material.objects.filter(course_id=course_id):
         suggestions += f"{material.name}: {material.link}\n"
     return suggestions
 
 
-def get_student_company_metrics(student_id):
-
-    metrics = {}
-    challenge_stats = ChallengeStat.objects.all()
-    metrics["global"] = summarize_metrics(challenge_stats)
-
-    company = Student.objects.get(id=student_id).company
-    if company:
-        challenge_stats = ChallengeStat.objects.filter(student__company_id=company.id)
-        metrics["company"] = summarize_metrics(challenge_stats)
+def get_student_company_metrics(student, days=None):
+    if not days:
+        return get_materialized_metrics(student.company_id)
 
+    since = now() - timedelta(days=days)
+    metrics = {"global": summarize_metrics(ChallengeStat.objects.all(), since)}
+    if student.company_id:
+        challenge_stats = ChallengeStat.objects.filter(
+            student__company_id=student.company_id
+        )
+        metrics["company"] = summarize_metrics(challenge_stats, since)
     return metrics
 
 
-def summarize_metrics(challenge_stats):
+def summarize_metrics(challenge_stats, since=None):
+    if since:
+        challenge_stats = challenge_stats.filter(created_at__gte=since)
     top_students = (
         challenge_stats.filter(score__gt=0)
         .values("student__name")
         .annotate(total_challenges=Count("id"))
         .order_by("-total_challenges")[:6]
     )
-    average_scores_moment1 = challenge_stats.filter(moment=1).aggregate(
-        average_score=Avg("score")
-    )
-    average_scores_moment2 = challenge_stats.filter(moment=2).aggregate(
-        average_score=Avg("score")
-    )
-    average_scores_moment3 = challenge_stats.filter(moment=3).aggregate(
-        average_score=Avg("score")
-    )
-    average_scores_global = challenge_stats.aggregate(average_score=Avg("score"))
-    total_time = challenge_stats.filter(skipped=False).aggregate(
-        total_time=Sum("challenge__estimated_minutes")
+    aggregates = challenge_stats.aggregate(
+        average_score_moment1=Avg("score", filter=Q(moment=1)),
+        average_score_moment2=Avg("score", filter=Q(moment=2)),
+        average_score_moment3=Avg("score", filter=Q(moment=3)),
+        average_score_global=Avg("score"),
+        total_time=Sum("challenge__estimated_minutes", filter=Q(skipped=False)),
+        total_completed_challenges=Count("id", filter=Q(score__gt=0)),
     )
-    total_completed_challenges = challenge_stats.filter(score__gt=0).count()
     return {
         "top_students": top_students,
-        "average_scores_moment1": average_scores_moment1 or 0,
-        "average_scores_moment2": average_scores_moment2 or 0,
-        "average_scores_moment3": average_scores_moment3 or 0,
-        "total_time": total_time or 0,
-        "total_completed_challenges": total_completed_challenges or 0,
-        "average_scores_global": average_scores_global or 0,
+        "average_scores_moment1": {
+            "average_score": aggregates["average_score_moment1"]
+        },
+        "average_scores_moment2": {
+            "average_score": aggregates["average_score_moment2"]
+        },
+        "average_scores_moment3": {
+            "average_score": aggregates["average_score_moment3"]
+        },
+        "total_time": {"total_time": aggregates["total_time"]},
+        "total_completed_challenges": aggregates["total_completed_challenges"] or 0,
+        "average_scores_global": {"average_score": aggregates["average_score_global"]},
     }
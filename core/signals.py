@@ -1,30 +1,130 @@
-from datetime import timedelta
-
-from django.db.models.signals import m2m_changed
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
-from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+
+from core.authentication import invalidate_token_cache, invalidate_user_token_cache
+from core.services.course_assignment import invalidate_course_ids
+from core.services.due_reviews import sync_due_reviews
+from core.services.enrollment import create_spaced_repetitions
+from core.services.metrics import (
+    apply_stat_snapshot,
+    get_stat_snapshot,
+    move_student_metrics,
+    subtract_stats,
+)
+from core.services.monitoring import DB_CONNECTIONS_OPENED
 
-from .models import SpacedRepetition, Student
+from .models import Challenge, ChallengeStat, Course, SpacedRepetition, Student
 
 
 @receiver(m2m_changed, sender=Student.courses.through)
 def create_spaced_repetition(sender, instance, action, reverse, pk_set, **kwargs):
     """
-    Signal to create SpacedRepetition records when courses are added to a student.
+    Signal to create SpacedRepetition records when courses are added to a student
+    (or students to a course).
+    """
+    if action == "post_add" and pk_set:
+        if reverse:
+            pairs = [(student_id, instance.id) for student_id in pk_set]
+        else:
+            pairs = [(instance.id, course_id) for course_id in pk_set]
+        create_spaced_repetitions(pairs)
+
+
+@receiver(post_save, sender=SpacedRepetition)
+def sync_spaced_repetition_due_reviews(sender, instance, raw, **kwargs):
+    """Keep the due review queue in line with saved moments and completions."""
+    if not raw:
+        sync_due_reviews([instance])
+
+
+@receiver(pre_save, sender=ChallengeStat)
+def remember_challenge_stat_snapshot(sender, instance, raw, **kwargs):
+    """
+    Keep the stored values of an updated ChallengeStat so its old contribution
+    can be removed from the metrics rollups.
     """
-    if action == "post_add":
-        student = instance
-
-        for course_id in pk_set:
-            course = student.courses.get(id=course_id)
-            if not SpacedRepetition.objects.filter(
-                student=student, course=course
-            ).exists():
-                # Create the SpacedRepetition record
-                SpacedRepetition.objects.create(
-                    student=student,
-                    course=course,
-                    moment1=now() + timedelta(days=1),
-                    moment2=now() + timedelta(weeks=1),
-                    moment3=now() + timedelta(days=30),
-                )
+    instance._metrics_snapshot = (
+        get_stat_snapshot(instance.pk) if instance.pk and not raw else None
+    )
+
+
+@receiver(post_save, sender=ChallengeStat)
+def update_metrics_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous_snapshot = getattr(instance, "_metrics_snapshot", None)
+    if previous_snapshot:
+        apply_stat_snapshot(previous_snapshot, sign=-1)
+    apply_stat_snapshot(get_stat_snapshot(instance.pk))
+
+
+# No delete receivers on ChallengeStat itself: they would turn the cascade
+# from Student and Challenge into a per-row delete. The stats of a deleted
+# student or challenge leave the rollups in one aggregate here, direct
+# deletes go through ChallengeStatQuerySet.delete.
+@receiver(pre_delete, sender=Student)
+def update_metrics_on_student_delete(sender, instance, **kwargs):
+    subtract_stats(ChallengeStat.objects.filter(student_id=instance.pk))
+
+
+@receiver(pre_delete, sender=Challenge)
+def update_metrics_on_challenge_delete(sender, instance, **kwargs):
+    subtract_stats(ChallengeStat.objects.filter(challenge_id=instance.pk))
+
+
+@receiver(pre_save, sender=Student)
+def remember_student_company(sender, instance, raw, **kwargs):
+    instance._previous_company_id = (
+        Student.objects.filter(pk=instance.pk)
+        .values_list("company_id", flat=True)
+        .first()
+        if instance.pk and not raw
+        else None
+    )
+
+
+@receiver(post_save, sender=Student)
+def update_metrics_on_company_change(sender, instance, created, raw, **kwargs):
+    """Rollups are per company, move the student's stats when it changes."""
+    previous_company_id = getattr(instance, "_previous_company_id", None)
+    if created or raw or previous_company_id == instance.company_id:
+        return
+    move_student_metrics(instance.pk, previous_company_id, instance.company_id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_token_cache([instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_token_cache(instance.pk)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_cached_student_tokens(sender, instance, **kwargs):
+    invalidate_user_token_cache(instance.user_id)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_cached_course_ids(sender, instance, **kwargs):
+    if kwargs.get("created", True):
+        invalidate_course_ids()
+
+
+@receiver(connection_created)
+def count_database_connection(sender, connection, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
@@ -0,0 +1,27 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+from core.tests.factories import TestFactory
+
+
+class BenchmarkDBConnectionsCommandTests(TestFactory):
+    def test_reports_both_modes(self):
+        conn_max_age = connection.settings_dict["CONN_MAX_AGE"]
+        out = StringIO()
+        call_command(
+            "benchmark_db_connections",
+            requests=2,
+            challenge=self.challenge_1.id,
+            username="user_t1",
+            stdout=out,
+        )
+        self.assertIn("new connection per request:", out.getvalue())
+        self.assertIn("configured:", out.getvalue())
+        self.assertEqual(connection.settings_dict["CONN_MAX_AGE"], conn_max_age)
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark_db_connections", username="missing", requests=1)
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import IntegrityError, connection, transaction
+from django.utils.timezone import now
+
+from core.models import ChallengeStat, SpacedRepetition, SpacedRepetitionDue
+from core.tests.factories import TestFactory
+
+
+class IndexUsageTests(TestFactory):
+    """EXPLAIN the hot lookups and check the planner picks their index."""
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == "postgresql":
+            # Test tables are tiny, make the planner prefer any usable index.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def get_unique_index_name(self, model, columns):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        return next(
+            name
+            for name, constraint in constraints.items()
+            if constraint["unique"] and constraint["columns"] == columns
+        )
+
+    def test_challenge_stat_by_student_and_challenge(self):
+        self.assertUsesIndex(
+            ChallengeStat.objects.filter(
+                student=self.student_1, challenge=self.challenge_1
+            ),
+            "challengestat_student_chal_idx",
+        )
+
+    def test_challenge_stat_by_moment(self):
+        self.assertUsesIndex(
+            ChallengeStat.objects.filter(moment=1), "challengestat_moment_idx"
+        )
+
+    def test_challenge_stat_by_date_window(self):
+        self.assertUsesIndex(
+            ChallengeStat.objects.filter(created_at__gte=now() - timedelta(days=7)),
+            "challengestat_created_at_idx",
+        )
+
+    def test_pending_due_reviews_scan(self):
+        self.assertUsesIndex(
+            SpacedRepetitionDue.objects.filter(
+                processed_at__isnull=True, due_at__lte=now()
+            ).order_by("due_at", "id")[:100],
+            "srdue_pending_due_at_idx",
+        )
+
+    @skipUnless(
+        connection.vendor == "postgresql",
+        "SQLite cannot match a partial index against a bound parameter.",
+    )
+    def test_challenge_stat_completed_by_student(self):
+        self.assertUsesIndex(
+            ChallengeStat.objects.filter(student=self.student_1, score__gt=0),
+            "challengestat_completed_idx",
+        )
+
+    def test_spaced_repetition_by_student_and_course(self):
+        index_name = self.get_unique_index_name(
+            SpacedRepetition, ["student_id", "course_id"]
+        )
+        self.assertUsesIndex(
+            SpacedRepetition.objects.filter(
+                student=self.student_1, course=self.course_1, is_completed1=False
+            ),
+            index_name,
+        )
+
+    def test_spaced_repetition_is_unique_per_student_and_course(self):
+        moments = {
+            "moment1": now() + timedelta(days=1),
+            "moment2": now() + timedelta(weeks=1),
+            "moment3": now() + timedelta(days=30),
+        }
+        SpacedRepetition.objects.create(
+            student=self.student_1, course=self.course_1, **moments
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SpacedRepetition.objects.create(
+                student=self.student_1, course=self.course_1, **moments
+            )
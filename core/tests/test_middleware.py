@@ -1,8 +1,19 @@
+import json
+from unittest.mock import Mock, patch
+
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser, User
-from django.test import RequestFactory, TestCase
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.authtoken.models import Token
 
-from core.middleware import StudentMiddleware
+from core.checks import check_token_cache
+from core.middleware import RequestProfilingMiddleware, StudentMiddleware
 from core.models import Student
+from core.services.llm_service import LLMService
+from core.services.profiling import profile_span, record_llm_usage
 
 
 class TestStudentMiddleware(TestCase):
@@ -33,3 +44,183 @@ class TestStudentMiddleware(TestCase):
         request.user = AnonymousUser()
         self.middleware(request)
         self.assertIsNone(request.student)
+
+
+@override_settings(AUTH_TOKEN_CACHE_ALIAS="default")
+class TestCachedTokenStudentMiddleware(TestCase):
+    def setUp(self):
+        # The test cache is local, tokens are cached in it as if it were shared.
+        caches["default"].clear()
+        self.factory = RequestFactory()
+        self.middleware = StudentMiddleware(get_response=lambda request: request)
+        self.user = User.objects.create_user(username="testuser", password="test_pass")
+        self.student = Student.objects.create(user=self.user)
+        self.token = Token.objects.create(user=self.user)
+
+    def get_request(self):
+        request = self.factory.get(
+            "/some-url/", HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        request.user = AnonymousUser()
+        return self.middleware(request)
+
+    def test_token_authentication_is_cached(self):
+        with self.assertNumQueries(2):
+            request = self.get_request()
+        self.assertEqual(request.user, self.user)
+        self.assertEqual(request.student, self.student)
+
+        with self.assertNumQueries(0):
+            request = self.get_request()
+        self.assertEqual(request.user, self.user)
+        self.assertEqual(request.student, self.student)
+
+    def test_user_without_student_is_cached(self):
+        self.student.delete()
+        self.get_request()
+        with self.assertNumQueries(0):
+            request = self.get_request()
+        self.assertEqual(request.user, self.user)
+        self.assertIsNone(request.student)
+
+    def test_token_delete_invalidates_cache(self):
+        self.get_request()
+        self.token.delete()
+        request = self.get_request()
+        self.assertIsNone(request.user)
+        self.assertIsNone(request.student)
+
+    def test_user_deactivation_invalidates_cache(self):
+        self.get_request()
+        self.user.is_active = False
+        self.user.save()
+        request = self.get_request()
+        self.assertIsNone(request.user)
+
+    def test_student_change_invalidates_cache(self):
+        self.get_request()
+        self.student.name = "Renamed"
+        self.student.save()
+        request = self.get_request()
+        self.assertEqual(request.student.name, "Renamed")
+
+
+class TestTokenCacheSettings(TestCase):
+    def setUp(self):
+        self.middleware = StudentMiddleware(get_response=lambda request: request)
+        self.user = User.objects.create_user(username="testuser", password="test_pass")
+        self.token = Token.objects.create(user=self.user)
+
+    def get_request(self):
+        request = RequestFactory().get(
+            "/some-url/", HTTP_AUTHORIZATION=f"Token {self.token.key}"
+        )
+        request.user = AnonymousUser()
+        return self.middleware(request)
+
+    def test_token_cache_is_off_by_default(self):
+        self.assertEqual(self.get_request().user, self.user)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_request().user, self.user)
+
+    def test_check_accepts_shared_cache(self):
+        self.assertEqual(check_token_cache(None), [])
+        with override_settings(
+            AUTH_TOKEN_CACHE_ALIAS="shared",
+            CACHES={
+                **settings.CACHES,
+                "shared": {
+                    "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                    "LOCATION": "redis://localhost:6379/0",
+                },
+            },
+        ):
+            self.assertEqual(check_token_cache(None), [])
+
+    def test_check_refuses_local_or_missing_cache(self):
+        for alias in ("default", "missing"):
+            with override_settings(AUTH_TOKEN_CACHE_ALIAS=alias):
+                self.assertEqual(
+                    [error.id for error in check_token_cache(None)], ["core.E001"]
+                )
+
+
+class TestRequestProfilingMiddleware(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def generate_text(self, *args, **kwargs):
+        record_llm_usage(Mock(total_tokens=42))
+        return "Generated text"
+
+    @patch("core.services.llm_service.OpenAIProvider")
+    def get_response(self, request, mock_provider):
+        mock_provider.return_value.generate_text.side_effect = self.generate_text
+        mock_provider.return_value.get_text_from_audio.return_value = "Transcript"
+        llm_service = LLMService()
+        llm_service.transcription_cache.clear()
+        Student.objects.count()
+        Student.objects.count()
+        llm_service.generate_text("Prompt", use_cache=False)
+        llm_service.get_text_from_audio(
+            SimpleUploadedFile("answer.wav", b"audio data", content_type="audio/wav")
+        )
+        return HttpResponse("ok")
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_profiled_request(self):
+        middleware = RequestProfilingMiddleware(self.get_response)
+        with self.assertLogs(settings.LOGGER_NAME, level="INFO") as logs:
+            response = middleware(self.factory.get("/api/get-feedback/"))
+
+        server_timing = response["Server-Timing"]
+        self.assertRegex(server_timing, r'db;dur=[\d.]+;desc="2 calls"')
+        self.assertRegex(server_timing, r'llm;dur=[\d.]+;desc="1 calls, 42 tokens"')
+        self.assertRegex(server_timing, r'stt;dur=[\d.]+;desc="1 calls"')
+        self.assertRegex(server_timing, r'audio;dur=[\d.]+;desc="1 calls"')
+        self.assertRegex(server_timing, r"total;dur=[\d.]+$")
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["event"], "request_profile")
+        self.assertEqual(line["path"], "/api/get-feedback/")
+        self.assertEqual(line["status"], 200)
+        self.assertEqual(line["db_count"], 2)
+        self.assertEqual(line["llm_count"], 1)
+        self.assertEqual(line["llm_tokens"], 42)
+        self.assertGreaterEqual(line["total_duration"], line["db_duration"])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_streaming_response_is_logged_when_it_ends(self):
+        def stream(request):
+            def chunks():
+                yield "first"
+                with profile_span("llm"):
+                    record_llm_usage(Mock(total_tokens=7))
+                yield "second"
+
+            return StreamingHttpResponse(chunks())
+
+        middleware = RequestProfilingMiddleware(stream)
+        with self.assertLogs(settings.LOGGER_NAME, level="INFO") as logs:
+            response = middleware(self.factory.get("/api/get-feedback/stream/"))
+            self.assertIn("total;dur=", response["Server-Timing"])
+            self.assertEqual(b"".join(response.streaming_content), b"firstsecond")
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["llm_count"], 1)
+        self.assertEqual(line["llm_tokens"], 7)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        middleware = RequestProfilingMiddleware(self.get_response)
+        response = middleware(self.factory.get("/api/get-feedback/"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_view_name(self):
+        with self.assertLogs(settings.LOGGER_NAME, level="INFO") as logs:
+            response = self.client.get("/api/courses-summary/")
+        self.assertIn("total;dur=", response["Server-Timing"])
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line["view"], "course-summary")
+        self.assertEqual(line["status"], response.status_code)
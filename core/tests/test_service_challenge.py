@@ -1,8 +1,11 @@
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 
-from core.models import Challenge, ChallengeStat
+from core.models import Challenge, ChallengeStat, SpacedRepetition
 from core.services.challenge import ChallengeService
 from core.tests.factories import TestFactory
 
@@ -29,10 +32,50 @@ class ChallengeServiceTests(TestFactory):
 
         mock_generate_text.assert_called_once_with(
             f"Template for challenge: \nTranscript:  {self.course_1.transcript}",
+            use_cache=False,
             output_schema=settings.OPENAI_CHALLENGE_SCHEMA,
         )
         self.assertEqual(result, "Generated challenge text")
 
+    @patch("core.services.challenge.ChallengeService.generate_challenge")
+    @patch("core.services.challenge.advisory_lock")
+    def test_generation_lock_timeout(self, mock_advisory_lock, mock_generate):
+        mock_advisory_lock.return_value.__enter__.return_value = False
+        self.student_1.challenges.add(self.challenge_1, self.challenge_2)
+
+        self.assertIsNone(
+            self.service.get_challenge(self.student_1.id, self.course_1.id)
+        )
+        mock_advisory_lock.assert_called_once_with(
+            f"challenge-generation:{self.course_1.id}",
+            settings.CHALLENGE_GENERATION_LOCK_TIMEOUT,
+        )
+        mock_generate.assert_not_called()
+
+    @override_settings(LLM_CACHED_SCHEMAS=[settings.OPENAI_CHALLENGE_SCHEMA])
+    @patch("core.services.llm_service.OpenAIProvider")
+    def test_generated_challenges_are_not_cached(self, mock_openai_provider):
+        mock_openai_provider.return_value.generate_text.side_effect = [
+            "First generated challenge",
+            "Second generated challenge",
+        ]
+        service = ChallengeService()
+        self.student_1.challenges.add(self.challenge_1, self.challenge_2)
+
+        first = service.get_challenge(self.student_1.id, self.course_1.id)
+        self.student_1.challenges.add(first["challenge_id"])
+        second = service.get_challenge(self.student_1.id, self.course_1.id)
+
+        self.assertEqual(first["challenge"], "First generated challenge")
+        self.assertEqual(second["challenge"], "Second generated challenge")
+        self.assertEqual(
+            Challenge.objects.filter(course=self.course_1)
+            .values("text")
+            .distinct()
+            .count(),
+            Challenge.objects.filter(course=self.course_1).count(),
+        )
+
     def test_get_challenge_existing(self):
         result = self.service.get_challenge(
             student_id=self.student_1.id, course_id=self.course_1.id
@@ -85,35 +128,36 @@ class ChallengeServiceTests(TestFactory):
         self.assertEqual(result, "Generated feedback text")
 
     @patch("core.services.challenge.is_spaced_repetition_check")
-    @patch("core.services.challenge.delete_temp_file")
     @patch("core.services.llm_service.LLMService.get_text_from_audio")
     @patch("core.services.llm_service.LLMService.generate_text")
     def test_get_feedback_audio(
         self,
         mock_generate_text,
         mock_get_text_from_audio,
-        mock_delete_temp_file,
         mock_is_spaced_repetition_check,
     ):
         mock_get_text_from_audio.return_value = "Transcribed text"
         mock_generate_text.return_value = (
             '{"feedback":"generated", "score_average": 5, "class_recommendations": []}'
         )
+        audio_file = SimpleUploadedFile(
+            "test_audio.mp3", b"Audio content", content_type="audio/mpeg"
+        )
 
         result = self.service.get_feedback(
             student_id=self.student_1.id,
-            challenge_id=self.challenge_1.id,
+            challenge=self.challenge_1,
             answer_type="audio",
-            student_answer="path/to/audio",
+            student_answer=audio_file,
             moment=None,
         )
 
-        mock_get_text_from_audio.assert_called_once_with("path/to/audio")
+        mock_get_text_from_audio.assert_called_once_with(audio_file)
         mock_generate_text.assert_called_once_with(
             f"Template for feedback: \nChallenge: {self.challenge_1.text}\nAnswer: Transcribed text\nClass links: ",
             output_schema=settings.OPENAI_FEEDBACK_SCHEMA,
         )
-        mock_delete_temp_file.assert_called_once_with("path/to/audio")
+        self.assertTrue(audio_file.closed)
         mock_is_spaced_repetition_check.assert_not_called()
         challenge_stat = ChallengeStat.objects.get(id=4)
         self.assertEqual(challenge_stat.score, 5)
@@ -124,14 +168,12 @@ class ChallengeServiceTests(TestFactory):
         )
 
     @patch("core.services.challenge.is_spaced_repetition_check")
-    @patch("core.services.challenge.delete_temp_file")
     @patch("core.services.llm_service.LLMService.get_text_from_audio")
     @patch("core.services.llm_service.LLMService.generate_text")
     def test_get_feedback_text(
         self,
         mock_generate_text,
         mock_get_text_from_audio,
-        mock_delete_temp_file,
         mock_is_spaced_repetition_check,
     ):
         mock_generate_text.return_value = (
@@ -139,7 +181,7 @@ class ChallengeServiceTests(TestFactory):
         )
         result = self.service.get_feedback(
             student_id=self.student_1.id,
-            challenge_id=self.challenge_1.id,
+            challenge=self.challenge_1,
             answer_type="text",
             student_answer="Transcribed text",
             moment=1,
@@ -150,7 +192,6 @@ class ChallengeServiceTests(TestFactory):
             f"Template for feedback: \nChallenge: {self.challenge_1.text}\nAnswer: Transcribed text\nClass links: ",
             output_schema=settings.OPENAI_FEEDBACK_SCHEMA,
         )
-        mock_delete_temp_file.assert_not_called()
         mock_is_spaced_repetition_check.assert_called_once_with(
             self.student_1.id, self.course_1.id, 1
         )
@@ -161,3 +202,196 @@ class ChallengeServiceTests(TestFactory):
             result,
             '{"feedback":"generated", "score_average": 5, "class_recommendations": []}',
         )
+
+    @patch("core.services.llm_service.LLMService.generate_text")
+    def test_get_feedback_query_count(self, mock_generate_text):
+        mock_generate_text.return_value = (
+            '{"feedback":"generated", "score_average": 7, "class_recommendations": []}'
+        )
+        self.student_1.courses.add(self.course_1)
+
+        # prompt template, materials, then savepoint, stat insert, metrics
+        # rollup (stat lookup, global and student upserts), student challenge
+        # link, spaced repetition update, due review delete, rescheduling
+        # (schedule, score history, savepoint, bulk update, due review read,
+        # delete and insert, release) and release.
+        with self.assertNumQueries(19):
+            result = self.service.get_feedback(
+                student_id=self.student_1.id,
+                challenge=self.challenge_2,
+                answer_type="text",
+                student_answer="Answer",
+                moment=1,
+            )
+
+        self.assertIsNotNone(result)
+        challenge_stat = ChallengeStat.objects.get(
+            student=self.student_1, challenge=self.challenge_2
+        )
+        self.assertEqual(challenge_stat.score, 7)
+        self.assertEqual(challenge_stat.moment, 1)
+        self.assertIn(self.challenge_2, self.student_1.challenges.all())
+        self.assertTrue(
+            SpacedRepetition.objects.get(
+                student=self.student_1, course=self.course_1
+            ).is_completed1
+        )
+
+    @patch("core.services.llm_service.LLMService.get_text_from_audio")
+    def test_get_feedback_audio_closed_on_error(self, mock_get_text_from_audio):
+        mock_get_text_from_audio.side_effect = Exception("Transcription error")
+        audio_file = SimpleUploadedFile(
+            "test_audio.mp3", b"Audio content", content_type="audio/mpeg"
+        )
+
+        result = self.service.get_feedback(
+            student_id=self.student_1.id,
+            challenge=self.challenge_1,
+            answer_type="audio",
+            student_answer=audio_file,
+        )
+
+        self.assertIsNone(result)
+        self.assertTrue(audio_file.closed)
+
+    async def collect_events(self, **kwargs):
+        return [
+            event
+            async for event in self.service.astream_feedback(
+                student_id=self.student_1.id,
+                challenge=self.challenge_1,
+                **kwargs,
+            )
+        ]
+
+    @patch("core.services.llm_service.LLMService.astream_text")
+    async def test_astream_feedback(self, mock_astream_text):
+        feedback = (
+            '{"feedback":"Good job", "score_average": 5, "class_recommendations": []}'
+        )
+
+        async def stream(*args, **kwargs):
+            yield None, '{"feedback'
+            yield {"feedback": "Good"}, '{"feedback":"Good'
+            yield {"feedback": "Good job"}, feedback
+
+        mock_astream_text.side_effect = stream
+
+        events = await self.collect_events(
+            answer_type="text", student_answer="My answer", moment=None
+        )
+
+        self.assertEqual(
+            events,
+            [
+                ("feedback", {"delta": "Good"}),
+                ("feedback", {"delta": " job"}),
+                ("done", {"feedback": feedback}),
+            ],
+        )
+        stats = ChallengeStat.objects.filter(
+            student=self.student_1, challenge=self.challenge_1, score=5
+        )
+        self.assertTrue(await sync_to_async(stats.exists)())
+
+    @patch("core.services.llm_service.LLMService.astream_text")
+    async def test_astream_feedback_incomplete_stream(self, mock_astream_text):
+        async def stream(*args, **kwargs):
+            yield {"feedback": "Good"}, '{"feedback":"Good'
+
+        mock_astream_text.side_effect = stream
+
+        events = await self.collect_events(
+            answer_type="text", student_answer="My answer", moment=None
+        )
+
+        self.assertEqual(
+            events,
+            [
+                ("feedback", {"delta": "Good"}),
+                ("error", {"error": "Feedback could not be generated."}),
+            ],
+        )
+        count = await ChallengeStat.objects.filter(student=self.student_1).acount()
+        self.assertEqual(count, 3)
+
+    async def test_aget_challenge_existing(self):
+        result = await self.service.aget_challenge(
+            student_id=self.student_1.id, course_id=self.course_1.id
+        )
+        self.assertEqual(
+            result,
+            {"challenge_id": self.challenge_1.id, "challenge": self.challenge_1.text},
+        )
+
+    @patch(
+        "core.services.llm_service.LLMService.agenerate_text", new_callable=AsyncMock
+    )
+    async def test_aget_challenge_generate_new(self, mock_agenerate_text):
+        await self.student_1.challenges.aadd(self.challenge_1, self.challenge_2)
+        mock_agenerate_text.return_value = "Generated challenge text"
+
+        result = await self.service.aget_challenge(
+            student_id=self.student_1.id, course_id=self.course_1.id
+        )
+
+        mock_agenerate_text.assert_awaited_once_with(
+            f"Template for challenge: \nTranscript:  {self.course_1.transcript}",
+            use_cache=False,
+            output_schema=settings.OPENAI_CHALLENGE_SCHEMA,
+        )
+        challenge = await Challenge.objects.aget(
+            course=self.course_1, text="Generated challenge text"
+        )
+        self.assertEqual(
+            result, {"challenge_id": challenge.id, "challenge": challenge.text}
+        )
+
+    @patch("core.services.llm_service.LLMService.aget_text_from_audio")
+    @patch(
+        "core.services.llm_service.LLMService.agenerate_text", new_callable=AsyncMock
+    )
+    async def test_aget_feedback_audio(
+        self, mock_agenerate_text, mock_aget_text_from_audio
+    ):
+        mock_aget_text_from_audio.return_value = "Transcribed text"
+        mock_agenerate_text.return_value = (
+            '{"feedback":"generated", "score_average": 5, "class_recommendations": []}'
+        )
+        audio_file = SimpleUploadedFile(
+            "test_audio.mp3", b"Audio content", content_type="audio/mpeg"
+        )
+
+        result = await self.service.aget_feedback(
+            student_id=self.student_1.id,
+            challenge=self.challenge_1,
+            answer_type="audio",
+            student_answer=audio_file,
+            moment=None,
+        )
+
+        mock_aget_text_from_audio.assert_awaited_once_with(audio_file)
+        self.assertIn("Transcribed text", mock_agenerate_text.await_args.args[0])
+        self.assertEqual(result, mock_agenerate_text.return_value)
+        self.assertTrue(audio_file.closed)
+        stats = ChallengeStat.objects.filter(
+            student=self.student_1, challenge=self.challenge_1, score=5
+        )
+        self.assertTrue(await stats.aexists())
+
+    @patch(
+        "core.services.llm_service.LLMService.agenerate_text", new_callable=AsyncMock
+    )
+    async def test_aget_feedback_failed(self, mock_agenerate_text):
+        mock_agenerate_text.return_value = None
+
+        result = await self.service.aget_feedback(
+            student_id=self.student_1.id,
+            challenge=self.challenge_1,
+            answer_type="text",
+            student_answer="My answer",
+        )
+
+        self.assertIsNone(result)
+        count = await ChallengeStat.objects.filter(student=self.student_1).acount()
+        self.assertEqual(count, 3)
@@ -0,0 +1,81 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from core.models import Challenge
+from core.services.challenge_pool import ChallengePoolService
+from core.tests.factories import TestFactory
+
+
+@override_settings(
+    CHALLENGE_POOL_LEVELS=[1],
+    CHALLENGE_POOL_PER_STUDENT=1,
+    CHALLENGE_POOL_MIN_SIZE=1,
+    CHALLENGE_POOL_MAX_SIZE=3,
+)
+class ChallengePoolServiceTests(TestFactory):
+    def setUp(self):
+        super().setUp()
+        self.service = ChallengePoolService()
+        self.student_1.courses.add(self.course_1, self.course_2)
+
+    def test_get_pool_target(self):
+        self.assertEqual(self.service.get_pool_target(0), 1)
+        self.assertEqual(self.service.get_pool_target(2), 2)
+        self.assertEqual(self.service.get_pool_target(10), 3)
+
+    def test_get_active_students(self):
+        self.assertEqual(
+            self.service.get_active_students(),
+            {self.course_1.id: 1, self.course_2.id: 1},
+        )
+
+    def test_get_pool_sizes_ignores_seen_and_verified(self):
+        self.student_1.challenges.add(self.challenge_2)
+        Challenge.objects.filter(id=self.challenge_3.id).update(verified=True)
+        self.assertEqual(self.service.get_pool_sizes(), {(self.course_1.id, 1): 1})
+
+    @patch("core.services.llm_service.LLMService.generate_text")
+    def test_refill_generates_missing_challenges(self, mock_generate_text):
+        mock_generate_text.return_value = "Generated challenge text"
+
+        generated = self.service.refill()
+
+        self.assertEqual(generated, 1)
+        mock_generate_text.assert_called_once_with(
+            f"Template for challenge: \nTranscript:  {self.course_2.transcript}"
+            "\nLevel: 1",
+            use_cache=False,
+            output_schema="challenge",
+        )
+        self.assertTrue(
+            Challenge.objects.filter(
+                course=self.course_2, level=1, text="Generated challenge text"
+            ).exists()
+        )
+
+    @patch("core.services.llm_service.LLMService.generate_text")
+    def test_refill_stops_on_generation_error(self, mock_generate_text):
+        mock_generate_text.return_value = None
+        self.assertEqual(self.service.refill(), 0)
+        self.assertEqual(Challenge.objects.count(), 3)
+
+    @patch("core.services.challenge_pool.try_advisory_lock")
+    @patch("core.services.llm_service.LLMService.generate_text")
+    def test_refill_skipped_while_another_runs(
+        self, mock_generate_text, mock_try_advisory_lock
+    ):
+        mock_try_advisory_lock.return_value.__enter__.return_value = False
+        self.assertEqual(self.service.refill(), 0)
+        mock_try_advisory_lock.assert_called_once_with("challenge-pool-refill")
+        mock_generate_text.assert_not_called()
+
+    @patch("core.services.llm_service.LLMService.generate_text")
+    def test_refill_command(self, mock_generate_text):
+        mock_generate_text.return_value = "Generated challenge text"
+        out = StringIO()
+        call_command("refill_challenge_pool", "--course", self.course_1.id, stdout=out)
+        mock_generate_text.assert_not_called()
+        self.assertIn("Generated 0 challenges.", out.getvalue())
@@ -0,0 +1,101 @@
+from collections import Counter
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Company, Course, Student
+from core.services.course_assignment import (
+    LeastLoadedCoursePolicy,
+    RandomCoursePolicy,
+    WeightedCoursePolicy,
+    get_course_assignment_policy,
+    get_course_ids,
+)
+from core.tests.factories import TestFactory
+
+
+class CourseAssignmentTests(TestFactory):
+    def setUp(self):
+        super().setUp()
+        self.course_3 = Course.objects.create(id=3, title="Test Course 3")
+
+    def test_course_ids_are_cached(self):
+        self.assertEqual(get_course_ids(), [1, 2, 3])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_course_ids(), [1, 2, 3])
+
+    def test_course_changes_invalidate_cache(self):
+        get_course_ids()
+        Course.objects.create(id=4, title="Test Course 4")
+        self.assertEqual(get_course_ids(), [1, 2, 3, 4])
+        self.course_3.delete()
+        self.assertEqual(get_course_ids(), [1, 2, 4])
+
+    def test_random_policy(self):
+        get_course_ids()
+        with self.assertNumQueries(0):
+            course_ids = RandomCoursePolicy().choose(2)
+        self.assertEqual(len(set(course_ids)), 2)
+        self.assertTrue(set(course_ids) <= {1, 2, 3})
+        self.assertCountEqual(RandomCoursePolicy().choose(5), [1, 2, 3])
+
+    @override_settings(COURSE_ASSIGNMENT_PLAN_WEIGHTS={"PREMIUM": {"1": 0, "2": 100}})
+    def test_weighted_policy_uses_company_plan(self):
+        company = Company.objects.create(name="Premium", plan="PREMIUM")
+        picks = Counter(
+            WeightedCoursePolicy().choose(1, company)[0] for _ in range(200)
+        )
+        self.assertNotIn(1, picks)
+        self.assertGreater(picks[2], picks[3])
+        self.assertCountEqual(WeightedCoursePolicy().choose(3, company), [2, 3])
+        self.assertCountEqual(WeightedCoursePolicy().choose(3), [1, 2, 3])
+
+    def test_least_loaded_policy(self):
+        self.student_1.courses.add(self.course_1, self.course_2)
+        self.student_2.courses.add(self.course_1)
+        policy = LeastLoadedCoursePolicy()
+        self.assertEqual(policy.choose(1), [3])
+        with self.assertNumQueries(0):
+            self.assertEqual(policy.choose(2), [2, 3])
+        self.assertEqual(policy.choose(1), [1])
+
+    def test_least_loaded_policy_counts_are_shared(self):
+        LeastLoadedCoursePolicy().choose(2)
+        self.assertEqual(LeastLoadedCoursePolicy().choose(2), [3, 1])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            get_course_assignment_policy("unknown")
+
+    @override_settings(COURSE_ASSIGNMENT_POLICY="least_loaded")
+    def test_policy_from_settings(self):
+        self.assertIsInstance(get_course_assignment_policy(), LeastLoadedCoursePolicy)
+
+    @override_settings(COURSE_ASSIGNMENT_COUNT=2)
+    def test_register_assigns_courses(self):
+        with patch("core.services.course_assignment.random.sample") as sample:
+            sample.side_effect = lambda course_ids, count: course_ids[:count]
+            response = APIClient().post(
+                reverse("user_register"),
+                {"username": "new_user", "password": "secret"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        student = Student.objects.get(user__username="new_user")
+        self.assertCountEqual(student.courses.values_list("id", flat=True), [1, 2])
+
+    def test_register_skips_deleted_courses(self):
+        with patch(
+            "core.services.course_assignment.get_course_ids", return_value=[1, 3, 99]
+        ):
+            response = APIClient().post(
+                reverse("user_register"),
+                {"username": "new_user", "password": "secret"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        student = Student.objects.get(user__username="new_user")
+        self.assertCountEqual(student.courses.values_list("id", flat=True), [1, 3])
@@ -0,0 +1,149 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from core.models import Challenge, SpacedRepetition, SpacedRepetitionDue
+from core.services.due_reviews import iter_due_reviews, rebuild_due_reviews
+from core.services.review_scheduler import DueReviewProcessor, review_due
+from core.services.utils import is_spaced_repetition_check
+from core.tests.factories import TestFactory
+
+
+class DueReviewsTests(TestFactory):
+    def setUp(self):
+        super().setUp()
+        self.student_1.courses.add(self.course_1, self.course_2)
+        self.student_2.courses.add(self.course_1)
+
+    def due_moments(self, **filters):
+        return set(
+            SpacedRepetitionDue.objects.filter(**filters).values_list(
+                "student_id", "course_id", "moment"
+            )
+        )
+
+    def test_enrollment_creates_due_reviews(self):
+        self.assertEqual(SpacedRepetitionDue.objects.count(), 9)
+        schedule = SpacedRepetition.objects.get(
+            student=self.student_1, course=self.course_1
+        )
+        self.assertEqual(
+            list(
+                schedule.due_moments.order_by("moment").values_list("moment", "due_at")
+            ),
+            [(1, schedule.moment1), (2, schedule.moment2), (3, schedule.moment3)],
+        )
+
+    def test_completed_moment_leaves_queue(self):
+        is_spaced_repetition_check(self.student_1.id, self.course_1.id, 1)
+        self.assertEqual(
+            self.due_moments(student=self.student_1, course=self.course_1),
+            {(1, 1, 2), (1, 1, 3)},
+        )
+
+    def test_saved_moments_are_synced(self):
+        schedule = SpacedRepetition.objects.get(
+            student=self.student_1, course=self.course_1
+        )
+        schedule.moment2 = now() + timedelta(days=2)
+        schedule.is_completed3 = True
+        schedule.save()
+        self.assertEqual(
+            list(
+                schedule.due_moments.order_by("moment").values_list("moment", "due_at")
+            ),
+            [(1, schedule.moment1), (2, schedule.moment2)],
+        )
+
+    def test_rebuild(self):
+        SpacedRepetitionDue.objects.all().delete()
+        rebuild_due_reviews(batch_size=1)
+        self.assertEqual(SpacedRepetitionDue.objects.count(), 9)
+
+    def test_iter_due_reviews_in_batches(self):
+        SpacedRepetition.objects.update(moment1=now() - timedelta(minutes=5))
+        rebuild_due_reviews()
+        batches = list(iter_due_reviews(now(), batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(
+            {due_review.moment for batch in batches for due_review in batch}, {1}
+        )
+
+    def test_notify(self):
+        SpacedRepetition.objects.filter(course=self.course_2).update(
+            moment1=now() - timedelta(minutes=5)
+        )
+        rebuild_due_reviews()
+        received = []
+
+        def receiver(sender, due_reviews, **kwargs):
+            received.extend(due_reviews)
+
+        review_due.connect(receiver)
+        self.addCleanup(review_due.disconnect, receiver)
+        self.assertEqual(DueReviewProcessor("notify").run(), 1)
+        self.assertEqual(
+            [(due.student_id, due.course_id) for due in received], [(1, 2)]
+        )
+        self.assertEqual(DueReviewProcessor("notify").run(), 0)
+
+    def test_pre_generate_challenges(self):
+        SpacedRepetition.objects.filter(course=self.course_1).update(
+            moment1=now() - timedelta(minutes=5)
+        )
+        rebuild_due_reviews()
+        self.student_1.challenges.add(self.challenge_1, self.challenge_2)
+        with patch(
+            "core.services.challenge.ChallengeService.generate_challenge",
+            return_value="Generated challenge",
+        ) as generate_challenge:
+            out = StringIO()
+            call_command("process_due_reviews", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Processed 2 due reviews.")
+        # Student 2 still has unseen challenges, student 1 needed a new one.
+        generate_challenge.assert_called_once_with(self.student_1.id, self.course_1.id)
+        self.assertTrue(
+            Challenge.objects.filter(
+                course=self.course_1, text="Generated challenge"
+            ).exists()
+        )
+        self.assertEqual(
+            self.due_moments(processed_at__isnull=True, moment=1), {(1, 2, 1)}
+        )
+
+    @patch("core.management.commands.process_due_reviews.time.sleep")
+    @patch("core.management.commands.process_due_reviews.close_old_connections")
+    @patch.object(DueReviewProcessor, "run", side_effect=[Exception("down"), 3])
+    def test_loop_survives_errors(self, mock_run, mock_close, mock_sleep):
+        mock_sleep.side_effect = [None, KeyboardInterrupt]
+        out = StringIO()
+        with self.assertLogs(level="WARNING") as logs:
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("process_due_reviews", "--loop", stdout=out)
+        self.assertIn("Due reviews processing error: down", logs.output[0])
+        self.assertEqual(out.getvalue().strip(), "Processed 3 due reviews.")
+        self.assertEqual(mock_close.call_count, 2)
+
+    def test_failed_generation_stays_pending(self):
+        SpacedRepetition.objects.filter(course=self.course_2).update(
+            moment1=now() - timedelta(minutes=5)
+        )
+        rebuild_due_reviews()
+        self.student_1.challenges.add(self.challenge_3)
+        with patch(
+            "core.services.challenge.ChallengeService.generate_challenge",
+            return_value=None,
+        ):
+            self.assertEqual(DueReviewProcessor().run(), 0)
+        self.assertTrue(
+            SpacedRepetitionDue.objects.filter(
+                course=self.course_2, moment=1, processed_at__isnull=True
+            ).exists()
+        )
+
+    def test_unknown_action(self):
+        with self.assertRaises(ValueError):
+            DueReviewProcessor("email")
@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from core.models import Company, SpacedRepetition, Student
+from core.services.enrollment import create_spaced_repetitions, enroll_students
+from core.tests.factories import TestFactory
+
+
+class EnrollmentTests(TestFactory):
+    def test_signal_creates_schedules_in_bulk(self):
+        with self.assertNumQueries(6):
+            # existing links, link insert, existing schedules, schedule insert,
+            # new schedule ids, due review insert
+            self.student_1.courses.add(self.course_1, self.course_2)
+        self.assertEqual(
+            set(
+                SpacedRepetition.objects.filter(student=self.student_1).values_list(
+                    "course_id", flat=True
+                )
+            ),
+            {self.course_1.id, self.course_2.id},
+        )
+        schedule = SpacedRepetition.objects.get(
+            student=self.student_1, course=self.course_1
+        )
+        self.assertLess(schedule.moment1, schedule.moment2)
+        self.assertLess(schedule.moment2, schedule.moment3)
+
+    def test_signal_handles_reverse_add(self):
+        self.course_1.students.add(self.student_1, self.student_2)
+        self.assertEqual(
+            SpacedRepetition.objects.filter(course=self.course_1).count(), 2
+        )
+
+    def test_existing_schedules_are_kept(self):
+        self.student_1.courses.add(self.course_1)
+        schedule = SpacedRepetition.objects.get(student=self.student_1)
+        created = create_spaced_repetitions(
+            [
+                (self.student_1.id, self.course_1.id),
+                (self.student_2.id, self.course_1.id),
+            ]
+        )
+        self.assertEqual(created, 1)
+        self.assertTrue(SpacedRepetition.objects.filter(id=schedule.id).exists())
+
+    def test_enroll_students(self):
+        self.student_1.courses.add(self.course_1)
+        enrolled = enroll_students(
+            self.course_1.id, [self.student_1.id, self.student_2.id], batch_size=1
+        )
+        self.assertEqual(enrolled, 2)
+        self.assertEqual(self.course_1.students.count(), 2)
+        self.assertEqual(
+            SpacedRepetition.objects.filter(course=self.course_1).count(), 2
+        )
+
+    def test_enroll_students_command(self):
+        company = Company.objects.create(name="Test Company")
+        Student.objects.filter(id=self.student_2.id).update(company=company)
+        out = StringIO()
+        call_command(
+            "enroll_students", course=self.course_2.id, company=company.id, stdout=out
+        )
+        self.assertIn("Enrolled 1 students in course 2.", out.getvalue())
+        self.assertTrue(
+            SpacedRepetition.objects.filter(
+                student=self.student_2, course=self.course_2
+            ).exists()
+        )
@@ -0,0 +1,138 @@
+import os
+import tempfile
+from unittest.mock import AsyncMock, patch
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core.services.llm_cache import LLMCache, LocMemLRUBackend, SQLiteBackend
+from core.services.llm_service import LLMService
+
+
+class LLMCacheTests(TestCase):
+    def test_make_key_depends_on_every_field(self):
+        key = LLMCache.make_key("prompt", "model", "challenge", 100)
+        self.assertEqual(key, LLMCache.make_key("prompt", "model", "challenge", 100))
+        self.assertNotEqual(key, LLMCache.make_key("other", "model", "challenge", 100))
+        self.assertNotEqual(key, LLMCache.make_key("prompt", "other", "challenge", 100))
+        self.assertNotEqual(key, LLMCache.make_key("prompt", "model", "feedback", 100))
+        self.assertNotEqual(key, LLMCache.make_key("prompt", "model", "challenge", 50))
+
+    def test_hit_and_miss_counters(self):
+        cache = LLMCache(LocMemLRUBackend(max_entries=10), ttl=60)
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_locmem_evicts_least_recently_used(self):
+        backend = LocMemLRUBackend(max_entries=2)
+        backend.set("a", "1", 60)
+        backend.set("b", "2", 60)
+        backend.get("a")
+        backend.set("c", "3", 60)
+        self.assertEqual(backend.get("a"), "1")
+        self.assertIsNone(backend.get("b"))
+        self.assertEqual(backend.get("c"), "3")
+
+    @patch("core.services.llm_cache.time.monotonic")
+    def test_locmem_expires_entries(self, mock_monotonic):
+        backend = LocMemLRUBackend(max_entries=2)
+        mock_monotonic.return_value = 100
+        backend.set("a", "1", 10)
+        mock_monotonic.return_value = 111
+        self.assertIsNone(backend.get("a"))
+
+    def test_sqlite_backend(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            backend = SQLiteBackend(
+                location=os.path.join(temp_dir, "cache.sqlite3"), max_entries=2
+            )
+            backend.set("a", "1", 60)
+            backend.set("b", "2", 60)
+            backend.set("c", "3", 60)
+            self.assertIsNone(backend.get("a"))
+            self.assertEqual(backend.get("c"), "3")
+            backend.set("d", "4", -1)
+            self.assertIsNone(backend.get("d"))
+
+
+@override_settings(LLM_CACHED_SCHEMAS=[settings.OPENAI_CHALLENGE_SCHEMA])
+class LLMServiceCacheTests(TestCase):
+    @patch("core.services.llm_service.OpenAIProvider")
+    def setUp(self, mock_openai_provider):
+        self.mock_provider = mock_openai_provider.return_value
+        self.llm_service = LLMService(provider=settings.OPENAI_PROVIDER)
+        self.llm_service.cache = LLMCache(LocMemLRUBackend(max_entries=10), ttl=60)
+        self.llm_service.transcription_cache = LLMCache(
+            LocMemLRUBackend(max_entries=10), ttl=60
+        )
+
+    def test_challenge_responses_are_cached(self):
+        self.mock_provider.generate_text.return_value = "Generated challenge"
+        for _ in range(2):
+            result = self.llm_service.generate_text(
+                "prompt", output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+            )
+            self.assertEqual(result, "Generated challenge")
+        self.mock_provider.generate_text.assert_called_once()
+        self.assertEqual(self.llm_service.cache.stats(), {"hits": 1, "misses": 1})
+
+    def test_feedback_responses_are_not_cached(self):
+        self.mock_provider.generate_text.return_value = "Generated feedback"
+        for _ in range(2):
+            self.llm_service.generate_text(
+                "prompt", output_schema=settings.OPENAI_FEEDBACK_SCHEMA
+            )
+        self.assertEqual(self.mock_provider.generate_text.call_count, 2)
+
+    def test_failed_responses_are_not_cached(self):
+        self.mock_provider.generate_text.return_value = None
+        for _ in range(2):
+            self.llm_service.generate_text(
+                "prompt", output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+            )
+        self.assertEqual(self.mock_provider.generate_text.call_count, 2)
+
+    def test_cache_can_be_bypassed(self):
+        self.mock_provider.generate_text.return_value = "Generated challenge"
+        for _ in range(2):
+            self.llm_service.generate_text(
+                "prompt",
+                use_cache=False,
+                output_schema=settings.OPENAI_CHALLENGE_SCHEMA,
+            )
+        self.assertEqual(self.mock_provider.generate_text.call_count, 2)
+
+    def test_transcriptions_are_cached_by_audio_content(self):
+        self.mock_provider.get_text_from_audio.return_value = "Transcribed text"
+        for name in ("first.mp3", "retry.mp3"):
+            audio_file = SimpleUploadedFile(name, b"audio data")
+            result = self.llm_service.get_text_from_audio(audio_file)
+            self.assertEqual(result, "Transcribed text")
+            self.assertEqual(audio_file.tell(), 0)
+        self.mock_provider.get_text_from_audio.assert_called_once()
+
+        self.llm_service.get_text_from_audio(SimpleUploadedFile("a.mp3", b"other"))
+        self.assertEqual(self.mock_provider.get_text_from_audio.call_count, 2)
+
+    def test_failed_transcriptions_are_not_cached(self):
+        self.mock_provider.get_text_from_audio.return_value = None
+        for _ in range(2):
+            self.llm_service.get_text_from_audio(
+                SimpleUploadedFile("audio.mp3", b"audio data")
+            )
+        self.assertEqual(self.mock_provider.get_text_from_audio.call_count, 2)
+
+    def test_async_transcriptions_are_cached(self):
+        self.mock_provider.aget_text_from_audio = AsyncMock(
+            return_value="Transcribed text"
+        )
+        for _ in range(2):
+            result = async_to_sync(self.llm_service.aget_text_from_audio)(
+                SimpleUploadedFile("audio.mp3", b"audio data")
+            )
+            self.assertEqual(result, "Transcribed text")
+        self.mock_provider.aget_text_from_audio.assert_awaited_once()
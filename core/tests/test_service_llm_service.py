@@ -1,9 +1,18 @@
-from unittest.mock import Mock, mock_open, patch
+from unittest.mock import AsyncMock, Mock, patch
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from openai.types import CompletionUsage
 
-from core.services.llm_service import LLMService, OpenAIProvider
+from core.services.llm_cache import LLMCache, LocMemLRUBackend
+from core.services.llm_service import (
+    LLMService,
+    OpenAIProvider,
+    get_async_openai_client,
+    get_openai_client,
+)
 
 
 class LLMServiceTests(TestCase):
@@ -11,6 +20,9 @@ class LLMServiceTests(TestCase):
     def setUp(self, mock_openai_provider):
         self.mock_provider = mock_openai_provider.return_value
         self.llm_service = LLMService(provider=settings.OPENAI_PROVIDER)
+        self.llm_service.transcription_cache = LLMCache(
+            LocMemLRUBackend(max_entries=10), ttl=60
+        )
 
     def test_llm_service_initialization(self):
         self.assertEqual(self.llm_service.provider, self.mock_provider)
@@ -32,18 +44,130 @@ class LLMServiceTests(TestCase):
         self.mock_provider.get_text_from_audio.return_value = (
             "Transcribed text from audio"
         )
-        result = self.llm_service.get_text_from_audio("path/to/audio_file.wav")
+        audio_file = SimpleUploadedFile("audio_file.wav", b"audio data")
+        result = self.llm_service.get_text_from_audio(audio_file)
         self.mock_provider.get_text_from_audio.assert_called_once_with(
-            settings.LLM_MODEL_SPEECH_TO_TEXT, "path/to/audio_file.wav"
+            settings.LLM_MODEL_SPEECH_TO_TEXT, audio_file
         )
         self.assertEqual(result, "Transcribed text from audio")
 
+    def test_agenerate_text(self):
+        self.mock_provider.agenerate_text = AsyncMock(
+            return_value="Generated text response"
+        )
+        result = async_to_sync(self.llm_service.agenerate_text)("Hello, world!")
+        self.mock_provider.agenerate_text.assert_awaited_once_with(
+            "Hello, world!", settings.LLM_MODEL, settings.LLM_MAX_TOKENS
+        )
+        self.assertEqual(result, "Generated text response")
+
     def test_invalid_provider(self):
         with self.assertRaises(ValueError):
             LLMService(provider="unsupported_provider")
 
 
 class OpenAIProviderTests(TestCase):
+    def setUp(self):
+        get_openai_client.cache_clear()
+        self.addCleanup(get_openai_client.cache_clear)
+
+    def test_client_is_shared(self):
+        self.assertIs(OpenAIProvider().client, OpenAIProvider().client)
+
+    def test_async_client_is_shared_per_loop(self):
+        async def get_clients():
+            return await get_async_openai_client(), await get_async_openai_client()
+
+        first, second = async_to_sync(get_clients)()
+        self.assertIs(first, second)
+        self.assertIsNot(async_to_sync(get_async_openai_client)(), first)
+
+    @patch("openai.AsyncOpenAI")
+    def test_async_client_closed_with_its_loop(self, mock_async_openai_client):
+        client = mock_async_openai_client.return_value
+        client.close = AsyncMock()
+
+        async def get_client():
+            self.assertIs(await get_async_openai_client(), client)
+            client.close.assert_not_awaited()
+
+        async_to_sync(get_client)()
+        client.close.assert_awaited_once()
+
+    @patch("openai.AsyncOpenAI")
+    def test_agenerate_text(self, mock_async_openai_client):
+        mock_client_instance = mock_async_openai_client.return_value
+        mock_client_instance.beta.chat.completions.parse = AsyncMock(
+            return_value=Mock(
+                choices=[Mock(message=Mock(content="Generated text response"))]
+            )
+        )
+        provider = OpenAIProvider()
+        result = async_to_sync(provider.agenerate_text)(
+            "Hello, world!",
+            "text-davinci-003",
+            50,
+            output_schema=settings.OPENAI_FEEDBACK_SCHEMA,
+        )
+
+        mock_client_instance.beta.chat.completions.parse.assert_awaited_once_with(
+            model="text-davinci-003",
+            messages=[{"role": "user", "content": "Hello, world!"}],
+            max_tokens=50,
+            response_format=OpenAIProvider.FeedbackOutputSchema,
+        )
+        self.assertEqual(result, "Generated text response")
+
+    @patch("openai.AsyncOpenAI")
+    def test_astream_text(self, mock_async_openai_client):
+        async def events():
+            yield Mock(type="chunk")
+            yield Mock(type="content.delta", parsed=None, snapshot='{"feed')
+            yield Mock(
+                type="content.delta",
+                parsed={"feedback": "Good"},
+                snapshot='{"feedback":"Good',
+            )
+
+        stream = mock_async_openai_client.return_value.beta.chat.completions.stream
+        opened_stream = Mock(
+            __aiter__=lambda self: events(),
+            get_final_completion=AsyncMock(
+                return_value=Mock(
+                    usage=CompletionUsage(
+                        prompt_tokens=20, completion_tokens=5, total_tokens=25
+                    )
+                )
+            ),
+        )
+        stream.return_value.__aenter__.return_value = opened_stream
+        provider = OpenAIProvider()
+
+        async def collect():
+            return [
+                chunk
+                async for chunk in provider.astream_text(
+                    "Hello, world!",
+                    "gpt-4o-mini",
+                    50,
+                    output_schema=settings.OPENAI_FEEDBACK_SCHEMA,
+                )
+            ]
+
+        result = async_to_sync(collect)()
+
+        stream.assert_called_once_with(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": "Hello, world!"}],
+            max_tokens=50,
+            response_format=OpenAIProvider.FeedbackOutputSchema,
+            stream_options={"include_usage": True},
+        )
+        opened_stream.get_final_completion.assert_awaited_once()
+        self.assertEqual(
+            result, [(None, '{"feed'), ({"feedback": "Good"}, '{"feedback":"Good')]
+        )
+
     @patch("openai.OpenAI")
     def test_generate_text(self, mock_openai_client):
         mock_client_instance = mock_openai_client.return_value
@@ -83,18 +207,19 @@ class OpenAIProviderTests(TestCase):
         )
         self.assertEqual(result, "Generated text response")
 
-    @patch("builtins.open", new_callable=mock_open, read_data="audio data")
     @patch("openai.OpenAI")
-    def test_get_text_from_audio(self, mock_openai_client, mock_open):
+    def test_get_text_from_audio(self, mock_openai_client):
         mock_client_instance = mock_openai_client.return_value
         mock_client_instance.audio.transcriptions.create.return_value = Mock(
             text="Transcribed text from audio"
         )
+        audio_file = SimpleUploadedFile(
+            "audio_file.wav", b"audio data", content_type="audio/wav"
+        )
         provider = OpenAIProvider()
-        result = provider.get_text_from_audio("whisper-1", "path/to/audio_file.wav")
+        result = provider.get_text_from_audio("whisper-1", audio_file)
 
-        mock_open.assert_called_once_with("path/to/audio_file.wav", "rb")
         mock_client_instance.audio.transcriptions.create.assert_called_once_with(
-            model="whisper-1", file=mock_open.return_value
+            model="whisper-1", file=("audio_file.wav", audio_file, "audio/wav")
         )
         self.assertEqual(result, "Transcribed text from audio")
@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ChallengeStat, Company, MetricsRollup, StudentMetrics
+from core.services.metrics import get_materialized_metrics
+from core.services.utils import summarize_metrics
+from core.tests.factories import TestFactory
+
+
+class MetricsRollupTests(TestFactory):
+    def setUp(self):
+        super().setUp()
+        self.company = Company.objects.create(name="Test Company")
+        self.student_2.company = self.company
+        self.student_2.save()
+        ChallengeStat.objects.create(
+            challenge=self.challenge_2, student=self.student_2, score=6, moment=1
+        )
+        ChallengeStat.objects.create(
+            challenge=self.challenge_3, student=self.student_2, score=4, moment=2
+        )
+
+    def assertMatchesLiveMetrics(self):
+        metrics = get_materialized_metrics(self.company.id)
+        live_metrics = {
+            "global": summarize_metrics(ChallengeStat.objects.all()),
+            "company": summarize_metrics(
+                ChallengeStat.objects.filter(student__company=self.company)
+            ),
+        }
+        self.maxDiff = None
+        for scope, summary in live_metrics.items():
+            for top_students in (summary, metrics[scope]):
+                top_students["top_students"] = sorted(
+                    top_students["top_students"], key=lambda row: row["student__name"]
+                )
+            for average in ("global", "moment1", "moment2", "moment3"):
+                for averages in (summary, metrics[scope]):
+                    value = averages[f"average_scores_{average}"]["average_score"]
+                    if value is not None:
+                        averages[f"average_scores_{average}"]["average_score"] = round(
+                            value, 6
+                        )
+            self.assertEqual(metrics[scope], summary)
+
+    def test_rollups_follow_created_stats(self):
+        global_rollup = MetricsRollup.objects.get(scope="global", moment=0)
+        self.assertEqual(global_rollup.stats_count, 3)
+        self.assertEqual(global_rollup.completed_count, 2)
+        self.assertEqual(global_rollup.score_sum, 17.5)
+        self.assertEqual(global_rollup.total_minutes, 20)
+        company_rollup = MetricsRollup.objects.get(scope=str(self.company.id), moment=1)
+        self.assertEqual(company_rollup.stats_count, 1)
+        self.assertEqual(
+            StudentMetrics.objects.get(student=self.student_2).company, self.company
+        )
+        self.assertMatchesLiveMetrics()
+
+    def test_rollups_follow_updated_and_deleted_stats(self):
+        self.challenge_stat_3.score = 7
+        self.challenge_stat_3.moment = 3
+        self.challenge_stat_3.save()
+        self.challenge_stat_1.delete()
+        self.assertEqual(
+            StudentMetrics.objects.get(student=self.student_1).completed_count, 2
+        )
+        self.assertMatchesLiveMetrics()
+
+    def test_rollups_follow_bulk_and_cascade_deletes(self):
+        ChallengeStat.objects.filter(student=self.student_1, score__gt=0).delete()
+        self.assertMatchesLiveMetrics()
+        self.challenge_3.delete()
+        self.assertMatchesLiveMetrics()
+        self.assertEqual(
+            StudentMetrics.objects.get(student=self.student_2).completed_count, 1
+        )
+        self.student_1.delete()
+        self.course_1.delete()
+        self.assertFalse(ChallengeStat.objects.exists())
+        self.assertFalse(
+            MetricsRollup.objects.exclude(stats_count=0, completed_count=0).exists()
+        )
+
+    def test_rollups_follow_student_company_changes(self):
+        self.student_1.company = self.company
+        self.student_1.save()
+        self.assertMatchesLiveMetrics()
+        self.assertEqual(
+            StudentMetrics.objects.get(student=self.student_1).company, self.company
+        )
+        self.student_2.company = None
+        self.student_2.save()
+        self.assertMatchesLiveMetrics()
+
+    def test_rebuild_command(self):
+        MetricsRollup.objects.all().delete()
+        StudentMetrics.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_metrics", stdout=out)
+        self.assertIn(
+            "Rebuilt 5 metrics rollups and 2 student metrics.", out.getvalue()
+        )
+        self.assertMatchesLiveMetrics()
+
+    def test_company_metrics_view(self):
+        client = APIClient()
+        client.login(username="user_t2", password="pwd2")
+        # session, user and student, then rollups and two top student lists
+        with self.assertNumQueries(6):
+            response = client.get(reverse("company-metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["company"]["total_completed_challenges"], 2)
+        self.assertEqual(response.data["global"]["total_completed_challenges"], 4)
+
+    def test_company_metrics_view_date_window(self):
+        client = APIClient()
+        client.login(username="user_t2", password="pwd2")
+        response = client.get(reverse("company-metrics"), {"days": 30})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["company"]["total_completed_challenges"], 2)
+        response = client.get(reverse("company-metrics"), {"days": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
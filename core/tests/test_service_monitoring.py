@@ -0,0 +1,210 @@
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import TestCase, override_settings
+from openai.types import CompletionUsage
+from prometheus_client import REGISTRY
+
+from core.services.challenge import ChallengeService
+from core.services.llm_service import LLMService, OpenAIProvider
+from core.services.monitoring import get_registry, render_metrics
+from core.tests.factories import TestFactory
+
+
+class MetricsTestMixin:
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def assertIncreases(self, name, labels, by, func):
+        before = self.sample(name, **labels)
+        result = func()
+        self.assertEqual(self.sample(name, **labels) - before, by)
+        return result
+
+
+class LLMMetricsTests(MetricsTestMixin, TestCase):
+    @patch("core.services.llm_service.get_openai_client")
+    def setUp(self, mock_get_openai_client):
+        self.client = mock_get_openai_client.return_value
+        self.llm_service = LLMService()
+        self.llm_service.provider = OpenAIProvider()
+        self.llm_service.cache.clear()
+
+    def test_generate_text_counts_calls_and_tokens(self):
+        self.client.beta.chat.completions.parse.return_value = Mock(
+            choices=[Mock(message=Mock(content="Feedback"))],
+            usage=CompletionUsage(
+                prompt_tokens=30, completion_tokens=12, total_tokens=42
+            ),
+        )
+        self.assertIncreases(
+            "sirius_llm_tokens_total",
+            {"schema": "feedback", "type": "completion"},
+            12,
+            lambda: self.assertIncreases(
+                "sirius_llm_calls_total",
+                {"schema": "feedback", "outcome": "ok"},
+                1,
+                lambda: self.llm_service.generate_text(
+                    "Prompt", output_schema=settings.OPENAI_FEEDBACK_SCHEMA
+                ),
+            ),
+        )
+        self.assertGreater(
+            self.sample("sirius_llm_call_duration_seconds_count", schema="feedback"),
+            0,
+        )
+
+    def test_streamed_text_counts_calls(self):
+        async def stream(*args, **kwargs):
+            yield {"feedback": "Go"}, '{"feedback":"Go'
+            yield {"feedback": "Good"}, '{"feedback":"Good"}'
+
+        async def collect():
+            return [
+                chunk
+                async for chunk in self.llm_service.astream_text(
+                    "Prompt", output_schema=settings.OPENAI_FEEDBACK_SCHEMA
+                )
+            ]
+
+        with patch.object(self.llm_service.provider, "astream_text", stream):
+            chunks = self.assertIncreases(
+                "sirius_llm_calls_total",
+                {"schema": "feedback", "outcome": "ok"},
+                1,
+                lambda: async_to_sync(collect)(),
+            )
+        self.assertEqual(len(chunks), 2)
+        self.assertGreater(
+            self.sample("sirius_llm_call_duration_seconds_count", schema="feedback"),
+            0,
+        )
+
+    @override_settings(LLM_CACHED_SCHEMAS=[settings.OPENAI_CHALLENGE_SCHEMA])
+    def test_errors_and_cache_hits(self):
+        self.client.beta.chat.completions.parse.side_effect = Exception("Timeout")
+        self.assertIncreases(
+            "sirius_llm_calls_total",
+            {"schema": "challenge", "outcome": "error"},
+            1,
+            lambda: self.llm_service.generate_text(
+                "Prompt", output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+            ),
+        )
+        self.llm_service.cache.set(
+            self.llm_service._get_cache_key(
+                "Prompt", True, output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+            ),
+            "Cached challenge",
+        )
+        self.assertIncreases(
+            "sirius_llm_calls_total",
+            {"schema": "challenge", "outcome": "cached"},
+            1,
+            lambda: self.llm_service.generate_text(
+                "Prompt", output_schema=settings.OPENAI_CHALLENGE_SCHEMA
+            ),
+        )
+
+
+class ChallengeMetricsTests(MetricsTestMixin, TestFactory):
+    def setUp(self):
+        super().setUp()
+        self.service = ChallengeService()
+
+    def get_challenge(self):
+        return self.service.get_challenge(self.student_1.id, self.course_1.id)
+
+    def test_served_from_pool(self):
+        self.assertIncreases(
+            "sirius_challenges_served_total",
+            {"source": "pool"},
+            1,
+            self.get_challenge,
+        )
+
+    @patch(
+        "core.services.challenge.ChallengeService.generate_challenge",
+        return_value="Generated challenge",
+    )
+    def test_generated(self, mock_generate_challenge):
+        self.student_1.challenges.add(self.challenge_1, self.challenge_2)
+        self.assertIncreases(
+            "sirius_challenges_served_total",
+            {"source": "generated"},
+            1,
+            self.get_challenge,
+        )
+
+    @patch(
+        "core.services.challenge.ChallengeService.generate_challenge",
+        return_value=None,
+    )
+    def test_failed_generation(self, mock_generate_challenge):
+        self.student_1.challenges.add(self.challenge_1, self.challenge_2)
+        self.assertIsNone(
+            self.assertIncreases(
+                "sirius_challenges_served_total",
+                {"source": "error"},
+                1,
+                self.get_challenge,
+            )
+        )
+
+    @patch(
+        "core.services.llm_service.LLMService.get_text_from_audio",
+        side_effect=Exception("Transcription error"),
+    )
+    def test_spooled_audio_bytes(self, mock_get_text_from_audio):
+        audio_file = TemporaryUploadedFile("answer.mp3", "audio/mpeg", 13, None)
+        audio_file.write(b"Audio content")
+        path = audio_file.temporary_file_path()
+        before = self.sample("sirius_audio_disk_bytes")
+        self.assertIncreases(
+            "sirius_audio_upload_bytes_total",
+            {"storage": "disk"},
+            13,
+            lambda: self.service.get_feedback(
+                self.student_1.id, self.challenge_1, "audio", audio_file
+            ),
+        )
+        self.assertEqual(self.sample("sirius_audio_disk_bytes"), before)
+        self.assertFalse(os.path.exists(path))
+
+
+class MetricsEndpointTests(TestFactory):
+    @override_settings(PROMETHEUS_METRICS_TOKEN="scrape-token")
+    def test_exposition(self):
+        self.client.get("/api/courses-summary/")
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(
+            'sirius_request_duration_seconds_count{method="GET",status="401",'
+            'view="course-summary"}',
+            response.content.decode(),
+        )
+
+    @override_settings(PROMETHEUS_METRICS_TOKEN="scrape-token")
+    def test_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_token_outside_debug(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_multiprocess_registry(self):
+        with tempfile.TemporaryDirectory() as directory, patch.dict(
+            os.environ, {"PROMETHEUS_MULTIPROC_DIR": directory}
+        ):
+            self.assertIsNot(get_registry(), REGISTRY)
+            body, _ = render_metrics()
+        self.assertEqual(body, b"")
@@ -0,0 +1,207 @@
+import io
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Company, SpacedRepetition, Student
+from core.services.onboarding import CompanyOnboarding, read_rows
+from core.tests.factories import TestFactory
+
+CSV_CONTENT = (
+    "username,password,name,email,courses\n"
+    "alice,pwd-a,Alice,alice@test.com,1;2\n"
+    "bob,pwd-b,,,\n"
+    "alice,pwd-c,Alice again,,\n"
+    "user_t1,pwd-d,Taken,,\n"
+    "carol,,Carol,,\n"
+    "dave,pwd-e,Dave,,99\n"
+)
+
+
+class CompanyOnboardingTests(TestFactory):
+    def setUp(self):
+        super().setUp()
+        self.company = Company.objects.create(name="Test Company")
+
+    def run_onboarding(self, content, file_format="csv", **kwargs):
+        return CompanyOnboarding(self.company, **kwargs).run(
+            read_rows(io.StringIO(content), file_format)
+        )
+
+    def test_csv_import(self):
+        report = self.run_onboarding(
+            CSV_CONTENT, course_ids=[self.course_2.id], batch_size=2, hash_workers=2
+        )
+
+        self.assertEqual(report["processed"], 6)
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(
+            report["errors"],
+            [
+                {"line": 4, "error": "Duplicate username in file."},
+                {"line": 5, "error": "Username already taken."},
+                {"line": 6, "error": "username and password are required."},
+                {"line": 7, "error": "Unknown courses [99]."},
+            ],
+        )
+        alice = Student.objects.get(user__username="alice")
+        self.assertEqual(alice.name, "Alice")
+        self.assertEqual(alice.company, self.company)
+        self.assertTrue(alice.user.check_password("pwd-a"))
+        self.assertTrue(Token.objects.filter(user=alice.user).exists())
+        self.assertEqual(
+            set(alice.courses.values_list("id", flat=True)),
+            {self.course_1.id, self.course_2.id},
+        )
+        bob = Student.objects.get(user__username="bob")
+        self.assertEqual(bob.name, "bob")
+        self.assertEqual(list(bob.courses.values_list("id", flat=True)), [2])
+        self.assertEqual(SpacedRepetition.objects.filter(student=bob).count(), 1)
+
+    def test_jsonl_import(self):
+        content = (
+            '{"username": "alice", "password": "pwd-a", "courses": [1]}\n'
+            "not json\n"
+            "\n"
+            '{"username": "bob", "password": "pwd-b"}\n'
+        )
+        report = self.run_onboarding(content, "jsonl", hash_workers=0)
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(
+            report["errors"], [{"line": 2, "error": "Row could not be parsed."}]
+        )
+
+    def test_jsonl_field_types(self):
+        content = (
+            '{"username": 5, "password": "pwd-a"}\n'
+            '{"username": "bob", "password": 5}\n'
+            '{"username": "carol", "password": "pwd-c", "email": 3}\n'
+            '{"username": "dave", "password": "pwd-d", "courses": [1.5]}\n'
+            '{"username": "erin", "password": "pwd-e", "courses": 1}\n'
+            '{"username": "frank", "password": "pwd-f", "courses": [1, "2"]}\n'
+        )
+        report = self.run_onboarding(content, "jsonl", hash_workers=0)
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(
+            report["errors"],
+            [
+                {"line": 1, "error": "username must be a string."},
+                {"line": 2, "error": "password must be a string."},
+                {"line": 3, "error": "email must be a string."},
+                {"line": 4, "error": "courses must be course ids."},
+                {"line": 5, "error": "courses must be course ids."},
+            ],
+        )
+        frank = Student.objects.get(user__username="frank")
+        self.assertCountEqual(frank.courses.values_list("id", flat=True), [1, 2])
+
+    @override_settings(COURSE_ASSIGNMENT_COUNT=1)
+    def test_assign_courses_policy(self):
+        content = (
+            '{"username": "alice", "password": "pwd-a", "courses": [1]}\n'
+            '{"username": "bob", "password": "pwd-b"}\n'
+        )
+        self.student_1.courses.add(self.course_1)
+        report = self.run_onboarding(
+            content, "jsonl", hash_workers=0, assign_courses="least_loaded"
+        )
+        self.assertEqual(report["created"], 2)
+        bob = Student.objects.get(user__username="bob")
+        self.assertCountEqual(
+            bob.courses.values_list("id", flat=True), [self.course_2.id]
+        )
+
+    def test_row_limit(self):
+        report = self.run_onboarding(CSV_CONTENT, max_rows=1, hash_workers=0)
+        self.assertEqual(report["processed"], 1)
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["errors"][0]["error"], "Row limit of 1 reached.")
+
+    def test_endpoint_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user_1)
+        response = client.post(reverse("company-onboarding"), {})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_endpoint(self):
+        admin = get_user_model().objects.create_superuser(
+            username="admin", password="admin"
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        response = client.post(
+            reverse("company-onboarding"),
+            {
+                "company_id": self.company.id,
+                "course_ids": [self.course_1.id],
+                "file": SimpleUploadedFile("users.csv", CSV_CONTENT.encode()),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(len(response.data["errors"]), 4)
+
+    def test_endpoint_multiline_csv_field(self):
+        admin = get_user_model().objects.create_superuser(
+            username="admin", password="admin"
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        content = 'username,password,name\r\nalice,pwd-a,"Alice\r\nSmith"\r\n'
+        response = client.post(
+            reverse("company-onboarding"),
+            {
+                "company_id": self.company.id,
+                "file": SimpleUploadedFile("users.csv", content.encode()),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(
+            Student.objects.get(user__username="alice").name, "Alice\r\nSmith"
+        )
+
+    @override_settings(ONBOARDING_API_MAX_ROWS=5)
+    def test_endpoint_refuses_large_files(self):
+        admin = get_user_model().objects.create_superuser(
+            username="admin", password="admin"
+        )
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        response = client.post(
+            reverse("company-onboarding"),
+            {
+                "company_id": self.company.id,
+                "file": SimpleUploadedFile("users.csv", CSV_CONTENT.encode()),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("onboard_company", response.data["error"])
+        self.assertFalse(Student.objects.filter(company=self.company).exists())
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(CSV_CONTENT)
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command(
+            "onboard_company",
+            f.name,
+            company=self.company.id,
+            workers=0,
+            stdout=out,
+            stderr=err,
+        )
+        self.assertIn("Created 2 of 6 rows, 4 errors.", out.getvalue())
+        self.assertIn("Line 5: Username already taken.", err.getvalue())
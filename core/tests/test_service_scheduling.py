@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import override_settings
+
+from core.models import ChallengeStat, Company, SpacedRepetition, SpacedRepetitionDue
+from core.services.scheduling import (
+    check_review_policies,
+    get_review_policy,
+    reschedule_spaced_repetitions,
+)
+from core.services.utils import is_spaced_repetition_check
+from core.tests.factories import TestFactory
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class ReviewPolicyTests(TestFactory):
+    def test_default_schedule_without_scores(self):
+        self.assertEqual(
+            get_review_policy().schedule(START, {}),
+            [
+                START + timedelta(days=1),
+                START + timedelta(days=7),
+                START + timedelta(days=30),
+            ],
+        )
+
+    def test_good_scores_stretch_the_gaps(self):
+        policy = get_review_policy()
+        reviewed_at = START + timedelta(days=2)
+        moment1, moment2, moment3 = policy.schedule(START, {1: (10, reviewed_at)})
+        self.assertEqual(moment1, START + timedelta(days=1))
+        # The ease goes from 2.5 to 2.6, the 6 day gap grows by 2.6 / 2.5.
+        self.assertEqual(moment2, reviewed_at + timedelta(days=6) * 2.6 / 2.5)
+        self.assertEqual(moment3, moment2 + timedelta(days=23) * 2.6 / 2.5)
+
+    def test_failed_review_restarts_from_first_interval(self):
+        reviewed_at = START + timedelta(days=2)
+        _, moment2, moment3 = get_review_policy().schedule(START, {1: (4, reviewed_at)})
+        self.assertEqual(moment2, reviewed_at + timedelta(days=1))
+        self.assertLess(moment3 - moment2, timedelta(days=23))
+
+    def test_ease_has_a_floor(self):
+        policy = get_review_policy()
+        self.assertEqual(policy.next_ease(1.3, 0), 1.3)
+
+    @override_settings(
+        SPACED_REPETITION_POLICIES={
+            "default": {"intervals": [2, 8, 40]},
+            "course:1": {"intervals": [1, 3, 9]},
+            "company:5": {"intervals": [1, 2, 3], "ease": 2.0},
+        }
+    )
+    def test_policy_overrides(self):
+        self.assertEqual(get_review_policy(None, 2).intervals[2], timedelta(days=40))
+        self.assertEqual(get_review_policy(None, 1).intervals[2], timedelta(days=9))
+        policy = get_review_policy(5, 1)
+        self.assertEqual(policy.intervals[2], timedelta(days=3))
+        self.assertEqual(policy.ease, 2.0)
+
+
+class RescheduleTests(TestFactory):
+    def setUp(self):
+        super().setUp()
+        self.student_1.courses.add(self.course_1)
+        self.student_2.courses.add(self.course_1)
+
+    def get_schedule(self, student):
+        return SpacedRepetition.objects.get(student=student, course=self.course_1)
+
+    def test_completed_moment_reschedules_the_next(self):
+        before = self.get_schedule(self.student_1)
+        ChallengeStat.objects.create(
+            challenge=self.challenge_2, student=self.student_1, score=3, moment=1
+        )
+        is_spaced_repetition_check(self.student_1.id, self.course_1.id, 1)
+        after = self.get_schedule(self.student_1)
+        self.assertTrue(after.is_completed1)
+        self.assertEqual(after.moment1, before.moment1)
+        # A failed first review brings the second one forward to a day later.
+        self.assertLess(after.moment2, before.moment2)
+        self.assertEqual(
+            set(after.due_moments.values_list("moment", "due_at")),
+            {(2, after.moment2), (3, after.moment3)},
+        )
+
+    def test_unchanged_schedules_are_skipped(self):
+        self.assertEqual(
+            reschedule_spaced_repetitions(SpacedRepetition.objects.all()), 0
+        )
+
+    @override_settings(
+        SPACED_REPETITION_POLICIES={"company:1": {"intervals": [2, 4, 8]}}
+    )
+    def test_company_policy_change(self):
+        company = Company.objects.create(id=1, name="Test Company")
+        self.student_2.company = company
+        self.student_2.save()
+        SpacedRepetition.objects.filter(student=self.student_2).update(
+            is_completed1=True
+        )
+        before = self.get_schedule(self.student_2)
+        untouched = self.get_schedule(self.student_1)
+
+        # The rows, their score history, then for the changed row the bulk
+        # update and the due review read, delete and insert in a savepoint.
+        with self.assertNumQueries(8):
+            rescheduled = reschedule_spaced_repetitions(
+                SpacedRepetition.objects.all(), batch_size=3
+            )
+        self.assertEqual(rescheduled, 1)
+        after = self.get_schedule(self.student_2)
+        self.assertEqual(after.moment1, before.moment1)
+        self.assertEqual(after.moment2, after.created_at + timedelta(days=4))
+        self.assertEqual(after.moment3, after.created_at + timedelta(days=8))
+        self.assertEqual(
+            SpacedRepetitionDue.objects.filter(student=self.student_2).count(), 2
+        )
+        self.assertEqual(
+            self.get_schedule(self.student_1).updated_at, untouched.updated_at
+        )
+
+    def test_unchanged_moments_stay_processed(self):
+        SpacedRepetition.objects.filter(student=self.student_1).update(
+            is_completed1=True
+        )
+        SpacedRepetitionDue.objects.filter(student=self.student_1).update(
+            processed_at=START
+        )
+        with override_settings(
+            SPACED_REPETITION_POLICIES={"default": {"intervals": [1, 7, 60]}}
+        ):
+            reschedule_spaced_repetitions(SpacedRepetition.objects.all())
+        self.assertEqual(
+            dict(
+                SpacedRepetitionDue.objects.filter(student=self.student_1).values_list(
+                    "moment", "processed_at"
+                )
+            ),
+            {2: START, 3: None},
+        )
+
+    @override_settings(SPACED_REPETITION_POLICIES={"course:1": {"intervals": [1, 7]}})
+    def test_policies_need_three_intervals(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_review_policies()
+
+    def test_policies_need_valid_values(self):
+        for policy in [
+            {"intervals": [1, 7, 7]},
+            {"intervals": [0, 7, 30]},
+            {"intervals": [30, 7, 1]},
+            {"ease": 0, "min_ease": 0},
+            {"ease": 1.2},
+            {"pass_score": -1},
+            {"pass_score": 11},
+            {"pass_score": 0, "max_score": 0},
+            {"ease": "2.5"},
+        ]:
+            with (
+                self.subTest(policy=policy),
+                override_settings(SPACED_REPETITION_POLICIES={"course:1": policy}),
+                self.assertRaises(ImproperlyConfigured),
+            ):
+                check_review_policies()
+
+    @override_settings(SPACED_REPETITION_POLICIES={"course:1": {"ease": 2.0}})
+    def test_command(self):
+        ChallengeStat.objects.create(
+            challenge=self.challenge_1, student=self.student_1, score=10, moment=1
+        )
+        out = StringIO()
+        call_command(
+            "reschedule_reviews", "--course", str(self.course_1.id), stdout=out
+        )
+        self.assertEqual(out.getvalue().strip(), "Rescheduled 1 spaced repetitions.")
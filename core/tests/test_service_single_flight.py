@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from core.services.single_flight import (
+    AsyncSingleFlight,
+    SingleFlight,
+    SingleFlightTimeout,
+    aadvisory_lock,
+    advisory_lock,
+)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def slow_call(self, result):
+        self.started.set()
+        self.release.wait(5)
+        return result
+
+    def test_concurrent_callers_share_one_call(self):
+        fn = Mock(side_effect=lambda: self.slow_call("generated"))
+        results = []
+
+        def call():
+            results.append(self.single_flight.do("course:1", fn, timeout=5))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        self.started.wait(5)
+        waiters = [threading.Thread(target=call) for _ in range(4)]
+        for waiter in waiters:
+            waiter.start()
+        self.release.set()
+        for thread in [leader, *waiters]:
+            thread.join(5)
+
+        fn.assert_called_once()
+        self.assertEqual(results, ["generated"] * 5)
+
+    def test_different_keys_run_independently(self):
+        self.assertEqual(self.single_flight.do("course:1", lambda: 1), 1)
+        self.assertEqual(self.single_flight.do("course:2", lambda: 2), 2)
+
+    def test_error_is_shared_and_key_released(self):
+        def fail():
+            raise ValueError("LLM error")
+
+        with self.assertRaises(ValueError):
+            self.single_flight.do("course:1", fail)
+        self.assertEqual(self.single_flight.do("course:1", lambda: "ok"), "ok")
+
+    def test_waiter_timeout(self):
+        leader = threading.Thread(
+            target=self.single_flight.do,
+            args=("course:1", lambda: self.slow_call("generated")),
+        )
+        leader.start()
+        self.started.wait(5)
+        with self.assertRaises(SingleFlightTimeout):
+            self.single_flight.do("course:1", lambda: "other", timeout=0.01)
+        self.release.set()
+        leader.join(5)
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.single_flight = AsyncSingleFlight()
+        self.calls = 0
+
+    async def slow_call(self):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return "generated"
+
+    async def test_concurrent_callers_share_one_call(self):
+        results = await asyncio.gather(
+            *[self.single_flight.do("course:1", self.slow_call) for _ in range(5)]
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ["generated"] * 5)
+        self.assertEqual(
+            await self.single_flight.do("course:1", self.slow_call), "generated"
+        )
+        self.assertEqual(self.calls, 2)
+
+    async def test_error_is_shared(self):
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("LLM error")
+
+        results = await asyncio.gather(
+            self.single_flight.do("course:1", fail),
+            self.single_flight.do("course:1", fail),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    async def test_waiter_timeout(self):
+        leader = asyncio.ensure_future(
+            self.single_flight.do("course:1", self.slow_call)
+        )
+        await asyncio.sleep(0)
+        with self.assertRaises(SingleFlightTimeout):
+            await self.single_flight.do("course:1", self.slow_call, timeout=0.001)
+        self.assertEqual(await leader, "generated")
+
+
+@patch("core.services.single_flight.ADVISORY_LOCK_POLL_INTERVAL", 0.01)
+@patch("core.services.single_flight._unlock")
+@patch("core.services.single_flight._try_lock")
+@patch("core.services.single_flight.connection", Mock(vendor="postgresql"))
+class AdvisoryLockTests(SimpleTestCase):
+    def test_acquired_after_polling(self, mock_try_lock, mock_unlock):
+        mock_try_lock.side_effect = [False, False, True]
+        with advisory_lock("course:1", timeout=5) as acquired:
+            self.assertTrue(acquired)
+        self.assertEqual(mock_try_lock.call_count, 3)
+        mock_unlock.assert_called_once()
+
+    def test_gives_up_after_timeout(self, mock_try_lock, mock_unlock):
+        mock_try_lock.return_value = False
+        with advisory_lock("course:1", timeout=0.05) as acquired:
+            self.assertFalse(acquired)
+        mock_unlock.assert_not_called()
+
+    async def test_async_gives_up_after_timeout(self, mock_try_lock, mock_unlock):
+        mock_try_lock.return_value = False
+        # Long enough to poll again after the first query's thread hop.
+        async with aadvisory_lock("course:1", timeout=0.5) as acquired:
+            self.assertFalse(acquired)
+        self.assertGreater(mock_try_lock.call_count, 1)
+        mock_unlock.assert_not_called()
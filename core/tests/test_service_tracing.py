@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from sentry_sdk.utils import format_timestamp
+
+from core.services.tracing import DEFAULT_ROUTE_RATES, TracesSampler
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def make_event(path, duration, status="ok"):
+    return {
+        "type": "transaction",
+        "transaction": path,
+        "request": {"url": f"https://sirius.example.com{path}"},
+        "contexts": {"trace": {"status": status}},
+        "start_timestamp": format_timestamp(START),
+        "timestamp": format_timestamp(START + timedelta(seconds=duration)),
+    }
+
+
+class TracesSamplerTests(SimpleTestCase):
+    def setUp(self):
+        self.sampler = TracesSampler(0.05, DEFAULT_ROUTE_RATES, slow_ms=2000)
+        self.tail_sampler = TracesSampler(
+            0.05, DEFAULT_ROUTE_RATES, slow_ms=2000, tail=True
+        )
+
+    def sample(self, sampler, path, **context):
+        return sampler.traces_sampler(
+            {"wsgi_environ": {"PATH_INFO": path}, "parent_sampled": None, **context}
+        )
+
+    def test_route_rates(self):
+        self.assertEqual(self.sample(self.sampler, "/api/get-challenge-by-id/3/"), 0.01)
+        self.assertEqual(self.sample(self.sampler, "/api/get-challenge/"), 0.5)
+        self.assertEqual(self.sample(self.sampler, "/api/get-feedback/stream/"), 0.5)
+        self.assertEqual(self.sample(self.sampler, "/metrics"), 0.0)
+        self.assertEqual(self.sample(self.sampler, "/api/company-metrics/"), 0.05)
+
+    def test_asgi_scope(self):
+        self.assertEqual(
+            self.sampler.traces_sampler({"asgi_scope": {"path": "/api/get-feedback/"}}),
+            0.5,
+        )
+
+    def test_parent_decision_wins(self):
+        self.assertEqual(
+            self.sample(self.sampler, "/metrics", parent_sampled=True), 1.0
+        )
+
+    def test_head_mode_keeps_sampled_transactions(self):
+        event = make_event("/api/courses-summary/", 0.01)
+        self.assertIs(self.sampler.before_send_transaction(event, {}), event)
+
+    def test_tail_mode_traces_everything_but_excluded_routes(self):
+        self.assertEqual(self.sample(self.tail_sampler, "/api/courses-summary/"), 1.0)
+        self.assertEqual(self.sample(self.tail_sampler, "/metrics"), 0.0)
+
+    @patch("core.services.tracing.random.random", return_value=0.5)
+    def test_tail_mode_keeps_slow_and_failed(self, mock_random):
+        keep = self.tail_sampler.before_send_transaction
+        self.assertIsNone(keep(make_event("/api/courses-summary/", 0.05), {}))
+        slow = make_event("/api/courses-summary/", 2.5)
+        self.assertIs(keep(slow, {}), slow)
+        failed = make_event("/api/courses-summary/", 0.05, status="internal_error")
+        self.assertIs(keep(failed, {}), failed)
+        self.assertIsNone(
+            keep(make_event("/api/courses-summary/", 0.05, status="not_found"), {})
+        )
+
+    @patch("core.services.tracing.random.random", return_value=0.3)
+    def test_tail_mode_route_rate(self, mock_random):
+        keep = self.tail_sampler.before_send_transaction
+        fast = make_event("/api/get-feedback/", 0.5)
+        self.assertIs(keep(fast, {}), fast)
+        self.assertIsNone(keep(make_event("/api/get-challenge-by-id/1/", 0.5), {}))
@@ -1,23 +1,121 @@
-from unittest import mock
+from datetime import timedelta
 
-from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
 
-from core.services.utils import delete_temp_file
+from core.models import ChallengeStat, SpacedRepetition
+from core.services.utils import (
+    get_best_challenge_stats,
+    is_spaced_repetition_check,
+    save_score,
+    summarize_metrics,
+)
+from core.tests.factories import TestFactory
 
 
-class UtilsTest(TestCase):
-    @mock.patch("os.path.isfile")
-    @mock.patch("os.remove")
-    def test_delete_temp_file_exists(self, mock_remove, mock_isfile):
-        mock_isfile.return_value = True
-        result = delete_temp_file("fake_path/to/file.txt")
-        mock_remove.assert_called_once_with("fake_path/to/file.txt")
-        self.assertTrue(result)
+class FeedbackUtilsTest(TestFactory):
+    def test_save_score_inserts_final_values(self):
+        with CaptureQueriesContext(connection) as queries:
+            challenge_stat = save_score(
+                self.student_1.id, self.challenge_2.id, '{"score_average": 6.5}', 2
+            )
+        stat_queries = [
+            query["sql"] for query in queries if '"core_challengestat"' in query["sql"]
+        ]
+        self.assertEqual(len(stat_queries), 2)
+        self.assertTrue(stat_queries[0].startswith("INSERT"))
+        self.assertFalse(any(sql.startswith("UPDATE") for sql in stat_queries))
+        challenge_stat.refresh_from_db()
+        self.assertEqual(challenge_stat.score, 6.5)
+        self.assertEqual(challenge_stat.moment, 2)
 
-    @mock.patch("os.path.isfile")
-    @mock.patch("os.remove")
-    def test_delete_temp_file_not_exists(self, mock_remove, mock_isfile):
-        mock_isfile.return_value = False
-        result = delete_temp_file("fake_path/to/non_existent_file.txt")
-        mock_remove.assert_not_called()
-        self.assertFalse(result)
+    def test_save_score_ignores_invalid_moment(self):
+        challenge_stat = save_score(
+            self.student_1.id, self.challenge_2.id, '{"score_average": 6.5}', 7
+        )
+        self.assertEqual(challenge_stat.moment, 0)
+
+    def test_is_spaced_repetition_check_updates_once(self):
+        self.student_1.courses.add(self.course_1)
+        # The update, the due review delete, then rescheduling the third
+        # moment: the schedule and its score history, nothing changed.
+        with self.assertNumQueries(4):
+            updated = is_spaced_repetition_check(self.student_1.id, self.course_1.id, 2)
+        self.assertEqual(updated, 1)
+        self.assertEqual(
+            is_spaced_repetition_check(self.student_1.id, self.course_1.id, 2), 0
+        )
+        self.assertTrue(
+            SpacedRepetition.objects.get(
+                student=self.student_1, course=self.course_1
+            ).is_completed2
+        )
+
+    def test_is_spaced_repetition_check_invalid_moment(self):
+        with self.assertRaises(ValueError):
+            is_spaced_repetition_check(self.student_1.id, self.course_1.id, 4)
+
+
+class SummarizeMetricsTest(TestFactory):
+    def setUp(self):
+        super().setUp()
+        ChallengeStat.objects.create(
+            challenge=self.challenge_2, student=self.student_2, score=6, moment=1
+        )
+        ChallengeStat.objects.filter(id=self.challenge_stat_1.id).update(
+            created_at=now() - timedelta(days=40)
+        )
+
+    def test_summarize_metrics_single_aggregate(self):
+        with self.assertNumQueries(2):
+            metrics = summarize_metrics(ChallengeStat.objects.all())
+            metrics["top_students"] = list(metrics["top_students"])
+        self.assertEqual(metrics["average_scores_moment1"], {"average_score": 6})
+        self.assertEqual(metrics["average_scores_moment2"], {"average_score": None})
+        self.assertEqual(metrics["average_scores_global"]["average_score"], 5.875)
+        self.assertEqual(metrics["total_time"], {"total_time": 30})
+        self.assertEqual(metrics["total_completed_challenges"], 3)
+        self.assertEqual(
+            metrics["top_students"][0],
+            {"student__name": self.student_1.name, "total_challenges": 2},
+        )
+
+    def test_summarize_metrics_date_window(self):
+        metrics = summarize_metrics(
+            ChallengeStat.objects.all(), since=now() - timedelta(days=30)
+        )
+        self.assertEqual(metrics["total_completed_challenges"], 2)
+        self.assertEqual(metrics["total_time"], {"total_time": 20})
+
+
+class BestChallengeStatsTest(TestFactory):
+    def test_one_best_attempt_per_challenge(self):
+        tied_stat = ChallengeStat.objects.create(
+            challenge=self.challenge_1, student=self.student_1, score=9.0
+        )
+        ChallengeStat.objects.create(
+            challenge=self.challenge_1, student=self.student_1, score=10, skipped=True
+        )
+        ChallengeStat.objects.create(
+            challenge=self.challenge_2, student=self.student_1, score=4
+        )
+        best_stat_2 = ChallengeStat.objects.create(
+            challenge=self.challenge_2, student=self.student_1, score=7
+        )
+
+        with self.assertNumQueries(1):
+            stats = list(get_best_challenge_stats(self.student_1, self.course_1.id))
+            self.assertEqual(
+                [stat.challenge.name for stat in stats],
+                [self.challenge_1.name, self.challenge_2.name],
+            )
+
+        self.assertEqual([stat.id for stat in stats], [tied_stat.id, best_stat_2.id])
+
+    def test_other_students_and_courses_are_ignored(self):
+        ChallengeStat.objects.create(
+            challenge=self.challenge_2, student=self.student_2, score=7
+        )
+        stats = get_best_challenge_stats(self.student_1, self.course_2.id)
+        self.assertEqual(list(stats), [])
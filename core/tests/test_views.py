@@ -1,13 +1,27 @@
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.timezone import now
 from rest_framework import status
-from rest_framework.test import APIClient, APITestCase
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    APITestCase,
+    force_authenticate,
+)
 
-from core.models import ChallengeStat
+from core.models import ChallengeStat, SpacedRepetition
 from core.tests.factories import TestFactory
+from core.views import AsyncGenerateChallengeView, AsyncGenerateFeedbackView
+
+
+def count_table_queries(queries, table):
+    return sum(f'"{table}"' in query["sql"] for query in queries.captured_queries)
 
 
 class APITests(APITestCase, TestFactory):
@@ -63,6 +77,55 @@ class APITests(APITestCase, TestFactory):
         self.assertIn("challenge", response.data)
         self.assertEqual(response.data["challenge"], "Mocked challenge")
 
+    def build_async_request(self, url, data, user=None):
+        request = APIRequestFactory().post(url, data)
+        request.student = self.student_1 if user else None
+        if user:
+            force_authenticate(request, user=user)
+        return request
+
+    @patch("core.views.ChallengeService.aget_challenge")
+    async def test_async_generate_challenge(self, mock_aget_challenge):
+        mock_aget_challenge.return_value = {
+            "challenge_id": 1,
+            "challenge": "Mocked challenge",
+        }
+        request = self.build_async_request(
+            reverse("get-challenge"), {"course_id": self.course_1.id}, self.user_1
+        )
+        response = await AsyncGenerateChallengeView.as_view()(request)
+        mock_aget_challenge.assert_awaited_once_with(
+            self.student_1.id, self.course_1.id
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["challenge"], "Mocked challenge")
+
+    async def test_async_generate_challenge_unauthenticated(self):
+        request = self.build_async_request(
+            reverse("get-challenge"), {"course_id": self.course_1.id}
+        )
+        response = await AsyncGenerateChallengeView.as_view()(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @patch("core.views.ChallengeService.aget_feedback")
+    async def test_async_generate_feedback(self, mock_aget_feedback):
+        mock_aget_feedback.return_value = None
+        request = self.build_async_request(
+            reverse("get-feedback"),
+            {
+                "challenge_id": self.challenge_1.id,
+                "answer_type": "text",
+                "answer_text": "This is my answer.",
+                "moment": 1,
+            },
+            self.user_1,
+        )
+        response = await AsyncGenerateFeedbackView.as_view()(request)
+        mock_aget_feedback.assert_awaited_once_with(
+            self.student_1.id, self.challenge_1, "text", "This is my answer.", 1
+        )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     @patch("core.views.ChallengeService.get_feedback")
     def test_generate_feedback_with_text(self, mock_get_feedback):
         mock_get_feedback.return_value = "Mocked feedback"
@@ -75,7 +138,7 @@ class APITests(APITestCase, TestFactory):
         }
         response = self.client.post(url, data)
         mock_get_feedback.assert_called_once_with(
-            self.student_1.id, self.challenge_1.id, "text", "This is my answer.", None
+            self.student_1.id, self.challenge_1, "text", "This is my answer.", None
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("feedback", response.data)
@@ -110,11 +173,48 @@ class APITests(APITestCase, TestFactory):
         }
         response = self.client.post(url, data)
         mock_get_feedback.assert_called_once_with(
-            self.student_1.id, self.challenge_1.id, "text", "This is my answer.", 1
+            self.student_1.id, self.challenge_1, "text", "This is my answer.", 1
         )
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         self.assertIn("error", response.data)
 
+    @patch("core.views.ChallengeService.astream_feedback")
+    async def test_generate_feedback_stream(self, mock_astream_feedback):
+        async def events(*args, **kwargs):
+            yield "feedback", {"delta": "Good"}
+            yield "done", {"feedback": "Good job"}
+
+        mock_astream_feedback.side_effect = events
+        await self.async_client.alogin(username="user_t1", password="pwd1")
+        response = await self.async_client.post(
+            reverse("get-feedback-stream"),
+            {
+                "challenge_id": self.challenge_1.id,
+                "answer_type": "text",
+                "answer_text": "This is my answer.",
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(
+            content.decode(),
+            'event: feedback\ndata: {"delta": "Good"}\n\n'
+            'event: done\ndata: {"feedback": "Good job"}\n\n',
+        )
+        mock_astream_feedback.assert_called_once_with(
+            self.student_1.id, self.challenge_1, "text", "This is my answer.", None
+        )
+
+    def test_generate_feedback_stream_missing_answer(self):
+        self.client.login(username="user_t1", password="pwd1")
+        response = self.client.post(
+            reverse("get-feedback-stream"),
+            {"challenge_id": self.challenge_1.id, "answer_type": "audio"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     @patch("core.views.ChallengeService.get_feedback")
     def test_generate_feedback_invalid_type(self, mock_get_feedback):
         mock_get_feedback.return_value = None
@@ -176,6 +276,73 @@ class APITests(APITestCase, TestFactory):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_get_challenge_scores_paginated(self):
+        ChallengeStat.objects.create(
+            challenge=self.challenge_2, student=self.student_1, score=7.0
+        )
+        url = reverse("challenge-scores", args=[self.course_1.id])
+        self.client.login(username="user_t1", password="pwd1")
+        response = self.client.get(url, {"page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["score"] for row in response.data["results"]], ["9.00"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.data["next"])
+        self.assertEqual(count_table_queries(queries, "core_challengestat"), 1)
+        self.assertEqual([row["score"] for row in response.data["results"]], ["7.00"])
+        self.assertIsNone(response.data["next"])
+
+        response = self.client.get(response.data["previous"])
+        self.assertEqual([row["score"] for row in response.data["results"]], ["9.00"])
+
+    def test_get_spaced_repetitions(self):
+        self.student_1.courses.add(self.course_1, self.course_2)
+        SpacedRepetition.objects.filter(course=self.course_2).update(
+            moment1=now() - timedelta(hours=1)
+        )
+        url = reverse("spaced-repetition-detail")
+        self.client.login(username="user_t1", password="pwd1")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        response = self.client.get(url, {"due_before": now().isoformat()})
+        self.assertEqual(
+            [row["course_title"] for row in response.data], [self.course_2.title]
+        )
+
+        SpacedRepetition.objects.filter(course=self.course_2).update(
+            is_completed1=True, is_completed2=True, is_completed3=True
+        )
+        response = self.client.get(url, {"not_completed": "true"})
+        self.assertEqual(
+            [row["course_title"] for row in response.data], [self.course_1.title]
+        )
+
+    def test_get_spaced_repetitions_paginated(self):
+        self.student_1.courses.add(self.course_1, self.course_2)
+        url = reverse("spaced-repetition-detail")
+        self.client.login(username="user_t1", password="pwd1")
+
+        response = self.client.get(url, {"page_size": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["course"], self.course_1.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(response.data["next"])
+        self.assertEqual(count_table_queries(queries, "core_spacedrepetition"), 1)
+        self.assertEqual(
+            [row["course_title"] for row in response.data["results"]],
+            [self.course_2.title],
+        )
+
+    def test_get_spaced_repetitions_invalid_filter(self):
+        self.client.login(username="user_t1", password="pwd1")
+        response = self.client.get(
+            reverse("spaced-repetition-detail"), {"due_before": "tomorrow"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_post_valid_skipped_true(self):
         url = "/api/register-event/"
         self.client.login(username="user_t1", password="pwd1")
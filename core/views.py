@@ -1,28 +1,74 @@
-import os
+import asyncio
+import io
+import json
+from itertools import islice
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count, Max, OuterRef, Subquery
+from django.db import transaction
+from django.db.models import Count
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.api.pagination import ChallengeScorePagination, SpacedRepetitionPagination
 from core.api.serializers import (
     ChallengeScoreSerializer,
     ChallengeSerializer,
+    CompanyOnboardingSerializer,
     RegisterChallengeRatingSerializer,
     RegisterEventChallengeSerializer,
+    SpacedRepetitionFilterSerializer,
     SpacedRepetitionSerializer,
     StudentChallengeSerializer,
     StudentCourseSerializer,
     StudentCourseSummarySerializer,
 )
-from core.models import Challenge, ChallengeStat, Course, SpacedRepetition, Student
+from core.models import Challenge, Course, SpacedRepetition, Student
 from core.services.challenge import ChallengeService
-from core.services.utils import get_student_company_metrics
+from core.services.course_assignment import get_course_assignment_policy
+from core.services.monitoring import is_metrics_request_allowed, render_metrics
+from core.services.onboarding import CompanyOnboarding, read_rows
+from core.services.utils import (
+    filter_spaced_repetitions,
+    get_best_challenge_stats,
+    get_student_company_metrics,
+)
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView with `async def` handlers. Authentication, permissions and request
+    parsing are the usual DRF ones, run off the event loop, so the handler
+    only awaits the LLM call and async ORM queries.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            await sync_to_async(lambda: request.data)()
+            handler = getattr(
+                self, request.method.lower(), self.http_method_not_allowed
+            )
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
 
 
 class ChallengeTemplateView(APIView):
@@ -46,23 +92,17 @@ class ChallengeScoresView(APIView):
         except Student.DoesNotExist:
             raise PermissionDenied("No student profile associated with this user.")
 
-        max_scores = (
-            ChallengeStat.objects.filter(
-                challenge=OuterRef("challenge"), student=student
-            )
-            .values("challenge")
-            .annotate(max_score=Max("score"))
-            .values("max_score")
-        )
-
-        stats = ChallengeStat.objects.filter(
-            student=student,
-            challenge__course_id=course_id,
-            score__isnull=False,
-            skipped=False,
-            score=Subquery(max_scores),
-        ).select_related("challenge")
-        if not stats.exists():
+        stats = get_best_challenge_stats(student, course_id).only(
+            "score", "challenge__name", "challenge__estimated_minutes"
+        )
+        paginator = ChallengeScorePagination()
+        page = paginator.paginate_queryset(stats, request, view=self)
+        if page is not None:
+            serializer = ChallengeScoreSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        stats = list(stats)
+        if not stats:
             raise NotFound("No challenge stats found for the given course.")
 
         serializer = ChallengeScoreSerializer(stats, many=True)
@@ -120,14 +160,35 @@ class SpacedRepetitionDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        student = request.student
-        try:
-            spaced_repetition = SpacedRepetition.objects.filter(student=student)
-        except SpacedRepetition.DoesNotExist:
-            raise NotFound(
-                "No spaced repetition record found for this student and course."
+        filters = SpacedRepetitionFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        spaced_repetitions = (
+            filter_spaced_repetitions(
+                SpacedRepetition.objects.filter(student=request.student),
+                **filters.validated_data,
             )
-        serializer = SpacedRepetitionSerializer(spaced_repetition, many=True)
+            .select_related("course")
+            .only(
+                "student",
+                "course__title",
+                "moment1",
+                "is_completed1",
+                "moment2",
+                "is_completed2",
+                "moment3",
+                "is_completed3",
+                "created_at",
+                "updated_at",
+            )
+        )
+
+        paginator = SpacedRepetitionPagination()
+        page = paginator.paginate_queryset(spaced_repetitions, request, view=self)
+        if page is not None:
+            serializer = SpacedRepetitionSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = SpacedRepetitionSerializer(spaced_repetitions, many=True)
         return Response(serializer.data)
 
 
@@ -150,6 +211,50 @@ class GenerateChallengeView(APIView):
         return Response(challenge_response, status=status.HTTP_200_OK)
 
 
+class AsyncGenerateChallengeView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        serializer = StudentCourseSerializer(
+            data=request.data, context={"request": request}
+        )
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        student_id = serializer.validated_data["student"].id
+        course_id = serializer.validated_data["course_id"]
+        challenge_response = await ChallengeService().aget_challenge(
+            student_id, course_id
+        )
+        if challenge_response is None:
+            return Response(
+                {"error": "Challenge could not be generated."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return Response(challenge_response, status=status.HTTP_200_OK)
+
+
+def get_student_answer(answer_type, answer_text, answer_audio):
+    """Return (student_answer, error) for the validated feedback request."""
+    if (
+        answer_type == settings.ANSWER_TYPE_TEXT
+        or answer_type == settings.ANSWER_TYPE_CODE
+    ):
+        if answer_text is None:
+            type_answer = "text" if answer_type == settings.ANSWER_TYPE_TEXT else "code"
+            return None, f"Answer {type_answer} is required."
+        return answer_text, None
+
+    elif answer_type == settings.ANSWER_TYPE_AUDIO:
+        if answer_audio is None:
+            return None, "Answer audio is required."
+        return answer_audio, None
+
+    return None, None
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 class GenerateFeedbackView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -159,43 +264,52 @@ class GenerateFeedbackView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         student_id = serializer.validated_data["student"].id
-        challenge_id = serializer.validated_data["challenge_id"]
+        challenge = serializer.validated_data["challenge"]
         answer_type = serializer.validated_data["answer_type"]
-        answer_text = serializer.validated_data["answer_text"]
-        answer_audio_path = serializer.validated_data["answer_audio"]
         moment = serializer.validated_data["moment"]
 
-        student_answer = None
-
-        if (
-            answer_type == settings.ANSWER_TYPE_TEXT
-            or answer_type == settings.ANSWER_TYPE_CODE
-        ):
-            student_answer = answer_text
-            if student_answer is None:
-                type_answer = (
-                    "text" if answer_type == settings.ANSWER_TYPE_TEXT else "code"
-                )
-                return Response(
-                    {"error": f"Answer {type_answer} is required."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-        elif answer_type == settings.ANSWER_TYPE_AUDIO:
-            if not os.path.exists(answer_audio_path):
-                return Response(
-                    {"error": "Answer audio file does not exist."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            student_answer = answer_audio_path
-            if student_answer is None:
-                return Response(
-                    {"error": "Answer audio is required."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        student_answer, error = get_student_answer(
+            answer_type,
+            serializer.validated_data["answer_text"],
+            serializer.validated_data["answer_audio"],
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
         challenge_response = ChallengeService().get_feedback(
-            student_id, challenge_id, answer_type, student_answer, moment
+            student_id, challenge, answer_type, student_answer, moment
+        )
+        if challenge_response is None:
+            return Response(
+                {"error": "Feedback could not be generated."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+        return Response({"feedback": challenge_response}, status=status.HTTP_200_OK)
+
+
+class AsyncGenerateFeedbackView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def post(self, request):
+        serializer = StudentChallengeSerializer(
+            data=request.data, context={"request": request}
+        )
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        student_id = serializer.validated_data["student"].id
+        challenge = serializer.validated_data["challenge"]
+        answer_type = serializer.validated_data["answer_type"]
+        moment = serializer.validated_data["moment"]
+
+        student_answer, error = get_student_answer(
+            answer_type,
+            serializer.validated_data["answer_text"],
+            serializer.validated_data["answer_audio"],
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        challenge_response = await ChallengeService().aget_feedback(
+            student_id, challenge, answer_type, student_answer, moment
         )
         if challenge_response is None:
             return Response(
@@ -205,13 +319,59 @@ class GenerateFeedbackView(APIView):
         return Response({"feedback": challenge_response}, status=status.HTTP_200_OK)
 
 
+class GenerateFeedbackStreamView(APIView):
+    """
+    Same request as GenerateFeedbackView, answered with Server-Sent Events
+    that carry the feedback text as the model writes it. The event stream is
+    an async iterator, serve it from the ASGI application (sirius.asgi) so it
+    is not buffered.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = StudentChallengeSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        student_id = serializer.validated_data["student"].id
+        challenge = serializer.validated_data["challenge"]
+        answer_type = serializer.validated_data["answer_type"]
+        moment = serializer.validated_data["moment"]
+
+        student_answer, error = get_student_answer(
+            answer_type,
+            serializer.validated_data["answer_text"],
+            serializer.validated_data["answer_audio"],
+        )
+        if error:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = ChallengeService().astream_feedback(
+            student_id, challenge, answer_type, student_answer, moment
+        )
+        response = StreamingHttpResponse(
+            self.stream(events), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, events):
+        async for event, data in events:
+            yield format_sse(event, data)
+
+
 class CompanyMetricsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         student = request.student
+        days = request.query_params.get("days")
+        if days is not None and (not days.isdigit() or int(days) == 0):
+            raise ValidationError("days must be a positive integer.")
 
-        data = get_student_company_metrics(student.id)
+        data = get_student_company_metrics(student, int(days) if days else None)
 
         return Response(data)
 
@@ -229,11 +389,16 @@ class RegisterUserView(APIView):
         if User.objects.filter(username=username).exists():
             raise ValidationError("Username already taken.")
 
-        user = User.objects.create_user(username=username, password=password)
-        token = Token.objects.create(user=user)
-        student = Student.objects.create(name=username, user=user)
-        random_courses = Course.objects.order_by("?")[:3]
-        student.courses.add(*random_courses)
+        course_ids = get_course_assignment_policy().choose(
+            settings.COURSE_ASSIGNMENT_COUNT
+        )
+        with transaction.atomic():
+            user = User.objects.create_user(username=username, password=password)
+            token = Token.objects.create(user=user)
+            student = Student.objects.create(name=username, user=user)
+            # The policies choose from cached ids, which may still hold a
+            # course deleted on another worker.
+            student.courses.add(*Course.objects.filter(id__in=course_ids))
 
         return Response(
             {
@@ -246,3 +411,48 @@ class RegisterUserView(APIView):
             },
             status=status.HTTP_201_CREATED,
         )
+
+
+class CompanyOnboardingView(APIView):
+    """
+    Admin-only bulk import of a company's users from a CSV or JSONL upload,
+    answered with the number of rows processed and created and the per-row
+    errors. Passwords are hashed in the request, so files over
+    ONBOARDING_API_MAX_ROWS rows are refused before anything is created and
+    go through the onboard_company command instead.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = CompanyOnboardingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        max_rows = settings.ONBOARDING_API_MAX_ROWS
+        lines = io.TextIOWrapper(data["file"].file, encoding="utf-8-sig", newline="")
+        rows = list(islice(read_rows(lines, data["file_format"]), max_rows + 1))
+        if len(rows) > max_rows:
+            return Response(
+                {
+                    "error": f"Files over {max_rows} rows must be imported with "
+                    "the onboard_company command."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = CompanyOnboarding(
+            data["company"],
+            data["course_ids"],
+            hash_workers=0,
+            assign_courses=data["assign_courses"],
+        ).run(rows)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, outside DRF so it skips token auth."""
+    if not is_metrics_request_allowed(request):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
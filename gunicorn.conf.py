@@ -1,9 +1,106 @@
 # gunicorn.conf.py
+#
+# Every setting is derived from the CPUs available to the container and the
+# GUNICORN_PROFILE, and can be overridden with its GUNICORN_* variable:
+#   api  short, CPU-light requests (auth, metrics, CRUD): many sync workers
+#   llm  /api/get-challenge/ and /api/get-feedback/, which mostly wait on the
+#        LLM API: few workers, each holding many requests in flight
+import os
+import shutil
+import sys
+
+# gunicorn loads this file by path, make the project importable for the
+# helpers it shares with the settings.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sirius.cpu import get_cpu_count  # noqa: E402
+
+
+def get_env(name, default, cast=str):
+    value = os.getenv(f"GUNICORN_{name}")
+    if value in (None, ""):
+        return default
+    if cast is bool:
+        return value.lower() == "true"
+    return cast(value)
+
+
+WORKER_CLASSES = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "eventlet": "eventlet",
+    "uvicorn": "uvicorn_worker.UvicornWorker",
+}
+
+# "asgi" serves sirius.asgi on uvicorn workers so the async LLM views can wait
+# on many requests without monkeypatching.
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi")
+PROFILE = os.getenv("GUNICORN_PROFILE", "llm")
+CPU_COUNT = get_cpu_count()
+
+PROFILES = {
+    "api": {
+        "worker_class": "gthread",
+        "workers": 2 * CPU_COUNT + 1,
+        "threads": 4,
+        "timeout": 30,
+        "max_requests": 2000,
+        "preload_app": True,
+    },
+    "llm": {
+        "worker_class": "uvicorn" if SERVER_MODE == "asgi" else "gthread",
+        "workers": CPU_COUNT,
+        "threads": 32,
+        "timeout": 200,
+        "max_requests": 500,
+        "preload_app": False,
+    },
+}
+if PROFILE not in PROFILES:
+    raise ValueError(f"Unknown GUNICORN_PROFILE {PROFILE}, use one of {list(PROFILES)}")
+profile = PROFILES[PROFILE]
 
 bind = "0.0.0.0:9000"
 loglevel = "info"
-proc_name = "sirius"
-timeout = 200
-workers = 1
-worker_class = "eventlet"
+proc_name = f"sirius-{PROFILE}"
 keepalive = 10
+
+worker = get_env("WORKER_CLASS", profile["worker_class"])
+worker_class = WORKER_CLASSES[worker]
+wsgi_app = (
+    "sirius.asgi:application" if worker == "uvicorn" else "sirius.wsgi:application"
+)
+workers = get_env("WORKERS", profile["workers"], int)
+threads = get_env("THREADS", profile["threads"], int)
+timeout = get_env("TIMEOUT", profile["timeout"], int)
+graceful_timeout = timeout
+
+# Recycle workers now and then to cap memory growth, jittered so they do not
+# all restart at once.
+max_requests = get_env("MAX_REQUESTS", profile["max_requests"], int)
+max_requests_jitter = get_env("MAX_REQUESTS_JITTER", max_requests // 10, int)
+
+# Preloading shares the app's memory between workers.
+preload_app = get_env("PRELOAD", profile["preload_app"], bool)
+
+# Read by the settings: ASGI workers must not keep connections open between
+# requests, and a gthread worker needs a pooled connection per thread.
+os.environ["SERVER_MODE"] = "asgi" if worker == "uvicorn" else "wsgi"
+if worker == "gthread":
+    os.environ.setdefault("DB_POOL_MAX_SIZE", str(threads))
+
+# Prometheus multiprocess mode: workers write their metrics to files in this
+# directory, /metrics aggregates them. It has to be set before the app (and
+# prometheus_client) is imported, and emptied so a restart starts from zero.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", f"/tmp/prometheus-{PROFILE}"
+)
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR)
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a recycled worker.
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
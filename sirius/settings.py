@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import json
 import os
 import sys
 from pathlib import Path
@@ -19,6 +20,9 @@ import sentry_sdk
 from configurations import Configuration, values
 from sentry_sdk.integrations.django import DjangoIntegration
 
+from core.services.tracing import DEFAULT_ROUTE_RATES, TracesSampler
+from sirius.cpu import get_cpu_count
+
 
 class Common(Configuration):
     """The common settings and the default configuration."""
@@ -72,7 +76,7 @@ class Common(Configuration):
 
     REST_FRAMEWORK = {
         "DEFAULT_AUTHENTICATION_CLASSES": [
-            "rest_framework.authentication.TokenAuthentication",
+            "core.authentication.CachedTokenAuthentication",
             "rest_framework.authentication.SessionAuthentication",
         ],
         "DEFAULT_PERMISSION_CLASSES": [
@@ -80,7 +84,40 @@ class Common(Configuration):
         ],
     }
 
+    # Share of requests timed by core.middleware.RequestProfilingMiddleware,
+    # from 0 (off) to 1.
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+
+    # Bearer token required by /metrics. The ingress routes /metrics too, so
+    # without a token the endpoint only answers when DEBUG is on.
+    PROMETHEUS_METRICS_TOKEN = os.getenv("PROMETHEUS_METRICS_TOKEN", "")
+
+    # The "shared" cache is seen by every worker and pod, for state that
+    # must not drift between them. Set SHARED_CACHE_URL to a Redis URL such
+    # as redis://redis:6379/0 to enable it.
+    SHARED_CACHE_URL = os.getenv("SHARED_CACHE_URL", "")
+    CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    }
+    if SHARED_CACHE_URL:
+        CACHES["shared"] = {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": SHARED_CACHE_URL,
+        }
+
+    # Token -> (user, student) cache used by CachedTokenAuthentication, off
+    # when empty and "shared" when the shared cache is configured.
+    # Invalidation has to reach every worker, so the "core.E001" check
+    # refuses a per-process or per-host cache.
+    AUTH_TOKEN_CACHE_ALIAS = os.getenv(
+        "AUTH_TOKEN_CACHE_ALIAS", "shared" if SHARED_CACHE_URL else ""
+    )
+    AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "60"))
+
     MIDDLEWARE = [
+        # Outermost, so its total covers the other middleware too.
+        "core.middleware.RequestProfilingMiddleware",
+        "core.middleware.PrometheusMiddleware",
         "corsheaders.middleware.CorsMiddleware",
         "django.middleware.security.SecurityMiddleware",
         "django.contrib.sessions.middleware.SessionMiddleware",
@@ -163,6 +200,12 @@ class Common(Configuration):
     ]
     CORS_ALLOW_CREDENTIALS = True
 
+    # Uploads up to this size stay in memory, bigger audio answers are spooled
+    # to a temporary file that is deleted when the upload is closed.
+    FILE_UPLOAD_MAX_MEMORY_SIZE = int(
+        os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", str(5 * 1024 * 1024))
+    )
+
     ANSWER_TYPE_AUDIO = "audio"
     ANSWER_TYPE_CODE = "code"
     ANSWER_TYPE_TEXT = "text"
@@ -174,17 +217,138 @@ class Common(Configuration):
     LLM_MAX_TOKENS = 1000
     LLM_MODEL_SPEECH_TO_TEXT = "whisper-1"
 
+    # Shared HTTP connection pool used by the LLM clients (one per process)
+    LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(
+        os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+    )
+    LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+    LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+    LLM_HTTP_MAX_RETRIES = int(os.getenv("LLM_HTTP_MAX_RETRIES", "2"))
+
     OPENAI_PROVIDER = "openai"
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_CHALLENGE_SCHEMA = "challenge"
     OPENAI_FEEDBACK_SCHEMA = "feedback"
 
+    # Content-addressed cache for LLM responses, BACKEND is locmem, django or sqlite
+    LLM_CACHES = {
+        "default": {
+            "BACKEND": os.getenv("LLM_CACHE_BACKEND", "locmem"),
+            "LOCATION": os.getenv("LLM_CACHE_LOCATION", None),
+            "TTL": int(os.getenv("LLM_CACHE_TTL", "3600")),
+            "MAX_ENTRIES": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+        },
+        # Transcripts keyed by a hash of the audio, so a resubmitted recording
+        # skips the speech-to-text call.
+        "transcription": {
+            "BACKEND": os.getenv("TRANSCRIPTION_CACHE_BACKEND", "locmem"),
+            "LOCATION": os.getenv("TRANSCRIPTION_CACHE_LOCATION", None),
+            "TTL": int(os.getenv("TRANSCRIPTION_CACHE_TTL", "86400")),
+            "MAX_ENTRIES": int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "1024")),
+        },
+    }
+    # Schemas whose responses are served from the LLM cache. Challenge
+    # generation always bypasses it: the prompt only depends on the course,
+    # so a cached answer would repeat a challenge the student has done.
+    LLM_CACHED_SCHEMAS = [
+        schema for schema in os.getenv("LLM_CACHED_SCHEMAS", "").split(",") if schema
+    ]
+
+    # Pool of pre-generated challenges, see core.services.challenge_pool
+    CHALLENGE_POOL_LEVELS = [
+        int(level) for level in os.getenv("CHALLENGE_POOL_LEVELS", "1").split(",")
+    ]
+    CHALLENGE_POOL_PER_STUDENT = float(os.getenv("CHALLENGE_POOL_PER_STUDENT", "0.5"))
+    CHALLENGE_POOL_MIN_SIZE = int(os.getenv("CHALLENGE_POOL_MIN_SIZE", "1"))
+    CHALLENGE_POOL_MAX_SIZE = int(os.getenv("CHALLENGE_POOL_MAX_SIZE", "20"))
+    CHALLENGE_POOL_ACTIVE_DAYS = int(os.getenv("CHALLENGE_POOL_ACTIVE_DAYS", "14"))
+    # Seconds between passes of `refill_challenge_pool --loop`.
+    CHALLENGE_POOL_SCHEDULER_INTERVAL = int(
+        os.getenv("CHALLENGE_POOL_SCHEDULER_INTERVAL", "300")
+    )
+
+    # Serve /api/get-challenge/ and /api/get-feedback/ with async views, meant
+    # for the ASGI deployment (SERVER_MODE=asgi in gunicorn.conf.py).
+    LLM_ASYNC_VIEWS = os.getenv("LLM_ASYNC_VIEWS", "false").lower() == "true"
+
+    # Starter courses for new students, see core.services.course_assignment.
+    # POLICY is random, weighted (by company plan) or least_loaded.
+    COURSE_ASSIGNMENT_POLICY = os.getenv("COURSE_ASSIGNMENT_POLICY", "random")
+    COURSE_ASSIGNMENT_COUNT = int(os.getenv("COURSE_ASSIGNMENT_COUNT", "3"))
+    COURSE_ASSIGNMENT_PLAN_WEIGHTS = json.loads(
+        os.getenv("COURSE_ASSIGNMENT_PLAN_WEIGHTS", "{}")
+    )
+    COURSE_ASSIGNMENT_CACHE_ALIAS = os.getenv(
+        "COURSE_ASSIGNMENT_CACHE_ALIAS", "default"
+    )
+    COURSE_ASSIGNMENT_CACHE_TTL = int(os.getenv("COURSE_ASSIGNMENT_CACHE_TTL", "300"))
+
+    # Bulk company onboarding, see core.services.onboarding. The command
+    # hashes passwords in a pool of ONBOARDING_HASH_WORKERS processes, one per
+    # CPU of the container's quota by default. The admin endpoint hashes them
+    # in the request, at about 0.4 s each, so it takes at most
+    # ONBOARDING_API_MAX_ROWS rows and larger files go through the command.
+    ONBOARDING_BATCH_SIZE = int(os.getenv("ONBOARDING_BATCH_SIZE", "1000"))
+    ONBOARDING_MAX_ROWS = int(os.getenv("ONBOARDING_MAX_ROWS", "20000"))
+    ONBOARDING_HASH_WORKERS = int(
+        os.getenv("ONBOARDING_HASH_WORKERS", str(get_cpu_count()))
+    )
+    ONBOARDING_API_MAX_ROWS = int(os.getenv("ONBOARDING_API_MAX_ROWS", "50"))
+
+    # Concurrent generations for the same course share one LLM call, the DB
+    # advisory lock extends this across worker processes (Postgres only)
+    CHALLENGE_GENERATION_DB_LOCK = (
+        os.getenv("CHALLENGE_GENERATION_DB_LOCK", "true").lower() == "true"
+    )
+    CHALLENGE_GENERATION_WAIT_TIMEOUT = float(
+        os.getenv("CHALLENGE_GENERATION_WAIT_TIMEOUT", "120")
+    )
+    # Seconds a worker waits for another process's generation before giving
+    # up on the request, so waiters do not pile up on threads and connections.
+    CHALLENGE_GENERATION_LOCK_TIMEOUT = float(
+        os.getenv("CHALLENGE_GENERATION_LOCK_TIMEOUT", "30")
+    )
+
     SPACED_REPETITION_MOMENT_CHOICES = [(moment, str(moment)) for moment in range(1, 4)]
+    # Review policy overrides, see core.services.scheduling. Keys are
+    # "default", "course:<id>" and "company:<id>", values override
+    # DEFAULT_REVIEW_POLICY, e.g. {"company:2": {"intervals": [2, 10, 45]}}.
+    SPACED_REPETITION_POLICIES = json.loads(
+        os.getenv("SPACED_REPETITION_POLICIES", "{}")
+    )
+
+    # Due review scheduler, see core.services.review_scheduler.
+    DUE_REVIEWS_BATCH_SIZE = int(os.getenv("DUE_REVIEWS_BATCH_SIZE", "500"))
+    DUE_REVIEWS_INTERVAL = int(os.getenv("DUE_REVIEWS_INTERVAL", "300"))
+
+    # Sentry tracing, see core.services.tracing. SENTRY_TRACES_ROUTE_RATES
+    # maps path prefixes to rates on top of DEFAULT_ROUTE_RATES, e.g.
+    # {"/api/company-metrics/": 0.2}. Paths without a prefix use
+    # SENTRY_TRACES_SAMPLE_RATE.
+    SENTRY_TRACES_SAMPLE_RATE = float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", "0.05"))
+    SENTRY_TRACES_ROUTE_RATES = {
+        **DEFAULT_ROUTE_RATES,
+        **json.loads(os.getenv("SENTRY_TRACES_ROUTE_RATES", "{}")),
+    }
+    # Keep-if-slow: trace every request, keep the failed or slow ones and the
+    # rest at the route rate.
+    SENTRY_TRACES_TAIL_SAMPLING = (
+        os.getenv("SENTRY_TRACES_TAIL_SAMPLING", "false").lower() == "true"
+    )
+    SENTRY_TRACES_SLOW_MS = int(os.getenv("SENTRY_TRACES_SLOW_MS", "2000"))
 
+    traces_sampler = TracesSampler(
+        SENTRY_TRACES_SAMPLE_RATE,
+        SENTRY_TRACES_ROUTE_RATES,
+        SENTRY_TRACES_SLOW_MS,
+        tail=SENTRY_TRACES_TAIL_SAMPLING,
+    )
     sentry_sdk.init(
         dsn=os.getenv("SENTRY_DSN", ""),
         integrations=[DjangoIntegration()],
-        traces_sample_rate=1.0,
+        traces_sampler=traces_sampler.traces_sampler,
+        before_send_transaction=traces_sampler.before_send_transaction,
         send_default_pii=True,
     )
 
@@ -224,9 +388,37 @@ class Staging(Development):
     """The in-staging settings."""
 
     DATABASE_URL = os.getenv("DATABASE_URL")
+    # Keep connections open between requests (seconds, 0 closes them after
+    # every request) and check them before reuse. Ignored under ASGI, where
+    # each request runs in a new thread context and a kept connection is
+    # never reused, only left open: use the pool there.
+    DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+    DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "true").lower() == "true"
+    # Native psycopg pool, sized per worker process: max size should cover the
+    # worker's threads (or concurrent async requests). gunicorn.conf.py sets
+    # DB_POOL_MAX_SIZE to the thread count of gthread workers.
+    DB_POOL_ENABLED = os.getenv("DB_POOL_ENABLED", "false").lower() == "true"
+    DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+
     DATABASES = {}
-    DATABASES["default"] = dj_database_url.config(default=DATABASE_URL)
+    DATABASES["default"] = dj_database_url.config(
+        default=DATABASE_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+    )
     DATABASES["default"]["MANAGED"] = True
+    if DB_POOL_ENABLED:
+        # The pool owns connection lifetimes, Django requires CONN_MAX_AGE = 0.
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": DB_POOL_TIMEOUT,
+        }
+    elif os.getenv("SERVER_MODE") == "asgi":
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
 
     CSRF_COOKIE_SAMESITE = "None"
     CSRF_COOKIE_SECURE = True
@@ -15,23 +15,37 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from rest_framework.authtoken.views import obtain_auth_token
 
 from core.views import (
+    AsyncGenerateChallengeView,
+    AsyncGenerateFeedbackView,
     ChallengeScoresView,
     ChallengeTemplateView,
     CompanyMetricsView,
+    CompanyOnboardingView,
     CourseSummaryView,
     GenerateChallengeView,
+    GenerateFeedbackStreamView,
     GenerateFeedbackView,
     RegisterChallengeRatingView,
     RegisterEventChallengeView,
     RegisterUserView,
     SpacedRepetitionDetailView,
+    metrics_view,
 )
 
+# Async views let one ASGI worker wait on many LLM calls at once.
+if settings.LLM_ASYNC_VIEWS:
+    challenge_view = AsyncGenerateChallengeView.as_view()
+    feedback_view = AsyncGenerateFeedbackView.as_view()
+else:
+    challenge_view = GenerateChallengeView.as_view()
+    feedback_view = GenerateFeedbackView.as_view()
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("login/", obtain_auth_token, name="token_obtain"),
@@ -62,7 +76,18 @@ urlpatterns = [
         SpacedRepetitionDetailView.as_view(),
         name="spaced-repetition-detail",
     ),
-    path("api/get-challenge/", GenerateChallengeView.as_view(), name="get-challenge"),
-    path("api/get-feedback/", GenerateFeedbackView.as_view(), name="get-feedback"),
+    path("api/get-challenge/", challenge_view, name="get-challenge"),
+    path("api/get-feedback/", feedback_view, name="get-feedback"),
+    path(
+        "api/get-feedback/stream/",
+        GenerateFeedbackStreamView.as_view(),
+        name="get-feedback-stream",
+    ),
     path("api/company-metrics/", CompanyMetricsView.as_view(), name="company-metrics"),
+    path(
+        "api/company-onboarding/",
+        CompanyOnboardingView.as_view(),
+        name="company-onboarding",
+    ),
+    path("metrics", metrics_view, name="metrics"),
 ]